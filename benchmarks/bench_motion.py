@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Motion Pipeline Benchmark
+=========================
+Runs the motion detection code paths over labelled clips and writes one
+JSON report per run, so tuning changes to ``_motion_profile_map`` can be
+compared across commits and Pi models instead of guessed.
+
+Paths (each one for each sensitivity profile):
+- ``rpicam``: the frame-loop branch used by rpicam/picamera2 JPEG backends
+  (decode_gray -> motion_metrics -> _motion_trigger_step, with the 5 s
+  recording window the loop holds after a trigger).
+- ``motion_detector``: src.detection.motion_detector.MotionDetector.
+- ``fast_motion``: FastMotionDetector.detect().
+- ``extend``: _should_extend_motion_capture(), the keep-recording check.
+
+Reported per path: frames/sec, per-stage latency percentiles, Python
+allocation peak (tracemalloc), process RSS, frame-level precision/recall
+and event-level precision/recall with trigger latency.
+
+Usage:
+    python -m benchmarks.bench_motion --synthetic
+    python -m benchmarks.bench_motion --manifest ~/clips/manifest.json --profiles balanced,high
+    python -m benchmarks.bench_motion --synthetic --compare bench_results/motion_pi4_abc123.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from loguru import logger  # noqa: E402
+
+from benchmarks.footage import generate_synthetic_set, load_manifest  # noqa: E402
+from src.utils.perf_metrics import process_rss_bytes  # noqa: E402
+
+PATHS = ("rpicam", "motion_detector", "fast_motion", "extend")
+PROFILES = ("relaxed", "balanced", "high")
+RECORDING_HOLD_SECONDS = 5.0  # frame loop ignores motion while "recording" this long after a trigger
+EVENT_TOLERANCE_SECONDS = 0.5
+
+
+# ============= PATH RUNNERS =============
+# Each runner takes (frames, fps, settings, profile, times) and returns (active per frame, trigger frame indexes).
+# ``times`` maps stage -> list of seconds.
+
+def _decode_bgr(jpeg):
+    import cv2
+    import numpy as np
+
+    return cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _hold_triggers(active, fps):
+    """Rising edges of ``active`` outside the recording window of the previous trigger"""
+    triggers, hold_until = [], -1.0
+    for index, is_active in enumerate(active):
+        t = index / fps
+        if is_active and t >= hold_until:
+            triggers.append(index)
+            hold_until = t + RECORDING_HOLD_SECONDS
+    return triggers
+
+
+def _run_rpicam(frames, fps, settings, profile, times):
+    from time import perf_counter
+
+    from src.processing.analysis_pool import decode_gray, motion_metrics
+    from web.app_lite import _motion_trigger_step
+
+    active, triggers = [], []
+    previous, streak, hold_until = None, 0, -1.0
+    for index, jpeg in enumerate(frames):
+        started = perf_counter()
+        gray = decode_gray(jpeg)
+        decoded = perf_counter()
+        times["decode"].append(decoded - started)
+        is_active = False
+        if previous is not None and previous.shape == gray.shape:
+            metrics = motion_metrics(previous, gray, settings["min_area"])
+            analysed = perf_counter()
+            streak, required = _motion_trigger_step(streak, metrics, settings)
+            times["motion_metrics"].append(analysed - decoded)
+            times["trigger_step"].append(perf_counter() - analysed)
+            is_active = streak >= required
+            t = index / fps
+            if is_active and t >= hold_until:
+                # Same as the frame loop: recording starts, streak resets, motion ignored meanwhile
+                triggers.append(index)
+                hold_until = t + RECORDING_HOLD_SECONDS
+                streak = 0
+        previous = gray
+        active.append(is_active)
+    return active, triggers
+
+
+def _run_motion_detector(frames, fps, settings, profile, times):
+    from time import perf_counter
+
+    from src.detection.motion_detector import MotionDetector
+
+    detector = MotionDetector(sensitivity=settings["ai_sensitivity"], min_area=settings["min_area"])
+    active = []
+    for jpeg in frames:
+        started = perf_counter()
+        frame = _decode_bgr(jpeg)
+        decoded = perf_counter()
+        active.append(bool(detector.detect(frame)))
+        times["decode"].append(decoded - started)
+        times["detect"].append(perf_counter() - decoded)
+    return active, _hold_triggers(active, fps)
+
+
+def _run_fast_motion(frames, fps, settings, profile, times):
+    from time import perf_counter
+
+    import cv2
+
+    from src.camera.fast_camera_streamer import FastMotionDetector
+    from web.app_lite import _apply_motion_preferences
+
+    # Same profile -> detection config mapping the settings page applies
+    config = {}
+    _apply_motion_preferences(config, sensitivity_mode=profile)
+    detector = FastMotionDetector(None, config)
+    active = []
+    for jpeg in frames:
+        started = perf_counter()
+        frame = cv2.cvtColor(_decode_bgr(jpeg), cv2.COLOR_BGR2RGB)
+        decoded = perf_counter()
+        active.append(bool(detector.detect(frame)))
+        times["decode"].append(decoded - started)
+        times["detect"].append(perf_counter() - decoded)
+    return active, _hold_triggers(active, fps)
+
+
+def _run_extend(frames, fps, settings, profile, times):
+    from time import perf_counter
+
+    import cv2
+
+    from web.app_lite import _should_extend_motion_capture
+
+    active, previous = [], None
+    for jpeg in frames:
+        started = perf_counter()
+        frame = cv2.cvtColor(_decode_bgr(jpeg), cv2.COLOR_BGR2RGB)
+        decoded = perf_counter()
+        times["decode"].append(decoded - started)
+        if previous is None:
+            previous = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+            active.append(False)
+            continue
+        is_active, previous, _, _ = _should_extend_motion_capture(previous, frame, settings)
+        times["extend_check"].append(perf_counter() - decoded)
+        active.append(bool(is_active))
+    return active, _hold_triggers(active, fps)
+
+
+RUNNERS = {
+    "rpicam": _run_rpicam,
+    "motion_detector": _run_motion_detector,
+    "fast_motion": _run_fast_motion,
+    "extend": _run_extend,
+}
+
+
+# ============= SCORING =============
+
+def _percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p90_ms": round(pick(0.90), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _ratio(num, den):
+    return round(num / den, 4) if den else None
+
+
+def _score_frames(active, labels):
+    tp = sum(1 for a, y in zip(active, labels) if a and y)
+    fp = sum(1 for a, y in zip(active, labels) if a and not y)
+    fn = sum(1 for a, y in zip(active, labels) if not a and y)
+    return {"tp": tp, "fp": fp, "fn": fn, "precision": _ratio(tp, tp + fp), "recall": _ratio(tp, tp + fn)}
+
+
+def _score_events(triggers, events, fps):
+    """A trigger inside an event (+/- tolerance) is a hit; an event is caught by its first hit"""
+    caught, false_triggers, latencies = set(), 0, []
+    for index in triggers:
+        t = index / fps
+        match = next((i for i, e in enumerate(events)
+                      if e["start"] - EVENT_TOLERANCE_SECONDS <= t <= e["end"] + EVENT_TOLERANCE_SECONDS), None)
+        if match is None:
+            false_triggers += 1
+        elif match not in caught:
+            caught.add(match)
+            latencies.append(max(0.0, t - events[match]["start"]))
+    return {"caught": len(caught), "labelled": len(events), "triggers": len(triggers),
+            "false_triggers": false_triggers, "latencies": latencies}
+
+
+def _merge_counts(total, part):
+    for key, value in part.items():
+        if isinstance(value, list):
+            total.setdefault(key, []).extend(value)
+        elif isinstance(value, int):
+            total[key] = total.get(key, 0) + value
+
+
+# ============= RUN =============
+
+def bench_path(path, profile, clips, measure_alloc=True):
+    from web.app_lite import _motion_profile_map
+
+    settings = dict(_motion_profile_map()[profile])
+    runner = RUNNERS[path]
+    times = defaultdict(list)
+    frame_counts, event_counts, per_clip = {}, {}, {}
+    frames_total, started = 0, time.perf_counter()
+    for clip in clips:
+        active, triggers = runner(clip["frames"], clip["fps"], settings, profile, times)
+        frames_score = _score_frames(active, clip["labels"])
+        events_score = _score_events(triggers, clip["events"], clip["fps"])
+        _merge_counts(frame_counts, frames_score)
+        _merge_counts(event_counts, events_score)
+        per_clip[clip["name"]] = {
+            "frame_recall": frames_score["recall"],
+            "frame_precision": frames_score["precision"],
+            "events_caught": events_score["caught"],
+            "events_labelled": events_score["labelled"],
+            "false_triggers": events_score["false_triggers"],
+        }
+        frames_total += len(clip["frames"])
+    wall = time.perf_counter() - started
+    busy = sum(sum(v) for v in times.values())
+
+    result = {
+        "frames": frames_total,
+        "fps": round(frames_total / busy, 1) if busy else None,
+        "wall_fps": round(frames_total / wall, 1) if wall else None,
+        "latency": {stage: _percentiles(values) for stage, values in times.items()},
+        "frame": {
+            "tp": frame_counts["tp"], "fp": frame_counts["fp"], "fn": frame_counts["fn"],
+            "precision": _ratio(frame_counts["tp"], frame_counts["tp"] + frame_counts["fp"]),
+            "recall": _ratio(frame_counts["tp"], frame_counts["tp"] + frame_counts["fn"]),
+        },
+        "events": {
+            "labelled": event_counts["labelled"],
+            "caught": event_counts["caught"],
+            "triggers": event_counts["triggers"],
+            "false_triggers": event_counts["false_triggers"],
+            "precision": _ratio(event_counts["triggers"] - event_counts["false_triggers"], event_counts["triggers"]),
+            "recall": _ratio(event_counts["caught"], event_counts["labelled"]),
+            "trigger_latency": _percentiles(event_counts.get("latencies", [])),
+        },
+        "clips": per_clip,
+    }
+
+    if measure_alloc:
+        # Separate pass: tracemalloc slows every allocation, so it must not skew the timings above
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            for clip in clips:
+                runner(clip["frames"], clip["fps"], settings, profile, defaultdict(list))
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["alloc"] = {"peak_kb": round(peak / 1024, 1), "retained_kb": round(current / 1024, 1)}
+
+    rss = process_rss_bytes()
+    result["rss_mb"] = round(rss / (1024 * 1024), 1) if rss else None
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def _run_meta(args, clips):
+    import cv2
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        commit = ""
+    try:
+        from src.utils.pi_detect import get_pi_model
+        model = get_pi_model().get("name")
+    except Exception:
+        model = None
+    return {
+        "benchmark": "motion",
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit or None,
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "pi_model": model,
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "manifest": args.manifest,
+        "synthetic": bool(args.synthetic),
+        "clips": [{"name": c["name"], "frames": len(c["frames"]), "fps": c["fps"], "events": len(c["events"])}
+                  for c in clips],
+    }
+
+
+def _print_summary(report, baseline=None):
+    def delta(value, old):
+        if baseline is None or value is None or old is None:
+            return ""
+        return f" ({value - old:+.2f})" if isinstance(value, float) else f" ({value - old:+d})"
+
+    print(f"\n{'profile':<9} {'path':<16} {'fps':>8} {'p99 ms':>8} {'ev.P':>6} {'ev.R':>6} {'fr.P':>6} {'fr.R':>6}")
+    for profile, paths in report["results"].items():
+        for path, r in paths.items():
+            old = (baseline or {}).get("results", {}).get(profile, {}).get(path, {})
+            p99 = max((s.get("p99_ms", 0) for s in r["latency"].values()), default=0)
+            print(f"{profile:<9} {path:<16} {r['fps'] or 0:>8.1f} {p99:>8.2f} "
+                  f"{r['events']['precision'] or 0:>6.2f} {r['events']['recall'] or 0:>6.2f} "
+                  f"{r['frame']['precision'] or 0:>6.2f} {r['frame']['recall'] or 0:>6.2f}"
+                  f"{delta(r['fps'], old.get('fps'))}"
+                  f"{delta(r['events']['recall'], old.get('events', {}).get('recall'))}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark ME_CAM motion detection over labelled clips")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="Clip manifest JSON (see benchmarks/footage.py)")
+    source.add_argument("--synthetic", action="store_true", help="Generate and use the synthetic clip set")
+    parser.add_argument("--synthetic-dir", help="Keep the generated synthetic clips here")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma list of sensitivity profiles")
+    parser.add_argument("--paths", default=",".join(PATHS), help="Comma list of code paths")
+    parser.add_argument("--size", default="640x480", help="Resize frames to WxH before the run (default 640x480)")
+    parser.add_argument("--fps", type=float, default=15, help="Frame rate of the synthetic clips")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc allocation pass")
+    parser.add_argument("--output", help="Report path (default bench_results/motion_<host>_<commit>_<time>.json)")
+    parser.add_argument("--compare", help="Earlier report to print deltas against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the detectors' INFO logging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+        # The bundled loguru.py fallback logs through the stdlib "mecam" logger instead
+        logging.getLogger("mecam").setLevel(logging.WARNING)
+
+    width, height = (int(v) for v in args.size.lower().split("x", 1))
+    profiles = [p for p in args.profiles.split(",") if p]
+    paths = [p for p in args.paths.split(",") if p]
+    for name, allowed in (("profile", PROFILES), ("path", PATHS)):
+        unknown = [v for v in (profiles if name == "profile" else paths) if v not in allowed]
+        if unknown:
+            print(f"Unknown {name}: {', '.join(unknown)} (choose from {', '.join(allowed)})", file=sys.stderr)
+            return 2
+
+    manifest = args.manifest
+    if args.synthetic:
+        out_dir = args.synthetic_dir or tempfile.mkdtemp(prefix="mecam_bench_")
+        manifest = generate_synthetic_set(out_dir, fps=args.fps, size=(width, height))
+    clips = load_manifest(manifest, size=(width, height))
+    if not clips or not any(c["frames"] for c in clips):
+        print(f"No frames loaded from {manifest}", file=sys.stderr)
+        return 1
+
+    report = {"meta": _run_meta(args, clips), "results": {}}
+    for profile in profiles:
+        report["results"][profile] = {}
+        for path in paths:
+            print(f"[BENCH] {profile} / {path} ...", file=sys.stderr)
+            report["results"][profile][path] = bench_path(path, profile, clips, measure_alloc=not args.no_alloc)
+
+    output = args.output
+    if not output:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(REPO_DIR, "bench_results",
+                              f"motion_{report['meta']['host']}_{report['meta']['commit'] or 'nogit'}_{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_summary(report, baseline)
+    print(f"\nReport written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
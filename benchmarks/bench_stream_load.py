@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+Streaming Load Benchmark
+========================
+Ramps simulated viewers against ``/video_feed`` (plus optional
+``/api/snapshot.jpg`` long-poll clients) and reports, per step:
+- delivered FPS per client, frame age and skipped frames,
+- server CPU %, RSS and thread count (``/proc``),
+- motion-trigger latency: time from a walk-by entering the scene to the
+  motion event being logged, and how many events each walk-by produced.
+
+By default it starts its own server in a child process: ``create_lite_app``
+served by ``run_server`` with the bounded API/stream pools, as main_lite
+does (plain HTTP on 127.0.0.1, ``--api-workers``/``--max-streams`` override
+the ``server`` defaults; viewers beyond ``max_streams`` are refused and
+count as errors). The child has a scratch
+config/recordings directory and ``SyntheticStreamer`` in the camera slot,
+so it runs on any Linux box without a sensor and never touches the real
+config or recordings. Every synthetic frame carries its publish time and
+the start time of the current walk-by, which is how age and trigger latency
+are measured.
+
+The viewers run as threads of this process. On a single-core box they
+compete with the server for CPU. To load a real Pi, run the tool on another
+machine with ``--url`` (frame age and trigger latency then need the Pi to
+run the synthetic source, and a clock in sync).
+
+Usage:
+    python -m benchmarks.bench_stream_load --viewers 1,2,4,8 --duration 20
+    python -m benchmarks.bench_stream_load --viewers 4 --snapshot-clients 2 --tier low --analysis-pool
+    python -m benchmarks.bench_stream_load --url http://camera1.local:8080 --username admin --password ... --viewers 1,3
+"""
+
+import argparse
+import copy
+import http.client
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from src.camera.synthetic_streamer import read_stamp  # noqa: E402
+
+SESSION_FILE = "bench_session.json"
+STALL_GAP_SECONDS = 1.0
+
+
+def _percentiles(values, scale=1000.0):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * scale, 1)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * scale, 1)}
+
+
+# ============= SERVER UNDER TEST =============
+
+def _scratch_config(workdir: str, args) -> None:
+    """config/ for the child: repo defaults + synthetic camera + scratch storage"""
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    default_path = os.path.join(REPO_DIR, "config", "config_default.json")
+    shutil.copy(default_path, os.path.join(workdir, "config", "config_default.json"))
+    with open(default_path) as f:
+        cfg = json.load(f)
+    cfg = copy.deepcopy(cfg)
+    camera = cfg.setdefault("camera", {})
+    camera["backend"] = "replay"
+    camera["stream_fps"] = args.fps
+    camera["replay"] = dict(camera.get("replay") or {}, source="synthetic", fps=args.fps,
+                            synthetic_motion_every_seconds=args.motion_every,
+                            synthetic_motion_seconds=args.motion_seconds)
+    storage = cfg.setdefault("storage", {})
+    storage["recordings_dir"] = os.path.join(workdir, "recordings")
+    cfg["storage_encrypted_dir"] = os.path.join(workdir, "recordings_encrypted")
+    cfg.setdefault("analysis_pool", {})["enabled"] = bool(args.analysis_pool)
+    cfg["motion_record_enabled"] = True
+    cfg["nanny_cam_enabled"] = False
+    cfg["first_run_completed"] = True
+    server = cfg.setdefault("server", {})
+    if args.api_workers:
+        server["api_workers"] = args.api_workers
+    if args.max_streams:
+        server["max_streams"] = args.max_streams
+    with open(os.path.join(workdir, "config", "config.json"), "w") as f:
+        json.dump(cfg, f, indent=2)
+
+
+def serve(port: int) -> int:
+    """Child process: the app exactly as main_lite runs it, plus a pre-signed session for the viewers"""
+    from src.core import get_config
+    from src.utils.pi_detect import init_pi_detection
+    from src.utils.wsgi_server import run_server
+    from web.app_lite import create_lite_app
+
+    pi_model, camera_config = init_pi_detection()
+    camera_config = dict(camera_config or {}, mode="lite")
+    app = create_lite_app(pi_model, camera_config)
+    serializer = app.session_interface.get_signing_serializer(app)
+    with open(SESSION_FILE, "w") as f:
+        json.dump({"name": app.config["SESSION_COOKIE_NAME"], "value": serializer.dumps({"user": "bench"})}, f)
+    server_cfg = dict(get_config().get("server") or {}, host="127.0.0.1", port=port, tls=False, mode="bounded")
+    run_server(app, server_cfg)
+    return 0
+
+
+class LocalServer:
+    """Spawns the server under test in a scratch directory and tracks its CPU/RSS"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = args.workdir or tempfile.mkdtemp(prefix="mecam_load_")
+        self.port = args.port
+        self.proc = None
+        self.log = None
+
+    def start(self, timeout: float = 90.0) -> str:
+        _scratch_config(self.workdir, self.args)
+        self.log = open(os.path.join(self.workdir, "server.log"), "w")
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(self.port)],
+            cwd=self.workdir, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + timeout
+        session_path = os.path.join(self.workdir, SESSION_FILE)
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"Server exited ({self.proc.returncode}), see {self.log.name}")
+            if os.path.exists(session_path):
+                try:
+                    status, _, _ = _request("127.0.0.1", self.port, "/api/health", timeout=2)
+                    if status == 200:
+                        with open(session_path) as f:
+                            cookie = json.load(f)
+                        return f"{cookie['name']}={cookie['value']}"
+                except OSError:
+                    pass
+            time.sleep(0.5)
+        raise RuntimeError(f"Server not ready after {timeout:.0f}s, see {self.log.name}")
+
+    def sample(self) -> dict:
+        """Cumulative CPU seconds, RSS and threads of the server process"""
+        try:
+            with open(f"/proc/{self.proc.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+            return {
+                "cpu_seconds": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"),
+                "rss_bytes": int(status["VmRSS"].split()[0]) * 1024,
+                "threads": int(status["Threads"]),
+            }
+        except (OSError, KeyError, IndexError, ValueError):
+            return {}
+
+    def events(self) -> list:
+        """Motion events as logged; read from the scratch logs/ (motion_logger writes relative to the cwd)"""
+        try:
+            with open(os.path.join(self.workdir, "logs", "motion_events.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGINT)
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if self.log:
+            self.log.close()
+
+
+class RemoteServer:
+    """An already-running camera; RSS comes from its /metrics, CPU is not available"""
+
+    def __init__(self, args):
+        parts = urlsplit(args.url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.args = args
+        self.cookie = ""
+        self.metrics_denied = False
+
+    def start(self) -> str:
+        if self.args.username:
+            body = urlencode({"username": self.args.username, "password": self.args.password or ""})
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+            conn.request("POST", "/login", body, {"Content-Type": "application/x-www-form-urlencoded"})
+            resp = conn.getresponse()
+            resp.read()
+            self.cookie = "; ".join(v.split(";", 1)[0] for k, v in resp.getheaders() if k.lower() == "set-cookie")
+            conn.close()
+            if not self.cookie:
+                raise RuntimeError(f"Login failed ({resp.status})")
+        return self.cookie
+
+    def sample(self) -> dict:
+        try:
+            # /metrics needs the login session (or the metrics bearer token) from a remote host
+            headers = {"Authorization": f"Bearer {self.args.metrics_token}"} if self.args.metrics_token else None
+            status, _, body = _request(self.host, self.port, "/metrics", self.cookie, timeout=3, headers=headers)
+        except (OSError, http.client.HTTPException):
+            return {}
+        if status != 200:
+            if not self.metrics_denied:
+                self.metrics_denied = True
+                print(f"[BENCH] /metrics returned {status}, no RSS (log in with --username or pass --metrics-token)",
+                      file=sys.stderr)
+            return {}
+        for line in body.decode(errors="replace").splitlines():
+            if line.startswith("mecam_process_resident_memory_bytes"):
+                return {"rss_bytes": float(line.split()[-1])}
+        return {}
+
+    def events(self) -> list:
+        try:
+            status, _, body = _request(self.host, self.port, "/api/motion/events?limit=50", self.cookie, timeout=5)
+            return json.loads(body).get("events") or [] if status == 200 else []
+        except (OSError, ValueError, http.client.HTTPException):
+            return []
+
+    def stop(self):
+        pass
+
+
+# ============= CLIENTS =============
+
+def _request(host, port, path, cookie="", timeout=5.0, headers=None):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("GET", path, headers=dict(headers or {}, Cookie=cookie) if cookie else (headers or {}))
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+
+class FrameLog:
+    """Arrival time + stamp of every frame one client received"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.frames = []  # (arrival unix time, stamp or None)
+        self.errors = 0
+        self.connected_at = None
+
+    def add(self, jpeg: bytes):
+        self.frames.append((time.time(), read_stamp(jpeg)))
+
+    def window(self, start: float, end: float) -> dict:
+        frames = [f for f in self.frames if start <= f[0] < end]
+        ages = [arrival - stamp[1] for arrival, stamp in frames if stamp]
+        seqs = [stamp[0] for _, stamp in frames if stamp]
+        gaps = [b[0] - a[0] for a, b in zip(frames, frames[1:])]
+        skipped = sum(max(0, b - a - 1) for a, b in zip(seqs, seqs[1:]))
+        return {
+            "client": self.name,
+            "frames": len(frames),
+            "fps": round(len(frames) / (end - start), 2) if end > start else 0.0,
+            "age_ms": _percentiles(ages),
+            "skipped_source_frames": skipped if seqs else None,
+            "stalls": sum(1 for g in gaps if g >= STALL_GAP_SECONDS),
+            "max_gap_ms": round(max(gaps) * 1000, 1) if gaps else None,
+            "errors": self.errors,
+        }
+
+
+def _viewer(host, port, cookie, tier, log: FrameLog, stop: threading.Event):
+    """One MJPEG viewer: frames are cut at EOI so a frame counts the moment its last byte arrives"""
+    query = urlencode({"tier": tier, "adaptive": "0"}) if tier else ""
+    while not stop.is_set():
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        try:
+            conn.request("GET", "/video_feed" + (f"?{query}" if query else ""), headers={"Cookie": cookie})
+            resp = conn.getresponse()
+            if resp.status != 200:
+                log.errors += 1
+                resp.read()
+                stop.wait(1.0)
+                continue
+            log.connected_at = log.connected_at or time.time()
+            buf = b""
+            while not stop.is_set():
+                chunk = resp.read1(65536)
+                if not chunk:
+                    break
+                buf += chunk
+                while True:
+                    head = buf.find(b"\r\n\r\n")
+                    if head < 0:
+                        break
+                    end = buf.find(b"\xff\xd9\r\n", head)
+                    if end < 0:
+                        break
+                    log.add(buf[head + 4:end + 2])
+                    buf = buf[end + 4:]
+        except (OSError, http.client.HTTPException):
+            if not stop.is_set():
+                log.errors += 1
+                stop.wait(0.5)
+        finally:
+            conn.close()
+
+
+def _snapshot_client(host, port, cookie, log: FrameLog, stop: threading.Event, on_frame=None):
+    """Long-polls /api/snapshot.jpg?wait= with the previous ETag (next frame as soon as it exists)"""
+    etag = None
+    while not stop.is_set():
+        headers = {"If-None-Match": etag} if etag else {}
+        try:
+            status, resp_headers, body = _request(host, port, "/api/snapshot.jpg?wait=2000", cookie,
+                                                  timeout=5, headers=headers)
+        except (OSError, http.client.HTTPException):
+            log.errors += 1
+            stop.wait(0.5)
+            continue
+        if status == 200:
+            etag = resp_headers.get("ETag") or resp_headers.get("Etag")
+            log.add(body)
+            if on_frame:
+                on_frame(body)
+        elif status != 304:
+            log.errors += 1
+            stop.wait(0.5)
+
+
+class MotionWatch:
+    """Walk-by start times (from frame stamps) and logged motion events (from the server)"""
+
+    def __init__(self, server):
+        self.server = server
+        self.bursts = set()
+        self.events = {}  # id -> unix time
+        self.lock = threading.Lock()
+
+    def note_frame(self, jpeg: bytes):
+        stamp = read_stamp(jpeg)
+        if stamp and stamp[2] > 0:
+            with self.lock:
+                self.bursts.add(round(stamp[2], 6))
+
+    def poll_events(self, stop: threading.Event):
+        while not stop.wait(0.5):
+            for event in self.server.events():
+                ts = event.get("unix_timestamp")
+                if event.get("id") and isinstance(ts, (int, float)):
+                    with self.lock:
+                        self.events.setdefault(event["id"], float(ts))
+
+    def window(self, start: float, end: float, motion_every: float) -> dict:
+        with self.lock:
+            bursts = sorted(b for b in self.bursts if start <= b < end)
+            events = sorted(self.events.values())
+        latencies, per_burst, missed = [], [], 0
+        for burst in bursts:
+            horizon = burst + (motion_every or 10.0)
+            hits = [t for t in events if burst <= t < horizon]
+            per_burst.append(len(hits))
+            if hits:
+                latencies.append(hits[0] - burst)
+            else:
+                missed += 1
+        return {
+            "bursts": len(bursts),
+            "detected": len(bursts) - missed,
+            "missed": missed,
+            "trigger_latency_ms": _percentiles(latencies),
+            "events_per_burst": round(sum(per_burst) / len(per_burst), 2) if per_burst else None,
+        }
+
+
+# ============= RUN =============
+
+def run_step(host, port, cookie, server, viewers, args, watch) -> dict:
+    stop = threading.Event()
+    logs, threads = [], []
+    for i in range(viewers):
+        log = FrameLog(f"viewer-{i}")
+        logs.append(log)
+        threads.append(threading.Thread(target=_viewer, args=(host, port, cookie, args.tier, log, stop),
+                                         name=f"bench-viewer-{i}", daemon=True))
+    for i in range(args.snapshot_clients):
+        log = FrameLog(f"snapshot-{i}")
+        logs.append(log)
+        threads.append(threading.Thread(target=_snapshot_client, args=(host, port, cookie, log, stop),
+                                         name=f"bench-snapshot-{i}", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.warmup)
+    samples = []
+    start = time.time()
+    previous = server.sample()
+    previous_at = time.monotonic()
+    while time.time() - start < args.duration:
+        time.sleep(1.0)
+        current, now = server.sample(), time.monotonic()
+        sample = {"rss_mb": round(current["rss_bytes"] / 1048576, 1) if current.get("rss_bytes") else None,
+                  "threads": current.get("threads")}
+        if "cpu_seconds" in current and "cpu_seconds" in previous:
+            sample["cpu_pct"] = round((current["cpu_seconds"] - previous["cpu_seconds"]) / (now - previous_at) * 100, 1)
+        samples.append(sample)
+        previous, previous_at = current, now
+    end = time.time()
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=6)
+
+    clients = [log.window(start, end) for log in logs]
+    viewer_stats = [c for c in clients if c["client"].startswith("viewer")]
+    fps = [c["fps"] for c in viewer_stats]
+    ages = []
+    for log in logs[:viewers]:
+        ages.extend(arrival - stamp[1] for arrival, stamp in log.frames if stamp and start <= arrival < end)
+    cpu = [s["cpu_pct"] for s in samples if s.get("cpu_pct") is not None]
+    rss = [s["rss_mb"] for s in samples if s.get("rss_mb") is not None]
+    return {
+        "viewers": viewers,
+        "snapshot_clients": args.snapshot_clients,
+        "seconds": round(end - start, 1),
+        "fps": {"min": min(fps) if fps else None, "mean": round(sum(fps) / len(fps), 2) if fps else None,
+                "max": max(fps) if fps else None},
+        "age_ms": _percentiles(ages),
+        "server": {
+            "cpu_pct_mean": round(sum(cpu) / len(cpu), 1) if cpu else None,
+            "cpu_pct_max": max(cpu) if cpu else None,
+            "rss_mb_max": max(rss) if rss else None,
+            "threads_max": max((s["threads"] for s in samples if s.get("threads")), default=None),
+        },
+        "motion": watch.window(start, end, args.motion_every),
+        "clients": clients,
+    }
+
+
+def _print_step(step):
+    age = step["age_ms"]
+    motion = step["motion"]
+    latency = motion["trigger_latency_ms"]
+    print(f"{step['viewers']:>7} {step['fps']['min'] or 0:>7.1f} {step['fps']['mean'] or 0:>7.1f} "
+          f"{age.get('p50', 0):>8.0f} {age.get('p95', 0):>8.0f} "
+          f"{step['server']['cpu_pct_mean'] or 0:>6.1f} {step['server']['rss_mb_max'] or 0:>7.1f} "
+          f"{motion['detected']:>3}/{motion['bursts']:<3} {latency.get('p50', 0):>8.0f} "
+          f"{motion['events_per_burst'] if motion['events_per_burst'] is not None else '-':>6}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent /video_feed load benchmark for ME_CAM")
+    parser.add_argument("--viewers", default="1,2,4,8", help="Comma list of viewer counts to step through")
+    parser.add_argument("--snapshot-clients", type=int, default=0, help="/api/snapshot.jpg long-poll clients per step")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds after the clients connect")
+    parser.add_argument("--tier", default="standard", help="Quality tier the viewers request ('' = server default)")
+    parser.add_argument("--fps", type=int, default=15, help="Synthetic camera frame rate")
+    parser.add_argument("--motion-every", type=float, default=10, help="Seconds between synthetic walk-bys (0 = none)")
+    parser.add_argument("--motion-seconds", type=float, default=3, help="Duration of one walk-by")
+    parser.add_argument("--analysis-pool", action="store_true", help="Enable the motion analysis worker pool")
+    parser.add_argument("--port", type=int, default=18080, help="Port of the spawned server")
+    parser.add_argument("--workdir", help="Scratch directory for the spawned server (default: temp dir)")
+    parser.add_argument("--api-workers", type=int, default=0, help="server.api_workers of the spawned server")
+    parser.add_argument("--max-streams", type=int, default=0, help="server.max_streams of the spawned server")
+    parser.add_argument("--url", help="Load an already-running camera instead of spawning one")
+    parser.add_argument("--username", help="Login for --url")
+    parser.add_argument("--password", help="Password for --url")
+    parser.add_argument("--metrics-token", default=os.environ.get("MECAM_METRICS_TOKEN", ""),
+                        help="Bearer token for /metrics on --url (default $MECAM_METRICS_TOKEN)")
+    parser.add_argument("--output", help="Report path (default bench_results/stream_load_<host>_<commit>_<time>.json)")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.serve:
+        return serve(args.port)
+
+    steps = [int(v) for v in args.viewers.split(",") if v.strip()]
+    server = RemoteServer(args) if args.url else LocalServer(args)
+    host, port = (server.host, server.port) if args.url else ("127.0.0.1", args.port)
+    print(f"[BENCH] Starting {'remote session' if args.url else 'server'} ...", file=sys.stderr)
+    cookie = server.start()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5, cwd=REPO_DIR).stdout.strip()
+    except Exception:
+        commit = ""
+    report = {
+        "meta": {
+            "benchmark": "stream_load",
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "commit": commit or None,
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "target": args.url or "spawned",
+            "tier": args.tier,
+            "fps": args.fps,
+            "motion_every": args.motion_every,
+            "analysis_pool": bool(args.analysis_pool),
+        },
+        "steps": [],
+    }
+
+    watch = MotionWatch(server)
+    stop = threading.Event()
+    # One stamp watcher outside the measured clients so walk-bys are seen at every step
+    stamp_log = FrameLog("stamp-watch")
+    watchers = [
+        threading.Thread(target=watch.poll_events, args=(stop,), name="bench-events", daemon=True),
+        threading.Thread(target=_snapshot_client, args=(host, port, cookie, stamp_log, stop, watch.note_frame),
+                         name="bench-stamps", daemon=True),
+    ]
+    for thread in watchers:
+        thread.start()
+
+    print(f"\n{'viewers':>7} {'fps.min':>7} {'fps.avg':>7} {'age.p50':>8} {'age.p95':>8} "
+          f"{'cpu%':>6} {'rss MB':>7} {'motion':>7} {'trig.p50':>8} {'ev/brst':>6}")
+    try:
+        for viewers in steps:
+            step = run_step(host, port, cookie, server, viewers, args, watch)
+            report["steps"].append(step)
+            _print_step(step)
+    except KeyboardInterrupt:
+        print("Interrupted, writing partial report", file=sys.stderr)
+    finally:
+        stop.set()
+        server.stop()
+
+    output = args.output
+    if not output:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(REPO_DIR, "bench_results",
+                              f"stream_load_{report['meta']['host']}_{commit or 'nogit'}_{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark Footage
+=================
+Labelled clips for the benchmarks: a manifest of recorded clips or a
+synthetic set generated on the spot, so the benchmarks also run on any
+Linux box with no camera and no footage.
+
+Manifest (JSON, paths relative to the manifest):
+    {"clips": [
+        {"name": "porch_day", "source": "porch_day.mp4", "fps": 15,
+         "events": [{"start": 2.0, "end": 5.5, "type": "person"}]}
+    ]}
+
+``source`` is anything ReplayStreamer plays (JPEG directory, .mjpeg, video).
+Event times are seconds from the start of the clip; frames outside every
+event are negatives.
+
+Synthetic clips are a textured static scene with sensor noise, where:
+- ``person`` and ``vehicle`` segments are labelled motion,
+- ``lighting`` (a global brightness ramp) and ``small`` (a cat-sized blob)
+  segments are distractors that should not trigger a recording.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from src.camera.synthetic_streamer import SyntheticScene
+
+DEFAULT_SIZE = (640, 480)
+
+# (kind, seconds) timeline of the synthetic set; idle stretches separate segments
+SYNTHETIC_TIMELINES = {
+    "walkby": [("idle", 3), ("person", 4), ("idle", 4), ("person", 3), ("idle", 3)],
+    "driveway": [("idle", 2), ("vehicle", 2.5), ("idle", 4), ("small", 4), ("idle", 2)],
+    "porch_light": [("idle", 2), ("lighting", 3), ("idle", 3), ("person", 4), ("idle", 2), ("lighting", 3), ("idle", 2)],
+}
+MOTION_KINDS = ("person", "vehicle")
+
+
+def generate_synthetic_set(out_dir: str, fps: float = 15, size: Tuple[int, int] = DEFAULT_SIZE,
+                           quality: int = 85, seed: int = 7) -> str:
+    """Write the synthetic clips as .mjpeg files plus manifest.json; returns the manifest path"""
+    import cv2
+
+    os.makedirs(out_dir, exist_ok=True)
+    clips = []
+    for index, (name, timeline) in enumerate(sorted(SYNTHETIC_TIMELINES.items())):
+        scene = SyntheticScene(size=size, seed=seed + index)
+        source = f"{name}.mjpeg"
+        with open(os.path.join(out_dir, source), "wb") as f:
+            for bgr, _ in scene.frames_for(timeline, fps):
+                f.write(cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+        events, t = [], 0.0
+        for kind, seconds in timeline:
+            duration = max(1, int(round(seconds * fps))) / fps
+            if kind != "idle":
+                events.append({"start": round(t, 3), "end": round(t + duration, 3), "type": kind})
+            t += duration
+        clips.append({
+            "name": name,
+            "source": source,
+            "fps": fps,
+            # Distractors stay in the manifest for reporting but are not labelled motion
+            "events": [e for e in events if e["type"] in MOTION_KINDS],
+            "distractors": [e for e in events if e["type"] not in MOTION_KINDS],
+        })
+    manifest = os.path.join(out_dir, "manifest.json")
+    with open(manifest, "w") as f:
+        json.dump({"synthetic": True, "seed": seed, "clips": clips}, f, indent=2)
+    return manifest
+
+
+def load_manifest(path: str, size: Optional[Tuple[int, int]] = None, quality: int = 85) -> List[Dict]:
+    """Clips from a manifest with their frames loaded as JPEG bytes and per-frame labels"""
+    from src.camera.replay_streamer import load_jpeg_frames
+
+    with open(path) as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    clips = []
+    for clip in manifest.get("clips", []):
+        fps = float(clip.get("fps", 15) or 15)
+        source = clip["source"] if os.path.isabs(clip["source"]) else os.path.join(base, clip["source"])
+        frames = load_jpeg_frames(source, quality=quality, size=size)
+        events = sorted(clip.get("events", []), key=lambda e: e["start"])
+        labels = [any(e["start"] <= i / fps < e["end"] for e in events) for i in range(len(frames))]
+        clips.append(dict(clip, fps=fps, frames=frames, labels=labels, events=events))
+    return clips
@@ -1,13 +1,169 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, Response, jsonify, request, session
+import hmac
 import json
+import os
+import secrets
+
+from src.streaming.mjpeg_relay import MjpegRelay
+from src.networking.fleet_events import FleetEventSearch
+
+app = Flask(__name__, template_folder='web/templates', static_folder='web/static')
+# Sessions only avoid re-checking the password hash on every tile request;
+# a random key means a hub restart simply asks for the login again.
+app.secret_key = os.environ.get("MECAM_HUB_SECRET") or secrets.token_hex(32)
+app.config.update(SESSION_COOKIE_HTTPONLY=True, SESSION_COOKIE_SAMESITE="Lax")
+
+HUB_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hub_config.json")
+
+
+def load_devices():
+    with open(HUB_CONFIG) as f:
+        return json.load(f)
+
+
+def load_search_devices():
+    """Hub cameras plus the devices registered in the dashboard (config "devices"), deduplicated by URL."""
+    devices = [d for d in load_devices() if d.get("url")]
+    seen = {d["url"].rstrip("/") for d in devices}
+    try:
+        from src.core import get_config
+        for dev in get_config().get("devices", []):
+            host = (dev.get("ip") or dev.get("id") or "").strip()
+            url = (dev.get("url") or (f"http://{host}:8080" if host else "")).rstrip("/")
+            if url and url not in seen:
+                seen.add(url)
+                devices.append({"name": dev.get("name") or host, "url": url})
+    except Exception:
+        pass
+    return devices
+
+
+def _hub_authorized() -> bool:
+    """Session from an earlier login, a camera user account (HTTP Basic), or MECAM_HUB_TOKEN (Bearer)."""
+    if session.get("hub_user"):
+        return True
+    header = request.headers.get("Authorization", "")
+    token = os.environ.get("MECAM_HUB_TOKEN", "")
+    if token and header.startswith("Bearer ") and hmac.compare_digest(header[7:].strip(), token):
+        return True
+    auth = request.authorization
+    if auth and auth.type == "basic" and auth.username and auth.password:
+        from src.core import authenticate
+        if authenticate(auth.username, auth.password):
+            session["hub_user"] = auth.username
+            return True
+    return False
+
+
+@app.before_request
+def require_hub_login():
+    # The hub logs into every camera with stored credentials, so nothing it
+    # serves (relay frames, events, stats, the wall itself) may be anonymous.
+    if request.endpoint == "static":
+        return None
+    if _hub_authorized():
+        return None
+    response = jsonify({"error": "Authentication required"})
+    response.status_code = 401
+    response.headers["WWW-Authenticate"] = 'Basic realm="ME_CAM hub", charset="UTF-8"'
+    return response
+
+
+# A silent upstream gets a keepalive frame every RELAY_KEEPALIVE_SECONDS; the
+# stream ends after RELAY_MAX_EMPTY_POLLS of those so its thread is released.
+RELAY_KEEPALIVE_SECONDS = 5.0
+RELAY_MAX_EMPTY_POLLS = 12
+
+# One upstream per camera, shared by every browser tile on the hub
+relay = MjpegRelay(load_devices())
+event_search = FleetEventSearch(load_search_devices())
 
-app = Flask(__name__)
 
 @app.route("/")
 def index():
-    with open("hub_config.json") as f:
-        devices = json.load(f)
+    devices = []
+    for i, dev in enumerate(load_devices()):
+        dev = dict(dev)
+        dev.setdefault("id", str(i))
+        dev["tile_url"] = f"/relay/{i}/stream?tile=1"
+        dev["stream_url"] = f"/relay/{i}/stream"
+        devices.append(dev)
     return render_template("multicam.html", devices=devices)
 
+
+@app.route("/relay/<int:index>/stream")
+def relay_stream(index):
+    upstream = relay.get(index)
+    if upstream is None:
+        return jsonify({"error": "Unknown camera"}), 404
+    tile = request.args.get("tile", "0").lower() in ("1", "true", "yes")
+
+    def generate():
+        viewer = upstream.subscribe(tile=tile)
+        last = None
+        empty_polls = 0
+        try:
+            while True:
+                jpeg = viewer.get(timeout=RELAY_KEEPALIVE_SECONDS)
+                if jpeg is None:
+                    # Upstream is down: resend the last frame so a closed client is
+                    # noticed on write, and give up once the camera stays silent.
+                    empty_polls += 1
+                    if empty_polls >= RELAY_MAX_EMPTY_POLLS:
+                        break
+                    if last is None:
+                        continue
+                    jpeg = last
+                else:
+                    empty_polls = 0
+                    last = jpeg
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            upstream.unsubscribe(viewer)
+
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route("/relay/<int:index>/snapshot.jpg")
+def relay_snapshot(index):
+    upstream = relay.get(index)
+    if upstream is None:
+        return jsonify({"error": "Unknown camera"}), 404
+    jpeg = upstream.latest
+    if jpeg is None:
+        # Cold camera: open the upstream just long enough for one frame
+        viewer = upstream.subscribe(tile=False)
+        try:
+            jpeg = viewer.get(timeout=5.0)
+        finally:
+            upstream.unsubscribe(viewer)
+    if jpeg is None:
+        return jsonify({"error": "No frame available"}), 503
+    response = Response(jpeg, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-cache, private'
+    return response
+
+
+@app.route("/api/events/search")
+def events_search():
+    """Motion events from every camera, newest first: ?hours=&type=&limit=&cursor="""
+    try:
+        page = event_search.search(
+            hours=request.args.get("hours", 24, type=int),
+            event_type=request.args.get("type") or None,
+            limit=request.args.get("limit", 50, type=int),
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify(page)
+
+
+@app.route("/relay/stats")
+def relay_stats():
+    return jsonify(relay.get_stats())
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8090)
+    app.run(host="0.0.0.0", port=8090, threaded=True)
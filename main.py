@@ -20,6 +20,8 @@ import time
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+from src.utils import startup_report
+
 # ============================================================================
 # PHASE 1: Hardware Detection & Initialization
 # ============================================================================
@@ -81,14 +83,16 @@ if use_lite:
     from src.utils.pi_detect import get_camera_config
     
     camera_config = get_camera_config(pi_model_info)
-    app = create_lite_app(pi_model_info, camera_config)
+    with startup_report.phase('app'):
+        app = create_lite_app(pi_model_info, camera_config)
     fast_motion_detector = False
     app_version = "LITE"
 else:
     logger.info(f"\n[APP] Loading FULL version for {pi_model_info['name']}")
     logger.info(f"[APP] Performance mode: {pi_model_info['recommended_mode']}")
     
-    from web.app import app, fast_motion_detector
+    with startup_report.phase('app'):
+        from web.app import app, fast_motion_detector
     app_version = "FULL"
 
 # ============================================================================
@@ -185,6 +189,8 @@ if __name__ == "__main__":
     logger.info(f"[SERVER] Camera rotation: {camera_rotation or 'none'}")
     logger.info("=" * 70)
     
-    # Run Flask app
-    app.run(host="0.0.0.0", port=8080, debug=False, use_reloader=False, threaded=True)
+    # Run Flask app (bounded API/stream pools, graceful camera shutdown on SIGTERM)
+    from src.core import get_config
+    from src.utils.wsgi_server import run_server
+    run_server(app, get_config().get('server', {}))
 
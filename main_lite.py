@@ -19,9 +19,17 @@ import sys
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from web.app_lite import create_lite_app
+from src.utils import startup_report
+
+# Timed for the boot report; everything heavier loads lazily on first use
+with startup_report.phase('imports'):
+    startup_report.timed_import('flask')
+    startup_report.timed_import('src.core')
+    create_lite_app = startup_report.timed_import('web.app_lite').create_lite_app
+
 from src.utils.pi_detect import init_pi_detection
-from src.core import get_sms_notifier
+from src.core import get_sms_notifier, get_config
+from src.utils.wsgi_server import run_server
 
 os.makedirs("logs", exist_ok=True)
 
@@ -49,32 +57,22 @@ if __name__ == "__main__":
         logger.error(f"[SMS] Failed to initialize notifier: {e}")
     
     # Create lightweight Flask app
-    app = create_lite_app(pi_model, camera_config)
+    with startup_report.phase('app'):
+        app = create_lite_app(pi_model, camera_config)
     
-    # Run Flask with HTTPS support
+    # Serve with bounded API/stream pools (config "server"; mode "werkzeug" = old dev server)
     cert_file = os.path.join(os.path.dirname(__file__), 'certs', 'certificate.pem')
     key_file = os.path.join(os.path.dirname(__file__), 'certs', 'private_key.pem')
+    server_cfg = get_config().get('server', {}) or {}
     
-    if os.path.exists(cert_file) and os.path.exists(key_file):
+    if os.path.exists(cert_file) and os.path.exists(key_file) and server_cfg.get('tls', True):
         logger.info("[HTTPS] Running with SSL/TLS (https://me_cam.com:8080)")
         logger.info("[HTTPS] Certificate supports: me_cam.com, localhost, 127.0.0.1, and VPN networks")
-        # Use ssl_context with proper configuration for VPN support
-        app.run(
-            host="0.0.0.0", 
-            port=8080, 
-            debug=False, 
-            ssl_context=(cert_file, key_file),
-            threaded=True,
-            use_reloader=False  # Disable reloader on Pi Zero (saves memory)
-        )
+    elif server_cfg.get('trust_proxy'):
+        logger.info("[HTTPS] TLS terminated by the reverse proxy")
     else:
         logger.warning("[HTTPS] Certificates not found, running without SSL")
         logger.info("[HTTP] Access at: http://[DEVICE-IP]:8080")
         logger.info("[NETWORK] ⚠️ WARNING: HTTPS not available. VPN connections may be insecure!")
-        app.run(
-            host="0.0.0.0", 
-            port=8080, 
-            debug=False,
-            threaded=True,
-            use_reloader=False
-        )
+    
+    run_server(app, server_cfg, cert_file=cert_file, key_file=key_file)
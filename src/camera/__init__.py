@@ -1,18 +1,29 @@
-"""Camera streaming and coordination"""
-from .camera_coordinator import camera_coordinator
-from .libcamera_streamer import LibcameraStreamer, is_libcamera_available
-from .rpicam_streamer import RpicamStreamer, is_rpicam_available
+"""Camera streaming and coordination
 
-try:
-    from .fast_camera_streamer import FastCameraStreamer, FastMotionDetector, PICAMERA2_AVAILABLE
-except ImportError:
-    FastCameraStreamer = None
-    FastMotionDetector = None
-    PICAMERA2_AVAILABLE = False
+Backends are imported on first use, so the rpicam path does not pay for
+numpy and picamera2 at boot. ``camera_coordinator`` stays eager: it shares
+its name with its submodule, and importing the submodule would replace a
+lazy export with the module object.
+"""
+from .camera_coordinator import camera_coordinator
+from src.utils.lazy_import import lazy_exports
 
 __all__ = [
     'camera_coordinator',
     'LibcameraStreamer', 'is_libcamera_available',
     'RpicamStreamer', 'is_rpicam_available',
+    'ReplayStreamer', 'SyntheticStreamer',
     'FastCameraStreamer', 'FastMotionDetector', 'PICAMERA2_AVAILABLE'
 ]
+
+__getattr__ = lazy_exports(__name__, {
+    'LibcameraStreamer': '.libcamera_streamer',
+    'is_libcamera_available': '.libcamera_streamer',
+    'RpicamStreamer': '.rpicam_streamer',
+    'is_rpicam_available': '.rpicam_streamer',
+    'ReplayStreamer': '.replay_streamer',
+    'SyntheticStreamer': '.synthetic_streamer',
+    'FastCameraStreamer': '.fast_camera_streamer',
+    'FastMotionDetector': '.fast_camera_streamer',
+    'PICAMERA2_AVAILABLE': '.fast_camera_streamer',
+}, optional={'FastCameraStreamer': None, 'FastMotionDetector': None, 'PICAMERA2_AVAILABLE': False})
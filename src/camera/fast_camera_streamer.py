@@ -5,21 +5,35 @@ Continuous stream like Tkinter GUI - 15-30 FPS possible
 """
 import io
 import time
-from threading import Thread, Lock, Event
+from threading import Thread, Lock, Event, Condition
 from queue import Queue
 from loguru import logger
+from src.utils.perf_metrics import observe
 import numpy as np
 
 try:
     from picamera2 import Picamera2
-    from picamera2.encoders import JpegEncoder, H264Encoder
-    from picamera2.outputs import FileOutput
+    from picamera2.encoders import JpegEncoder, MJPEGEncoder, H264Encoder, Quality
+    from picamera2.outputs import Output, FileOutput, CircularOutput
+    from libcamera import Transform
     PICAMERA2_AVAILABLE = True
 except ImportError:
+    Output = object
     PICAMERA2_AVAILABLE = False
     logger.warning("[CAMERA] picamera2 not available, falling back to libcamera-still")
 
 
+class _CallbackOutput(Output):
+    """Encoder output that hands each encoded frame to a callback (no file, no copy)."""
+
+    def __init__(self, on_frame):
+        super().__init__()
+        self._on_frame = on_frame
+
+    def outputframe(self, frame, *args, **kwargs):
+        self._on_frame(frame)
+
+
 class FastCameraStreamer:
     """
     High-performance camera streamer using continuous capture
@@ -31,20 +45,60 @@ class FastCameraStreamer:
     This is why your Tkinter GUI is faster!
     """
     
-    def __init__(self, width=640, height=480, fps=40, performance_mode=True):
+    def __init__(self, width=640, height=480, fps=40, performance_mode=True,
+                 recording_size=None, recording_bitrate=2_000_000, preroll_seconds=3,
+                 rotation=0, hflip=False, vflip=False, hardware_jpeg=True):
+        """
+        Args:
+            width, height: Live view / detection resolution
+            recording_size: (w, h) for the full-resolution ``main`` stream. When set,
+                the camera runs dual-stream: ``main`` feeds the hardware H.264
+                encoder and a YUV420 ``lores`` stream (width x height) feeds the
+                live view and motion detection.
+            recording_bitrate: H.264 bitrate for the ``main`` stream
+            preroll_seconds: Seconds of encoded video kept before a recording starts
+            rotation, hflip, vflip: Orientation. Flips and 180 degrees are applied by
+                the sensor Transform (free); 90/270 need a software rotate per frame.
+            hardware_jpeg: Encode the live view with the ISP JPEG encoder, once per
+                frame, instead of cv2.imencode in the capture loop
+        """
         self.width = width
         self.height = height
         self.fps = fps
         self.performance_mode = performance_mode
         self.jpeg_quality = 70 if performance_mode else 85  # 70 = fast, 85 = high quality
+        self.recording_size = tuple(recording_size) if recording_size else None
+        self.recording_bitrate = int(recording_bitrate)
+        self.preroll_seconds = max(0, int(preroll_seconds))
+        self.dual_stream = self.recording_size is not None
+        rotation = int(rotation or 0) % 360
+        if rotation == 180:
+            hflip, vflip = not hflip, not vflip
+            rotation = 0
+        self.hflip = bool(hflip)
+        self.vflip = bool(vflip)
+        self.rotation = rotation
+        # A software rotate can't happen inside the hardware encoder
+        self.hardware_jpeg = hardware_jpeg and rotation == 0
         self.camera = None
         self.running = False
         self.frame_queue = Queue(maxsize=4)  # Increased from 2 for smoother flow and motion detection
         self.current_jpeg = None
+        self.jpeg_seq = 0
+        self.current_luma = None
+        self.lores_stride = width
         self.lock = Lock()
+        self.jpeg_ready = Condition(self.lock)
         self.capture_thread = None
         self.frame_count = 0
         self.start_time = time.time()
+        self.encoder = None
+        self.circular_output = None
+        self.recording_path = None
+        self.jpeg_encoder = None
+        self.jpeg_encoder_name = None
+        self.live_h264_encoder = None
+        self.live_h264_subscribers = []
         
     def start(self):
         """Start continuous camera capture in background thread"""
@@ -55,27 +109,120 @@ class FastCameraStreamer:
         try:
             self.camera = Picamera2()
             
-            # Configure for fast JPEG streaming
-            config = self.camera.create_still_configuration(
-                main={"size": (self.width, self.height), "format": "RGB888"},
-                buffer_count=2  # Double buffering for speed
-            )
+            if self.dual_stream:
+                # Full-resolution main for the H.264 encoder, small YUV420 lores for live view + motion
+                config = self.camera.create_video_configuration(
+                    main={"size": self.recording_size, "format": "YUV420"},
+                    lores={"size": (self.width, self.height), "format": "YUV420"},
+                    controls={"FrameRate": float(self.fps)},
+                    transform=Transform(hflip=self.hflip, vflip=self.vflip),
+                    buffer_count=4
+                )
+            else:
+                # Configure for fast JPEG streaming
+                config = self.camera.create_still_configuration(
+                    main={"size": (self.width, self.height), "format": "RGB888"},
+                    transform=Transform(hflip=self.hflip, vflip=self.vflip),
+                    buffer_count=2  # Double buffering for speed
+                )
             self.camera.configure(config)
+            if self.dual_stream:
+                self.lores_stride = self.camera.stream_configuration("lores")["stride"]
             self.camera.start()
+
+            if self.dual_stream:
+                self._start_preroll_encoder()
+            if self.hardware_jpeg:
+                self._start_jpeg_encoder()
             
             # Wait for camera to warm up
             time.sleep(0.5)
             
             self.running = True
+            self.start_time = time.time()
             self.capture_thread = Thread(target=self._capture_loop, daemon=True)
             self.capture_thread.start()
             
-            logger.success(f"[CAMERA] Fast streamer started: {self.width}x{self.height} @ {self.fps} FPS")
+            if self.dual_stream:
+                rec_w, rec_h = self.recording_size
+                logger.success(f"[CAMERA] Fast streamer started (dual-stream): record {rec_w}x{rec_h} H.264, "
+                               f"detect {self.width}x{self.height} YUV420 @ {self.fps} FPS")
+            else:
+                logger.success(f"[CAMERA] Fast streamer started: {self.width}x{self.height} @ {self.fps} FPS")
+            logger.info(f"[CAMERA] Live view JPEG: {self.jpeg_encoder_name or 'software (cv2)'}")
             return True
             
         except Exception as e:
             logger.error(f"[CAMERA] Failed to start fast streamer: {e}")
             return False
+
+    def _start_preroll_encoder(self):
+        """Keep the hardware encoder running into a ring buffer so clips include pre-motion video."""
+        try:
+            self.encoder = H264Encoder(bitrate=self.recording_bitrate, repeat=True)
+            self.circular_output = CircularOutput(buffersize=max(1, int(self.fps * self.preroll_seconds)))
+            self.camera.start_encoder(self.encoder, self.circular_output, name="main")
+            logger.info(f"[CAMERA] Hardware H.264 pre-roll running ({self.preroll_seconds}s)")
+        except Exception as e:
+            logger.warning(f"[CAMERA] Hardware encoder unavailable, recording disabled: {e}")
+            self.encoder = None
+            self.circular_output = None
+
+    def _jpeg_quality_preset(self):
+        """Map the numeric JPEG quality onto picamera2's encoder presets."""
+        if self.jpeg_quality >= 90:
+            return Quality.VERY_HIGH
+        if self.jpeg_quality >= 80:
+            return Quality.HIGH
+        if self.jpeg_quality >= 65:
+            return Quality.MEDIUM
+        return Quality.LOW
+
+    def _start_jpeg_encoder(self):
+        """
+        Encode the live-view stream once per frame, off the capture loop.
+
+        Tries the ISP/V4L2 MJPEG encoder first, then picamera2's threaded
+        JpegEncoder; if both fail the capture loop falls back to cv2.imencode.
+        """
+        stream = "lores" if self.dual_stream else "main"
+        output = _CallbackOutput(self._publish_jpeg)
+        candidates = (
+            ("hardware MJPEG", MJPEGEncoder, {"quality": self._jpeg_quality_preset()}),
+            ("JpegEncoder", lambda: JpegEncoder(q=self.jpeg_quality), {}),
+        )
+        for name, factory, options in candidates:
+            encoder = None
+            try:
+                encoder = factory()
+                self.camera.start_encoder(encoder, output, name=stream, **options)
+                self.jpeg_encoder = encoder
+                self.jpeg_encoder_name = name
+                return True
+            except Exception as e:
+                logger.debug(f"[CAMERA] {name} unavailable on {stream}: {e}")
+                if encoder is not None:
+                    try:
+                        self.camera.stop_encoder(encoder)
+                    except Exception:
+                        pass
+        return False
+
+    def _publish_jpeg(self, jpeg_bytes):
+        """Single place a live-view JPEG becomes current; every viewer and the recorder read it."""
+        with self.lock:
+            self.current_jpeg = bytes(jpeg_bytes)
+            self.jpeg_seq += 1
+            self.jpeg_ready.notify_all()
+
+    def _lores_to_bgr(self, buffer):
+        """Convert a padded I420 lores buffer to BGR for JPEG encoding."""
+        import cv2
+
+        rows = self.height * 3 // 2
+        yuv = buffer[:rows * self.lores_stride].reshape(rows, self.lores_stride)
+        bgr = cv2.cvtColor(yuv, cv2.COLOR_YUV420p2BGR)
+        return bgr[:, :self.width]
     
     def _capture_loop(self):
         """Continuous capture loop - runs in background thread"""
@@ -85,21 +232,37 @@ class FastCameraStreamer:
         
         while self.running:
             try:
-                # Capture frame from camera (FAST - already streaming!)
-                array = self.camera.capture_array()
+                started = time.perf_counter()
+                software_jpeg = self.jpeg_encoder is None
+                if self.dual_stream:
+                    # One lores buffer serves both outputs: Y plane for motion, BGR for the live view
+                    buffer = self.camera.capture_buffer("lores")
+                    luma = buffer[:self.height * self.lores_stride].reshape(self.height, self.lores_stride)[:, :self.width]
+                    array = self._lores_to_bgr(buffer) if software_jpeg else None
+                    motion_frame = luma
+                else:
+                    # Capture frame from camera (FAST - already streaming!)
+                    array = self.camera.capture_array()
+                    luma = None
+                    motion_frame = array
                 
-                # Convert to JPEG with performance quality (lower quality = faster encoding)
-                _, jpeg = cv2.imencode('.jpg', array, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
-                jpeg_bytes = jpeg.tobytes()
+                if software_jpeg:
+                    if self.rotation:
+                        array = cv2.rotate(array, cv2.ROTATE_90_CLOCKWISE if self.rotation == 90
+                                           else cv2.ROTATE_90_COUNTERCLOCKWISE)
+                    # Convert to JPEG with performance quality (lower quality = faster encoding)
+                    _, jpeg = cv2.imencode('.jpg', array, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    self._publish_jpeg(jpeg.tobytes())
+                observe('mecam_capture_seconds', time.perf_counter() - started, backend='picamera2')
                 
                 # Update current frame
                 with self.lock:
-                    self.current_jpeg = jpeg_bytes
+                    self.current_luma = luma
                     self.frame_count += 1
                 
                 # Also put in queue for motion detection
                 if not self.frame_queue.full():
-                    self.frame_queue.put(array)
+                    self.frame_queue.put(motion_frame)
                 
                 time.sleep(frame_delay)
                 
@@ -120,36 +283,171 @@ class FastCameraStreamer:
         """
         with self.lock:
             return self.current_jpeg
+
+    def get_jpeg_frame_with_seq(self):
+        """Latest JPEG and its frame sequence number (increments once per encoded frame)."""
+        with self.lock:
+            return self.jpeg_seq, self.current_jpeg
+
+    def wait_for_jpeg(self, after_seq, timeout):
+        """Block until a JPEG newer than ``after_seq`` is published (or timeout); returns (seq, jpeg)"""
+        with self.jpeg_ready:
+            self.jpeg_ready.wait_for(lambda: self.jpeg_seq != after_seq or not self.running, timeout)
+            return self.jpeg_seq, self.current_jpeg
+    
+    def get_luma_frame(self):
+        """
+        Latest lores Y plane (uint8, height x width) for motion/AI.
+
+        Dual-stream only - a strided view into the captured buffer, so there is
+        no colour conversion and no extra copy. Returns None in single-stream mode.
+        """
+        with self.lock:
+            return self.current_luma
     
     def get_frame_for_motion(self):
-        """Get latest frame for motion detection (numpy array)"""
+        """Get latest frame for motion detection (numpy array; grayscale in dual-stream mode)"""
         try:
             if not self.frame_queue.empty():
                 return self.frame_queue.get_nowait()
         except:
             pass
         return None
+
+    def supports_recording(self):
+        """True when the hardware encoder pre-roll is running."""
+        return self.running and self.circular_output is not None
+
+    def start_recording(self, path):
+        """Flush the pre-roll and keep writing H.264 (raw Annex-B) to ``path``."""
+        if not self.supports_recording() or self.recording_path:
+            return False
+        try:
+            self.circular_output.fileoutput = path
+            self.circular_output.start()
+            self.recording_path = path
+            return True
+        except Exception as e:
+            logger.error(f"[CAMERA] Could not start recording {path}: {e}")
+            self.recording_path = None
+            return False
+
+    def stop_recording(self):
+        """Close the current recording; the encoder keeps filling the pre-roll."""
+        if not self.recording_path:
+            return None
+        path = self.recording_path
+        try:
+            self.circular_output.stop()
+        except Exception as e:
+            logger.warning(f"[CAMERA] Recording stop error: {e}")
+        self.recording_path = None
+        return path
     
+    def supports_live_h264(self):
+        """True when a second hardware H.264 encode (remote viewing / HLS / WebRTC) can be attached."""
+        return self.running and self.camera is not None and PICAMERA2_AVAILABLE
+
+    def start_live_h264(self, on_data, bitrate=400_000):
+        """
+        Subscribe ``on_data`` to hardware H.264 of the live-view stream (Annex-B, one access unit per call).
+
+        One encoder serves every subscriber (HLS, WebRTC, ...). It runs alongside
+        the recording encoder (lores in dual-stream mode) with a one-second GOP so
+        segments can cut and new peers can join on every keyframe.
+        """
+        if not self.supports_live_h264():
+            return False
+        with self.lock:
+            if on_data not in self.live_h264_subscribers:
+                self.live_h264_subscribers.append(on_data)
+            if self.live_h264_encoder is not None:
+                return True
+        stream = "lores" if self.dual_stream else "main"
+        try:
+            encoder = H264Encoder(bitrate=int(bitrate), repeat=True, iperiod=max(1, int(self.fps)))
+            self.camera.start_encoder(encoder, _CallbackOutput(self._publish_h264), name=stream)
+            self.live_h264_encoder = encoder
+            logger.info(f"[CAMERA] Live H.264 started on {stream} @ {int(bitrate) // 1000} kbit/s")
+            return True
+        except Exception as e:
+            logger.warning(f"[CAMERA] Live H.264 unavailable: {e}")
+            with self.lock:
+                if on_data in self.live_h264_subscribers:
+                    self.live_h264_subscribers.remove(on_data)
+            return False
+
+    def _publish_h264(self, data):
+        with self.lock:
+            subscribers = list(self.live_h264_subscribers)
+        for on_data in subscribers:
+            try:
+                on_data(data)
+            except Exception as e:
+                logger.debug(f"[CAMERA] Live H.264 subscriber error: {e}")
+
+    def stop_live_h264(self, on_data=None):
+        """Unsubscribe ``on_data`` (or everyone); the encoder stops with the last subscriber."""
+        with self.lock:
+            if on_data is None:
+                self.live_h264_subscribers.clear()
+            elif on_data in self.live_h264_subscribers:
+                self.live_h264_subscribers.remove(on_data)
+            if self.live_h264_subscribers:
+                return
+            encoder, self.live_h264_encoder = self.live_h264_encoder, None
+        if encoder is not None and self.camera is not None:
+            try:
+                self.camera.stop_encoder(encoder)
+            except Exception as e:
+                logger.debug(f"[CAMERA] Live H.264 stop error: {e}")
+
     def stop(self):
         """Stop camera stream"""
         self.running = False
         if self.capture_thread:
             self.capture_thread.join(timeout=2)
+        if self.recording_path:
+            self.stop_recording()
         if self.camera:
+            if self.encoder is not None or self.jpeg_encoder is not None or self.live_h264_encoder is not None:
+                try:
+                    self.camera.stop_encoder()
+                except Exception:
+                    pass
+                self.encoder = None
+                self.circular_output = None
+                self.jpeg_encoder = None
+                self.jpeg_encoder_name = None
+                self.live_h264_encoder = None
             self.camera.stop()
             self.camera.close()
+            self.camera = None
         logger.info("[CAMERA] Fast streamer stopped")
+
+    def restart(self):
+        """Restart the camera and capture loop."""
+        logger.info("[CAMERA] Fast streamer restart requested")
+        self.stop()
+        time.sleep(0.5)
+        return self.start()
     
     def get_stats(self):
         """Get performance statistics"""
         elapsed = time.time() - self.start_time
         fps = self.frame_count / elapsed if elapsed > 0 else 0
-        return {
+        stats = {
             "frames_captured": self.frame_count,
             "elapsed_seconds": elapsed,
             "fps": fps,
-            "resolution": f"{self.width}x{self.height}"
+            "resolution": f"{self.width}x{self.height}",
+            "jpeg_encoder": self.jpeg_encoder_name or "software",
+            "jpeg_frames": self.jpeg_seq
         }
+        if self.dual_stream:
+            stats["recording_resolution"] = f"{self.recording_size[0]}x{self.recording_size[1]}"
+            stats["hardware_recording"] = self.circular_output is not None
+        return stats
 
 
 class FastMotionDetector:
@@ -176,10 +474,35 @@ class FastMotionDetector:
         self.detection_thread.start()
         logger.success("[MOTION] Fast motion detector started")
     
-    def _detection_loop(self):
-        """Continuous motion detection loop"""
+    def detect(self, frame) -> bool:
+        """Diff one RGB (or lores Y) frame against the previous one; True when a large enough contour moved"""
         import cv2
         
+        # Dual-stream frames are already the lores Y plane
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        
+        # First frame - just store it
+        if self.last_frame is None:
+            self.last_frame = gray
+            return False
+        
+        # Calculate frame difference
+        frame_diff = cv2.absdiff(self.last_frame, gray)
+        _, thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)
+        
+        # Dilate to fill gaps
+        kernel = np.ones((5, 5), np.uint8)
+        thresh = cv2.dilate(thresh, kernel, iterations=2)
+        
+        # Find contours
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self.last_frame = gray
+        
+        # Check for motion
+        return any(cv2.contourArea(contour) > self.min_area for contour in contours)
+    
+    def _detection_loop(self):
+        """Continuous motion detection loop"""
         while self.running:
             try:
                 # Get frame from camera streamer (fast - already captured!)
@@ -188,36 +511,9 @@ class FastMotionDetector:
                     time.sleep(0.1)
                     continue
                 
-                # Convert to grayscale for motion detection
-                gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-                
-                # First frame - just store it
-                if self.last_frame is None:
-                    self.last_frame = gray
-                    continue
-                
-                # Calculate frame difference
-                frame_diff = cv2.absdiff(self.last_frame, gray)
-                _, thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)
-                
-                # Dilate to fill gaps
-                kernel = np.ones((5, 5), np.uint8)
-                thresh = cv2.dilate(thresh, kernel, iterations=2)
-                
-                # Find contours
-                contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                # Check for motion
-                motion_detected = False
-                for contour in contours:
-                    if cv2.contourArea(contour) > self.min_area:
-                        motion_detected = True
-                        break
-                
-                if motion_detected and self.motion_callback:
+                if self.detect(frame) and self.motion_callback:
                     self.motion_callback(frame)
                 
-                self.last_frame = gray
                 time.sleep(0.2)  # Check every 200ms (5 times per second!)
                 
             except Exception as e:
@@ -0,0 +1,303 @@
+"""
+Replay Streamer - recorded footage in the camera slot
+=====================================================
+Plays back a directory of JPEGs, an MJPEG file or a video file (MP4/AVI/...)
+through the same surface as RpicamStreamer, so the whole app (live view,
+motion detection, clips, snapshots) runs on a laptop or in CI without a
+sensor.
+
+- ``fps`` paces playback in real time; ``fps=0`` publishes frames as fast
+  as they can be produced (benchmarks).
+- ``stall_every`` / ``stall_seconds`` freeze the feed periodically (Wi-Fi or
+  ISP hiccups).
+- ``failure_rate`` makes individual captures fail.
+- ``fail_after`` kills the camera after N frames, so the stall-restart path
+  in the frame loop gets exercised.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+from src.utils.perf_metrics import observe
+
+_JPEG_EXTENSIONS = (".jpg", ".jpeg")
+_MJPEG_EXTENSIONS = (".mjpeg", ".mjpg")
+
+
+def split_mjpeg(data: bytes) -> List[bytes]:
+    """Split an MJPEG file (concatenated JPEGs, optionally multipart-framed) into frames."""
+    frames = []
+    pos = 0
+    while True:
+        start = data.find(b"\xff\xd8", pos)
+        if start < 0:
+            break
+        end = data.find(b"\xff\xd9", start + 2)
+        if end < 0:
+            break
+        frames.append(data[start:end + 2])
+        pos = end + 2
+    return frames
+
+
+def _encode_jpeg(frame, quality: int, size: Optional[Tuple[int, int]] = None) -> Optional[bytes]:
+    import cv2
+    if size and (frame.shape[1], frame.shape[0]) != tuple(size):
+        frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return buf.tobytes() if ok else None
+
+
+def load_jpeg_frames(source: str, quality: int = 85, size: Optional[Tuple[int, int]] = None) -> List[bytes]:
+    """
+    Every frame of a JPEG directory, MJPEG file or video file as JPEG bytes.
+
+    Frames are re-encoded only when they have to be: video frames always, JPEGs
+    only when ``size`` differs from theirs.
+    """
+    path = os.path.expanduser(source or "")
+    if os.path.isdir(path):
+        frames = []
+        for name in sorted(n for n in os.listdir(path) if n.lower().endswith(_JPEG_EXTENSIONS)):
+            with open(os.path.join(path, name), "rb") as f:
+                frames.append(f.read())
+    elif path.lower().endswith(_MJPEG_EXTENSIONS + _JPEG_EXTENSIONS):
+        with open(path, "rb") as f:
+            frames = split_mjpeg(f.read())
+    else:
+        import cv2
+        frames = []
+        video = cv2.VideoCapture(path)
+        try:
+            while True:
+                ok, frame = video.read()
+                if not ok:
+                    break
+                frames.append(_encode_jpeg(frame, quality, size))
+        finally:
+            video.release()
+        return [f for f in frames if f]
+
+    if size:
+        import cv2
+        import numpy as np
+        resized = []
+        for jpeg in frames:
+            frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+                jpeg = _encode_jpeg(frame, quality, size) or jpeg
+            resized.append(jpeg)
+        frames = resized
+    return frames
+
+
+class ReplayStreamer:
+    """Camera backend that replays recorded footage (RpicamStreamer-compatible)"""
+
+    backend = "replay"
+
+    def __init__(self, source: str, fps: float = 15, loop: bool = True, quality: int = 85,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 stall_every: int = 0, stall_seconds: float = 0.0,
+                 failure_rate: float = 0.0, fail_after: int = 0, seed: Optional[int] = None):
+        self.source = source
+        self.fps = float(fps or 0)
+        self.loop = loop
+        self.quality = int(quality)
+        self.width = width
+        self.height = height
+        self.stall_every = max(0, int(stall_every or 0))
+        self.stall_seconds = max(0.0, float(stall_seconds or 0))
+        self.failure_rate = max(0.0, min(1.0, float(failure_rate or 0)))
+        self.fail_after = max(0, int(fail_after or 0))
+        self._random = random.Random(seed)
+
+        self.running = False
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+        self.last_frame = None
+        self.frame_count = 0
+        self.last_frame_time = 0.0
+        self.error_count = 0
+        self.stalls = 0
+        self.loops = 0
+        self.capture_thread = None
+        self._frames = None      # in-memory JPEGs (directory / MJPEG sources)
+        self._video = None       # cv2.VideoCapture for video files
+
+    # ----- source handling -----
+
+    def _open_source(self) -> bool:
+        path = os.path.expanduser(self.source or "")
+        if os.path.isfile(path) and not path.lower().endswith(_MJPEG_EXTENSIONS + _JPEG_EXTENSIONS):
+            import cv2
+            # Videos are decoded as they play instead of being held in memory
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                logger.error(f"[REPLAY] Cannot open video {path}")
+                self._video = None
+                return False
+            return True
+        if not os.path.exists(path):
+            logger.error(f"[REPLAY] Source not found: {path}")
+            return False
+
+        size = (self.width, self.height) if self.width and self.height else None
+        self._frames = load_jpeg_frames(path, quality=self.quality, size=size)
+        if not self._frames:
+            logger.error(f"[REPLAY] No JPEG frames in {path}")
+            return False
+        return True
+
+    def _describe(self) -> str:
+        return "video" if self._video is not None else f"{len(self._frames)} JPEGs"
+
+    def _encode(self, frame) -> bytes:
+        size = (self.width, self.height) if self.width and self.height else None
+        return _encode_jpeg(frame, self.quality, size)
+
+    def _next_jpeg(self, index: int) -> Optional[bytes]:
+        """Frame ``index`` of the footage, or None at the end (when not looping)."""
+        if self._frames is not None:
+            if index >= len(self._frames) * (self.loops + 1):
+                if not self.loop:
+                    return None
+                self.loops += 1
+            return self._frames[index % len(self._frames)]
+
+        import cv2
+        ok, frame = self._video.read()
+        if not ok:
+            if not self.loop:
+                return None
+            self.loops += 1
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+            if not ok:
+                return None
+        return self._encode(frame)
+
+    # ----- playback -----
+
+    def _playback_loop(self):
+        index = 0
+        next_due = time.monotonic()
+        while self.running:
+            if self.fail_after and index >= self.fail_after:
+                # Dead sensor: frames stop coming until restart()
+                logger.warning(f"[REPLAY] Injected camera failure after {index} frames")
+                self.running = False
+                break
+            if self.stall_every and index and index % self.stall_every == 0:
+                self.stalls += 1
+                time.sleep(self.stall_seconds)
+                next_due = time.monotonic()
+
+            started = time.perf_counter()
+            jpeg = self._next_jpeg(index)
+            observe('mecam_capture_seconds', time.perf_counter() - started, backend=self.backend)
+            index += 1
+            if jpeg is None:
+                logger.info(f"[REPLAY] End of footage after {index - 1} frames")
+                break
+            with self.lock:
+                self.last_frame = jpeg
+                self.frame_count += 1
+                self.last_frame_time = time.time()
+                self.frame_ready.notify_all()
+
+            if self.fps > 0:
+                next_due += 1.0 / self.fps
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.monotonic()
+        # End of non-looping footage keeps serving the last frame (a still scene)
+        with self.lock:
+            self.frame_ready.notify_all()
+
+    def start(self):
+        """Open the footage and start playback"""
+        if not self._open_source():
+            return False
+        kind = self._describe()
+        rate = f"{self.fps:g} FPS" if self.fps > 0 else "max rate"
+        logger.success(f"[REPLAY] Replaying {self.source} ({kind}) at {rate}")
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._playback_loop, name="replay-camera", daemon=True)
+        self.capture_thread.start()
+        return True
+
+    def stop(self):
+        """Stop playback"""
+        self.running = False
+        if self.capture_thread and self.capture_thread.is_alive():
+            self.capture_thread.join(timeout=2)
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+        with self.lock:
+            self.frame_ready.notify_all()
+        logger.info(f"[REPLAY] Stopped after {self.frame_count} frames")
+
+    def restart(self):
+        """Restart playback from the start of the footage"""
+        self.stop()
+        self.loops = 0
+        return self.start()
+
+    # ----- RpicamStreamer-compatible frame access -----
+
+    def _injected_failure(self) -> bool:
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.error_count += 1
+            return True
+        return False
+
+    def get_jpeg_frame(self):
+        """Latest JPEG frame (None while stopped or on an injected failure)"""
+        if not self.running or self._injected_failure():
+            return None
+        with self.lock:
+            return self.last_frame
+
+    def get_jpeg_frame_with_seq(self):
+        """Current JPEG and its frame sequence number as one consistent pair"""
+        if not self.running or self._injected_failure():
+            return self.frame_count, None
+        with self.lock:
+            return self.frame_count, self.last_frame
+
+    def wait_for_jpeg(self, after_seq, timeout):
+        """Block until a frame newer than ``after_seq`` is published (or timeout); returns (seq, jpeg)"""
+        with self.frame_ready:
+            self.frame_ready.wait_for(lambda: self.frame_count != after_seq or not self.running, timeout)
+            return self.frame_count, self.last_frame
+
+    def capture_array(self):
+        """Latest frame as an RGB array (picamera2 convention)"""
+        import cv2
+        import numpy as np
+        jpeg = self.get_jpeg_frame()
+        if not jpeg:
+            return None
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if frame is not None else None
+
+    def get_stats(self):
+        return {
+            "backend": self.backend,
+            "source": self.source,
+            "running": self.running,
+            "frames": self.frame_count,
+            "loops": self.loops,
+            "stalls": self.stalls,
+            "injected_failures": self.error_count,
+            "fps_target": self.fps,
+        }
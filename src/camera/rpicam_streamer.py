@@ -16,6 +16,8 @@ from loguru import logger
 import os
 import signal
 
+from src.utils.perf_metrics import observe
+
 
 class RpicamStreamer:
     """Stream camera via rpicam/libcamera still-image subprocess - persistent connection"""
@@ -33,6 +35,7 @@ class RpicamStreamer:
         self.process = None
         self.last_frame = None
         self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
         self.frame_count = 0
         self.error_count = 0
         self.last_frame_time = 0
@@ -163,18 +166,21 @@ class RpicamStreamer:
             # Disable autofocus speed penalty on cameras that support it (IMX708, IMX477)
             cmd += ['--autofocus-mode', 'manual']
             
+            started = time.perf_counter()
             result = subprocess.run(
                 cmd,
                 capture_output=True,
                 timeout=self.capture_timeout,
                 text=False
             )
+            observe('mecam_capture_seconds', time.perf_counter() - started, backend='rpicam')
             
             if result.returncode == 0 and result.stdout:
                 with self.lock:
                     self.last_frame = result.stdout
                     self.frame_count += 1
                     self.last_frame_time = time.time()
+                    self.frame_ready.notify_all()
                 self.consecutive_failures = 0
                 return result.stdout
 
@@ -202,12 +208,9 @@ class RpicamStreamer:
         """Background thread to continuously capture frames"""
         while self.running:
             try:
+                # _capture_single_frame() publishes the frame (and its sequence number) itself
                 frame = self._capture_single_frame()
                 if frame:
-                    with self.lock:
-                        self.last_frame = frame
-                        self.frame_count += 1
-                        self.last_frame_time = time.time()
                     self.consecutive_failures = 0
                 elif self.consecutive_failures > 5:
                     # Back off quickly to let the kernel media pipeline fully release
@@ -284,6 +287,23 @@ class RpicamStreamer:
                 return self.last_frame
         
         return None
+
+    def get_jpeg_frame_with_seq(self):
+        """Current JPEG and its frame sequence number (frame_count) as one consistent pair
+
+        Never captures: this serves request threads, and a stale frame is
+        recovered by the capture thread, not by a blocking rpicam-jpeg spawn.
+        """
+        if not self.running:
+            return self.frame_count, None
+        with self.lock:
+            return self.frame_count, self.last_frame
+
+    def wait_for_jpeg(self, after_seq, timeout):
+        """Block until a frame newer than ``after_seq`` is captured (or timeout); returns (seq, jpeg)"""
+        with self.frame_ready:
+            self.frame_ready.wait_for(lambda: self.frame_count != after_seq or not self.running, timeout)
+            return self.frame_count, self.last_frame
     
     def stop(self):
         """Stop camera streaming"""
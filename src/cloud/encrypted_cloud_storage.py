@@ -22,6 +22,8 @@ from threading import Thread, Lock, Event
 from queue import Queue, PriorityQueue
 from typing import Optional, Dict, List, Callable
 from loguru import logger
+from src.utils.http_client import ProviderUnavailable, provider_call
+from src.utils.perf_metrics import timer
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
@@ -126,7 +128,7 @@ class EncryptedCloudStorage:
         self._load_stats()
         
         # Start background worker
-        self.worker_thread = Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread = Thread(target=self._worker_loop, name="cloud-upload", daemon=True)
         self.worker_thread.start()
         
         logger.info(f"[CLOUD] Initialized - Encryption: {enable_encryption}, "
@@ -447,10 +449,12 @@ class EncryptedCloudStorage:
             
             # Step 2: Encrypt
             if encrypt:
-                processed_file, encryption_metadata = self.encrypt_file(processed_file)
+                with timer('mecam_encrypt_seconds', stage='cloud'):
+                    processed_file, encryption_metadata = self.encrypt_file(processed_file)
             
             # Step 3: Upload to Google Drive
-            file_id = self._upload_to_drive(processed_file, remote_folder, encryption_metadata)
+            with timer('mecam_upload_seconds', provider='gdrive'):
+                file_id = self._upload_to_drive(processed_file, remote_folder, encryption_metadata)
             
             # Cleanup temporary files
             if processed_file != file_path:
@@ -485,34 +489,40 @@ class EncryptedCloudStorage:
             return None
     
     def _upload_to_drive(self, file_path: str, remote_folder: str, metadata: Optional[Dict]) -> Optional[str]:
-        """Upload file to Google Drive"""
+        """Upload file to Google Drive (fails fast while the Drive circuit is open)"""
         try:
-            # Find or create folder
-            folder_id = self._get_or_create_folder(remote_folder)
-            
-            # Create file metadata
-            file_name = os.path.basename(file_path)
-            file_metadata = {
-                'title': file_name,
-                'parents': [{'id': folder_id}] if folder_id else []
-            }
-            
-            # Add custom metadata
-            if metadata:
-                file_metadata['description'] = json.dumps(metadata)
-            
-            # Upload file
-            drive_file = self.drive.CreateFile(file_metadata)
-            drive_file.SetContentFile(file_path)
-            
-            # Upload with progress
-            drive_file.Upload()
-            
-            return drive_file['id']
-            
+            with provider_call("gdrive"):
+                return self._upload_to_drive_once(file_path, remote_folder, metadata)
+        except ProviderUnavailable as e:
+            logger.warning(f"[CLOUD] Drive upload deferred: {e}")
+            return None
         except Exception as e:
             logger.error(f"[CLOUD] Drive upload failed: {e}")
             return None
+
+    def _upload_to_drive_once(self, file_path: str, remote_folder: str, metadata: Optional[Dict]) -> str:
+        # Find or create folder
+        folder_id = self._get_or_create_folder(remote_folder)
+        
+        # Create file metadata
+        file_name = os.path.basename(file_path)
+        file_metadata = {
+            'title': file_name,
+            'parents': [{'id': folder_id}] if folder_id else []
+        }
+        
+        # Add custom metadata
+        if metadata:
+            file_metadata['description'] = json.dumps(metadata)
+        
+        # Upload file
+        drive_file = self.drive.CreateFile(file_metadata)
+        drive_file.SetContentFile(file_path)
+        
+        # Upload with progress
+        drive_file.Upload()
+        
+        return drive_file['id']
     
     def _get_or_create_folder(self, folder_path: str) -> Optional[str]:
         """Get or create folder in Google Drive by path"""
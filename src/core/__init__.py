@@ -6,10 +6,11 @@ from .user_auth import (
 )
 from .battery_monitor import BatteryMonitor
 from .thumbnail_gen import extract_thumbnail
-from .qr_generator import generate_setup_qr
-from .emergency_handler import EmergencyHandler
-from .motion_logger import log_motion_event, get_recent_events, get_event_statistics, clear_old_events, export_events_csv
+from .motion_logger import (
+    log_motion_event, get_recent_events, get_event_statistics, clear_old_events, export_events_csv
+)
 from .sms_notifier import SMSNotifier, get_sms_notifier, reset_sms_notifier, resolve_sms_config
+from src.utils.lazy_import import lazy_exports
 
 __all__ = [
     'get_config', 'save_config', 'is_first_run', 'mark_first_run_complete',
@@ -20,3 +21,9 @@ __all__ = [
     'get_event_statistics', 'clear_old_events', 'export_events_csv',
     'SMSNotifier', 'get_sms_notifier', 'reset_sms_notifier', 'resolve_sms_config'
 ]
+
+# qrcode/PIL and the SMTP client load on first use, not at boot
+__getattr__ = lazy_exports(__name__, {
+    'generate_setup_qr': '.qr_generator',
+    'EmergencyHandler': '.emergency_handler',
+})
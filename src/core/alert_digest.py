@@ -0,0 +1,204 @@
+"""
+Motion Alert Digest - burst coalescing for motion notifications
+===============================================================
+A busy porch produces a motion event every few seconds. Instead of one SMS
+and push per trigger:
+
+- The first event after a quiet period is alerted immediately and opens a
+  window (``notifications.digest.window_seconds``, 0 = alert every event)
+- Events inside the window are not sent; when the window closes one digest
+  goes out ("5 more motion events (2 people), latest clip: ...") and, if
+  there was anything to report, the next window opens right away
+- Digest counts come from the motion event store, not from in-memory tallies
+
+The window close is an outbox item delayed by the window length, so it runs
+on a delivery worker and survives a restart. The frame loop only does a
+timestamp comparison, plus one enqueue when a window opens.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+
+from .notification_outbox import NotificationOutbox, get_notification_outbox
+
+DIGEST_CHANNEL = "motion_digest"
+PLURALS = {"person": "people", "face": "faces", "vehicle": "vehicles", "pet": "pets", "animal": "animals"}
+
+
+def digest_window_seconds(cfg: dict) -> float:
+    digest = (cfg.get("notifications", {}) or {}).get("digest", {}) or {}
+    try:
+        return max(0.0, float(digest.get("window_seconds", 300) or 0))
+    except (TypeError, ValueError):
+        return 300.0
+
+
+def _primary_channels(cfg: dict) -> list:
+    notifications = cfg.get("notifications", {}) or {}
+    channels = []
+    if cfg.get("sms_enabled") and cfg.get("send_motion_to_emergency") and \
+            (cfg.get("sms_phone_to") or cfg.get("emergency_phone")):
+        channels.append("sms")
+    if notifications.get("web_push_on_motion"):
+        channels.append("webpush")
+    if notifications.get("fcm_on_motion"):
+        channels.append("fcm")
+    if notifications.get("email_on_motion"):
+        channels.append("email")
+    return channels
+
+
+def alerts_enabled(cfg: dict) -> bool:
+    return bool(_primary_channels(cfg))
+
+
+def send_alert(outbox: NotificationOutbox, cfg: dict, key: str, title: str, message: str,
+               data: Optional[dict] = None, rate_limit: bool = True) -> None:
+    """
+    Enqueue one alert on every enabled channel.
+
+    Each item carries ``notifications.fallback_channels`` (minus the channels
+    already alerted) so the outbox can fail over while a provider is down.
+    """
+    notifications = cfg.get("notifications", {}) or {}
+    phone = cfg.get("sms_phone_to") or cfg.get("emergency_phone")
+    push = {"title": title, "body": message, "options": {"data": dict(data or {}, url="/")}}
+    payloads = {
+        "webpush": push,
+        "fcm": push,
+        "email": {"subject": title, "body": message},
+    }
+    if phone:
+        payloads["sms"] = {"phone": phone, "message": message}
+
+    primaries = _primary_channels(cfg)
+    fallback_order = [c for c in notifications.get("fallback_channels", []) or []
+                      if c in payloads and c not in primaries]
+    for channel in primaries:
+        fallback = [{"channel": c, "payload": payloads[c]} for c in fallback_order]
+        if channel == "sms":
+            from .sms_notifier import get_sms_notifier
+            if get_sms_notifier().send_sms(phone, message, key=f"{key}:sms", check_rate_limit=rate_limit,
+                                           fallback=fallback):
+                logger.info(f"[SMS] Alert queued for {phone}")
+        else:
+            outbox.enqueue(channel, payloads[channel], key=f"{key}:{channel}", fallback=fallback)
+
+
+def _event_clip(event: dict) -> Optional[str]:
+    return event.get("video_path") or (event.get("details", {}) or {}).get("video_path")
+
+
+def format_digest(cfg: dict, events: list, since: float) -> str:
+    """Digest text for the events folded into one window (newest first)"""
+    device_name = cfg.get("device_name", "ME Camera")
+    location = cfg.get("device_location", "Unknown")
+    count = len(events)
+    by_type = {}
+    for event in events:
+        kind = event.get("type", "motion")
+        if kind != "motion":
+            by_type[kind] = by_type.get(kind, 0) + 1
+    breakdown = ", ".join(f"{n} {PLURALS.get(kind, kind) if n != 1 else kind}"
+                          for kind, n in sorted(by_type.items(), key=lambda kv: -kv[1]))
+    message = (f"🚨 {device_name}: {count} more motion event{'s' if count != 1 else ''} at {location} "
+               f"since {datetime.fromtimestamp(since).strftime('%I:%M %p')}")
+    if breakdown:
+        message += f" ({breakdown})"
+    clip = next((c for c in map(_event_clip, events) if c), None)
+    if clip:
+        message += f", latest clip: {clip}"
+    return message
+
+
+class MotionAlertDigest:
+    """
+    Coalesces motion alerts into one immediate alert plus per-window digests.
+
+    Usage:
+        digest = MotionAlertDigest(get_notification_outbox())
+        digest.on_motion(cfg, event_id)   # from the frame loop
+    """
+
+    def __init__(self, outbox: NotificationOutbox):
+        self.outbox = outbox
+        self._lock = threading.Lock()
+        self._window_end = 0.0
+        self._folded = 0
+        outbox.register_channel(DIGEST_CHANNEL, self._close_window)
+
+    def on_motion(self, cfg: dict, event_id: str) -> bool:
+        """True when the alert went out now, False when it was folded into the next digest"""
+        if not alerts_enabled(cfg):
+            return False
+        window = digest_window_seconds(cfg)
+        now = time.time()
+        with self._lock:
+            if window and now < self._window_end:
+                self._folded += 1
+                return False
+            self._window_end = now + window
+            self._folded = 0
+
+        location = cfg.get("device_location", "Unknown")
+        message = (f"🚨 {cfg.get('device_name', 'ME Camera')}: Motion detected at {location} - "
+                   f"{datetime.now().strftime('%I:%M:%S %p')}")
+        # With a window the digest is the rate limit; without one keep the per-phone SMS limit
+        send_alert(self.outbox, cfg, f"motion:{event_id}", f"Motion at {location}", message,
+                   data={"event_id": event_id}, rate_limit=not window)
+        if window:
+            self._schedule(now, now + window, event_id)
+        return True
+
+    def _schedule(self, since: float, until: float, first_event: Optional[str]) -> None:
+        self.outbox.enqueue(DIGEST_CHANNEL, {"since": since, "until": until, "first_event": first_event},
+                            key=f"digest:{first_event}:{int(since)}", delay=max(0.0, until - time.time()))
+
+    def _close_window(self, payload: dict) -> bool:
+        """Outbox handler: send the digest for a closed window and roll into the next one"""
+        from .config_manager import get_config
+        from .motion_logger import get_recent_events
+
+        since, until = float(payload["since"]), float(payload["until"])
+        first_event = payload.get("first_event")
+        hours = (time.time() - since) / 3600 + 0.01
+        events = [
+            e for e in get_recent_events(hours=hours, limit=2000)
+            if since <= e.get("unix_timestamp", 0) < until and e.get("id") != first_event
+        ]
+        with self._lock:
+            folded, self._folded = self._folded, 0
+            # Still busy: the next window starts where this one ended (unless a new
+            # trigger already opened its own window after this one closed)
+            roll = bool(events) and self._window_end <= until
+            if roll:
+                self._window_end = until + (until - since)
+        if not events:
+            logger.debug(f"[DIGEST] Window closed quietly ({folded} folded trigger(s) not in the event store)")
+            return True
+
+        cfg = get_config()
+        message = format_digest(cfg, events, since)
+        send_alert(self.outbox, cfg, f"digest:{first_event}:{int(since)}",
+                   f"{len(events)} more motion events", message, data={"since": since}, rate_limit=False)
+        logger.info(f"[DIGEST] {len(events)} event(s) folded into one digest")
+        if roll:
+            self._schedule(until, until + (until - since), first_event)
+        return True
+
+
+_digest: Optional[MotionAlertDigest] = None
+_digest_lock = threading.Lock()
+
+
+def get_motion_alert_digest() -> MotionAlertDigest:
+    """Get or create the shared digest (registers its channel on the outbox)"""
+    global _digest
+    with _digest_lock:
+        if _digest is None:
+            _digest = MotionAlertDigest(get_notification_outbox())
+        return _digest
@@ -1,14 +1,137 @@
-import subprocess
+"""
+Battery Monitor - sampled power telemetry and runtime prediction
+================================================================
+``get_status`` used to run ``vcgencmd get_throttled`` and scan
+/sys/class/power_supply on every call, and it is polled by /api/battery,
+/api/status, the dashboards and the background sync loop. Now a sampler
+thread reads the sensors every ``sample_interval_seconds`` and API calls
+only read the cached sample:
+
+- Samples (timestamp, percent, current, throttle bits, temperature,
+  external power) go into ``TelemetryRing``, a fixed-size ring of packed
+  records (22 bytes each; six hours at 30s is about 16 KB)
+- Runtime comes from the measured discharge trend: a least-squares slope of
+  percent over the last ``trend_window_minutes`` on battery, smoothed with
+  an EWMA. Until a trend exists it falls back to the configured
+  power-bank capacity and measured (or configured) current draw
+"""
+
+import math
 import os
+import struct
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
 from loguru import logger
 from src.core.config_manager import get_config
 
+DEFAULT_TELEMETRY_CONFIG = {
+    "sample_interval_seconds": 30,
+    "history_size": 720,
+    "trend_window_minutes": 30,
+    "smoothing": 0.3,
+}
+
+# Minimum history before a discharge slope is trusted
+MIN_TREND_SPAN_SECONDS = 300
+MIN_TREND_SAMPLES = 3
+
+BATTERY_SUPPLIES = ("BAT0", "BAT1", "ups")
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+class TelemetryRing:
+    """
+    Fixed-size ring of packed power samples.
+
+    Fields: timestamp, percent (-1 unknown), current mA (NaN unknown),
+    vcgencmd throttle bits, SoC temperature (NaN unknown), external power.
+
+    Usage:
+        ring = TelemetryRing(720)
+        ring.append(time.time(), 87, 540.0, 0x0, 51.2, False)
+        for ts, percent, current_ma, throttled, temp_c, external in ring.samples(since=time.time() - 3600): ...
+    """
+
+    RECORD = struct.Struct("<dbfIfB")
+
+    def __init__(self, capacity: int):
+        self.capacity = max(2, int(capacity))
+        self._buf = bytearray(self.RECORD.size * self.capacity)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, ts: float, percent: Optional[int], current_ma: Optional[float], throttled: int,
+               temp_c: Optional[float], external_power: bool) -> None:
+        self.RECORD.pack_into(
+            self._buf, self._next * self.RECORD.size, ts,
+            -1 if percent is None else int(percent),
+            math.nan if current_ma is None else float(current_ma),
+            int(throttled) & 0xFFFFFFFF,
+            math.nan if temp_c is None else float(temp_c),
+            1 if external_power else 0,
+        )
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def samples(self, since: Optional[float] = None) -> List[tuple]:
+        """Oldest-first samples (unknown values as None), optionally only those at or after ``since``"""
+        out = []
+        start = (self._next - self._count) % self.capacity
+        for i in range(self._count):
+            ts, percent, current_ma, throttled, temp_c, external = self.RECORD.unpack_from(
+                self._buf, ((start + i) % self.capacity) * self.RECORD.size)
+            if since is not None and ts < since:
+                continue
+            out.append((ts, None if percent < 0 else percent, None if math.isnan(current_ma) else current_ma,
+                        throttled, None if math.isnan(temp_c) else temp_c, bool(external)))
+        return out
+
+
+def discharge_slope(samples: List[tuple]) -> Optional[float]:
+    """Least-squares percent-per-hour drop over ``samples`` on battery, None without enough history"""
+    points = [(ts, percent) for ts, percent, _, _, _, external in samples if percent is not None and not external]
+    if len(points) < MIN_TREND_SAMPLES or points[-1][0] - points[0][0] < MIN_TREND_SPAN_SECONDS:
+        return None
+    t0 = points[0][0]
+    n = len(points)
+    mean_t = sum(ts - t0 for ts, _ in points) / n
+    mean_p = sum(p for _, p in points) / n
+    var_t = sum((ts - t0 - mean_t) ** 2 for ts, _ in points)
+    if var_t <= 0:
+        return None
+    slope_per_second = sum((ts - t0 - mean_t) * (p - mean_p) for ts, p in points) / var_t
+    return -slope_per_second * 3600.0
+
 
 class BatteryMonitor:
-    def __init__(self, enabled: bool = False, low_threshold_percent: int = 20):
+    """
+    Battery/power status served from a background telemetry sampler.
+
+    Usage:
+        battery = BatteryMonitor(enabled=True)
+        status = battery.get_status()      # starts the sampler on first use
+        history = battery.get_history(3600)
+    """
+
+    def __init__(self, enabled: bool = False, low_threshold_percent: int = 20,
+                 telemetry: Optional[dict] = None):
         self.enabled = enabled
         self.low_threshold_percent = low_threshold_percent
         self.power_source_cache = {"source": "unknown", "time": 0}
+        self._telemetry_override = telemetry
+        self._telemetry_cfg = None
+        self._ring = None
+        self._latest = None
+        self._rate_pct_per_hour = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
 
     def _vcgencmd_throttled(self):
         try:
@@ -39,6 +162,25 @@ class BatteryMonitor:
                 continue
         return None, None
 
+    def _read_current_ma(self):
+        """Battery current in mA from current_now (microamps), when the gauge exposes it."""
+        for name in BATTERY_SUPPLIES:
+            path = f"/sys/class/power_supply/{name}/current_now"
+            try:
+                if os.path.exists(path):
+                    with open(path, "r") as f:
+                        return abs(int(f.read().strip())) / 1000.0
+            except Exception:
+                continue
+        return None
+
+    def _read_temperature_c(self):
+        try:
+            with open(THERMAL_ZONE, "r") as f:
+                return int(f.read().strip()) / 1000.0
+        except Exception:
+            return None
+
     def _detect_power_source(self):
         """
         Detect if device is powered by wall charger, USB adapter, powerbank, or pure battery.
@@ -101,11 +243,120 @@ class BatteryMonitor:
             logger.debug(f"Power source detection error: {e}")
             return "unknown"
 
+    def _load_telemetry_cfg(self) -> dict:
+        merged = dict(DEFAULT_TELEMETRY_CONFIG)
+        try:
+            source = self._telemetry_override
+            if source is None:
+                source = get_config().get("battery_telemetry", {}) or {}
+            merged.update({k: v for k, v in source.items() if v is not None})
+        except Exception as e:
+            logger.debug(f"[POWER] Telemetry config unavailable, using defaults: {e}")
+        merged["sample_interval_seconds"] = max(1.0, float(merged["sample_interval_seconds"]))
+        merged["history_size"] = max(2, int(merged["history_size"]))
+        merged["trend_window_minutes"] = max(1.0, float(merged["trend_window_minutes"]))
+        merged["smoothing"] = max(0.01, min(1.0, float(merged["smoothing"])))
+        return merged
+
+    def start(self) -> None:
+        """Start the telemetry sampler (idempotent); the first sample is taken synchronously."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._telemetry_cfg = self._load_telemetry_cfg()
+            self._ring = TelemetryRing(self._telemetry_cfg["history_size"])
+            self._thread = threading.Thread(target=self._sample_loop, name="power-telemetry", daemon=True)
+        self.sample()
+        self._thread.start()
+        logger.info(f"[POWER] Telemetry sampler started (every {self._telemetry_cfg['sample_interval_seconds']:.0f}s, "
+                    f"{self._ring.capacity} samples)")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _sample_loop(self) -> None:
+        interval = self._telemetry_cfg["sample_interval_seconds"]
+        while not self._stop.wait(interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"[POWER] Telemetry sample failed: {e}")
+
+    def sample(self) -> dict:
+        """Read every sensor once, append to the ring and refresh the cached sample."""
+        now = time.time()
+        power_source = self._detect_power_source()
+        self.power_source_cache = {"source": power_source, "time": now}
+        if self.enabled:
+            throttled = self._vcgencmd_throttled()
+            percent, source_path = self._read_capacity_percent()
+            current_ma = self._read_current_ma()
+        else:
+            throttled, percent, source_path, current_ma = 0, None, None, None
+        temp_c = self._read_temperature_c()
+        external_power = power_source in ("wall_adapter", "usb_adapter")
+        latest = {
+            "time": now,
+            "power_source": power_source,
+            "throttled": throttled,
+            "percent": percent,
+            "percent_path": source_path,
+            "current_ma": current_ma,
+            "temperature_c": temp_c,
+        }
+
+        with self._lock:
+            ring = self._ring
+            if ring is not None:
+                ring.append(now, percent, current_ma, throttled, temp_c, external_power)
+                if external_power:
+                    # Charging or plugged in: the old discharge trend no longer applies
+                    self._rate_pct_per_hour = None
+                else:
+                    cfg = self._telemetry_cfg
+                    slope = discharge_slope(ring.samples(since=now - cfg["trend_window_minutes"] * 60))
+                    if slope is not None:
+                        previous = self._rate_pct_per_hour
+                        alpha = cfg["smoothing"]
+                        self._rate_pct_per_hour = slope if previous is None else alpha * slope + (1 - alpha) * previous
+            self._latest = latest
+        return latest
+
+    def discharge_rate(self) -> Optional[float]:
+        """Smoothed percent-per-hour drop on battery, None until a trend is measured"""
+        return self._rate_pct_per_hour
+
+    def predict_runtime_hours(self, percent: Optional[float] = None) -> Optional[float]:
+        """Hours until empty at the measured discharge rate (None while unknown or not discharging)"""
+        rate = self._rate_pct_per_hour
+        if percent is None and self._latest is not None:
+            percent = self._latest.get("percent")
+        if rate is None or rate <= 0.05 or percent is None:
+            return None
+        return max(0.0, float(percent)) / rate
+
+    def get_history(self, seconds: Optional[float] = None) -> List[dict]:
+        """Recent samples, oldest first"""
+        with self._lock:
+            ring = self._ring
+            samples = ring.samples(since=time.time() - seconds if seconds else None) if ring else []
+        return [
+            {"ts": ts, "percent": percent, "current_ma": current_ma, "throttled": throttled,
+             "temperature_c": temp_c, "external_power": external}
+            for ts, percent, current_ma, throttled, temp_c, external in samples
+        ]
+
+    def _cached_sample(self) -> dict:
+        if self._thread is None:
+            self.start()
+        return self._latest or self.sample()
+
     def get_status(self):
+        latest = self._cached_sample()
         if not self.enabled:
             # Still detect power source so UI shows "Wall Power" / "USB Adapter"
             # instead of "Unknown" on devices without a battery HAT.
-            power_source = self._detect_power_source()
+            power_source = latest["power_source"]
             external_power = power_source in ("wall_adapter", "usb_adapter")
             return {
                 "enabled": False,
@@ -114,48 +365,83 @@ class BatteryMonitor:
                 "external_power": external_power,
                 "power_source": power_source,
                 "battery_present": False,
+                "temperature_c": latest["temperature_c"],
                 "note": "Battery monitoring disabled; power source detected from system.",
             }
 
         cfg = get_config()
         percent_override = cfg.get("battery_percent_override")
 
-        throttled = self._vcgencmd_throttled()
+        throttled = latest["throttled"]
         undervolt_now = bool(throttled & 0x1)
         undervolt_ever = bool(throttled & 0x10000)
 
-        percent = None
-        percent_source = "unknown"
-        try:
-            if isinstance(percent_override, (int, float)):
-                percent = max(0, min(100, int(percent_override)))
-                percent_source = "override"
-            else:
-                sensed, source_path = self._read_capacity_percent()
-                if sensed is not None:
-                    percent = sensed
-                    percent_source = f"sensor:{source_path}"
-                else:
-                    # No battery telemetry device found; keep percent unknown
-                    # instead of reporting synthetic values.
-                    percent = None
-                    percent_source = "unavailable"
-        except Exception as e:
-            logger.debug(f"Battery estimation error: {e}")
+        if isinstance(percent_override, (int, float)):
+            percent = max(0, min(100, int(percent_override)))
+            percent_source = "override"
+        elif latest["percent"] is not None:
+            percent = latest["percent"]
+            percent_source = f"sensor:{latest['percent_path']}"
+        else:
+            # No battery telemetry device found; keep percent unknown
+            # instead of reporting synthetic values.
             percent = None
-            percent_source = "error"
+            percent_source = "unavailable"
 
         is_low = undervolt_now or (percent is not None and percent <= self.low_threshold_percent)
         
         # Detect actual power source instead of relying on undervolt detection
-        power_source = self._detect_power_source()
+        power_source = latest["power_source"]
         external_power = power_source in ["wall_adapter", "usb_adapter"]
         # Do not assume charging when telemetry is missing. Unknown should
         # remain non-external to avoid false "charging" positives.
         if power_source == "unknown" and percent is None and not undervolt_now:
             external_power = False
-        
-        # Runtime estimate (only meaningful when capacity percentage is known).
+
+        runtime_hours = None
+        runtime_source = None
+        if percent is not None and percent > 0:
+            runtime_hours = self.predict_runtime_hours(percent)
+            runtime_source = "measured"
+            if runtime_hours is None:
+                runtime_hours = self._configured_runtime_hours(cfg, percent, latest["current_ma"])
+                runtime_source = "measured_current" if latest["current_ma"] else "configured"
+
+        if runtime_hours is not None:
+            runtime_hours_int = int(runtime_hours)
+            runtime_minutes = int((runtime_hours - runtime_hours_int) * 60)
+        else:
+            runtime_hours_int = None
+            runtime_minutes = None
+
+        rate = self._rate_pct_per_hour
+        return {
+            "enabled": True,
+            "percent": percent,
+            "is_low": is_low,
+            "external_power": external_power,
+            "power_source": power_source,
+            "undervolt_ever": undervolt_ever,
+            "runtime_hours": runtime_hours_int,
+            "runtime_minutes": runtime_minutes,
+            "runtime_source": runtime_source,
+            "discharge_pct_per_hour": round(rate, 2) if rate is not None else None,
+            "current_ma": latest["current_ma"],
+            "temperature_c": latest["temperature_c"],
+            "throttled": hex(throttled),
+            "sampled_at": latest["time"],
+            "percent_source": percent_source,
+            "battery_present": percent is not None,
+            "note": (
+                "Battery level uses sensor/override when available; runtime follows the measured "
+                "discharge trend once a few minutes of battery history exist, otherwise the configured "
+                "power-bank/current settings. Active camera/WiFi draw typically 600-900 mA."
+            )
+        }
+
+    @staticmethod
+    def _configured_runtime_hours(cfg: dict, percent: float, current_ma: Optional[float]) -> float:
+        """Static estimate from configured power-bank capacity and current draw (measured draw when available)."""
         # Defaults reflect common USB power-bank conversion losses.
         try:
             powerbank_mah = float(cfg.get("powerbank_capacity_mah", 10000) or 10000)
@@ -181,33 +467,19 @@ class BatteryMonitor:
         # IMPORTANT: avg_current_draw_ma should reflect ACTIVE usage (camera + WiFi)
         # 300 mA is unrealistically low for streaming devices. Use 600 mA as realisticdefault.
         # Users should adjust based on their usage patterns.
-        try:
-            avg_current_draw_ma = float(cfg.get("avg_current_draw_ma", 600) or 600)
-        except Exception:
-            avg_current_draw_ma = 600.0
+        if current_ma:
+            avg_current_draw_ma = float(current_ma)
+        else:
+            try:
+                avg_current_draw_ma = float(cfg.get("avg_current_draw_ma", 600) or 600)
+            except Exception:
+                avg_current_draw_ma = 600.0
         avg_current_draw_ma = max(50.0, avg_current_draw_ma)
 
-        usable_mah_at_device_voltage = powerbank_mah * (powerbank_cell_voltage / device_voltage) * conversion_efficiency
-
-        if percent is not None and percent > 0:
-            remaining_mah = (percent / 100.0) * usable_mah_at_device_voltage
-            runtime_hours = remaining_mah / avg_current_draw_ma
-            runtime_hours_int = int(runtime_hours)
-            runtime_minutes = int((runtime_hours - runtime_hours_int) * 60)
+        if current_ma:
+            # The gauge measures at the cell, so no voltage conversion applies
+            usable_mah = powerbank_mah * conversion_efficiency
         else:
-            runtime_hours_int = None
-            runtime_minutes = None
-
-        return {
-            "enabled": True,
-            "percent": percent,
-            "is_low": is_low,
-            "external_power": external_power,
-            "power_source": power_source,
-            "undervolt_ever": undervolt_ever,
-            "runtime_hours": runtime_hours_int,
-            "runtime_minutes": runtime_minutes,
-            "percent_source": percent_source,
-            "battery_present": percent is not None,
-            "note": "Battery level uses sensor/override when available; runtime is estimate based on configured power-bank/current settings. Active camera/WiFi draw typically 600-900 mA."
-        }
+            usable_mah = powerbank_mah * (powerbank_cell_voltage / device_voltage) * conversion_efficiency
+        remaining_mah = (percent / 100.0) * usable_mah
+        return remaining_mah / avg_current_draw_ma
@@ -0,0 +1,514 @@
+"""
+Notification Outbox - one durable delivery path for every alert channel
+=======================================================================
+Motion alerts used to leave the device through four unrelated routes (a
+thread per SMS, the app's retry JSON flushed from the frame loop, the
+NotificationQueue file rewritten per item, inline push sends). They all go
+through this outbox now:
+
+- Durable append log (logs/notification_outbox.jsonl): one JSON record per
+  enqueue / retry / completion, flushed per record and replayed on start, so
+  a restart or crash never loses a pending alert
+- Fixed pool of delivery workers; callers (the camera loop included) only
+  enqueue, which is a dict insert plus one appended line
+- Per-channel retry schedules (seconds between attempts, with jitter);
+  an item is dropped once its schedule is exhausted or it gets too old
+- Idempotency keys: enqueueing a key that is pending or was delivered within
+  ``dedupe_hours`` returns the existing id instead of sending twice
+
+The log is compacted (rewritten with only live items) once ``compact_after``
+records have been appended since the last compaction. Live idempotency keys
+never count toward that, so a busy dedupe window does not turn every
+delivery into a full rewrite.
+
+Channels are plain callables ``handler(payload) -> bool``; False or an
+exception schedules a retry. ``sms``, ``webpush``, ``fcm`` and ``email`` are
+registered by default. An item may carry a fallback chain: when its
+provider's circuit is open (ProviderUnavailable) it moves to the next
+fallback channel that is configured instead of waiting for the provider.
+"""
+
+import atexit
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from src.utils.http_client import ProviderUnavailable, provider_call
+from src.utils.perf_metrics import observe
+
+
+DEFAULT_RETRY_SCHEDULES = {
+    "sms": [30, 120, 600, 1800],
+    "webpush": [15, 60, 300, 900],
+    "fcm": [15, 60, 300, 900],
+    "email": [60, 300, 1800],
+}
+DEFAULT_RETRY_SCHEDULE = [30, 300, 1800]
+
+
+class NotificationOutbox:
+    """
+    Durable notification outbox with a fixed delivery worker pool.
+
+    Usage:
+        outbox = NotificationOutbox("logs/notification_outbox.jsonl")
+        outbox.register_channel("sms", lambda p: send(p["phone"], p["message"]))
+        outbox.start()
+        outbox.enqueue("sms", {"phone": "+15551234", "message": "Motion"}, key="motion:evt_1:sms")
+    """
+
+    def __init__(self, path: str, workers: int = 2, retry_schedules: Optional[Dict[str, List[float]]] = None,
+                 dedupe_hours: float = 24.0, max_age_hours: float = 24.0, compact_after: int = 500):
+        self.path = path
+        self.workers = max(1, int(workers or 1))
+        self.retry_schedules = dict(DEFAULT_RETRY_SCHEDULES)
+        self.retry_schedules.update({k: [float(s) for s in v] for k, v in (retry_schedules or {}).items()})
+        self.dedupe_seconds = max(0.0, float(dedupe_hours)) * 3600
+        self.max_age_seconds = max(60.0, float(max_age_hours) * 3600)
+        self.compact_after = max(50, int(compact_after))
+
+        self._handlers: Dict[str, Callable[[dict], bool]] = {}
+        self._available: Dict[str, Callable[[], bool]] = {}
+        self._cond = threading.Condition()
+        self._pending: Dict[str, dict] = {}
+        self._pending_keys: Dict[str, str] = {}
+        self._done_keys: Dict[str, tuple] = {}  # key -> (item id, delivered at)
+        self._heap = []
+        self._tie = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._log = None
+        self._appended_since_compact = 0
+        self._stats = {"enqueued": 0, "sent": 0, "failed": 0, "retries": 0, "deduplicated": 0, "fallbacks": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._replay()
+
+    # ------------------------------------------------------------------ log
+
+    def _replay(self) -> None:
+        """Rebuild pending items and recent idempotency keys from the log"""
+        if not os.path.exists(self.path):
+            return
+        now = time.time()
+        records = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a power cut
+                records += 1
+                op = record.get("op")
+                if op == "add":
+                    self._pending[record["id"]] = record
+                    if record.get("key"):
+                        self._pending_keys[record["key"]] = record["id"]
+                elif op == "retry":
+                    item = self._pending.get(record.get("id"))
+                    if item:
+                        item["attempts"] = record.get("attempts", item.get("attempts", 0))
+                        item["due"] = record.get("due", now)
+                elif op == "done":
+                    item = self._pending.pop(record.get("id"), None)
+                    key = record.get("key") or (item or {}).get("key")
+                    if key:
+                        self._pending_keys.pop(key, None)
+                        if record.get("status", "sent") == "sent":
+                            self._done_keys[key] = (record.get("id"), record.get("at", now))
+        for item in self._pending.values():
+            item["due"] = item.get("due") or now
+            heapq.heappush(self._heap, (item["due"], next(self._tie), item["id"]))
+        # Only the records a compaction would drop count toward the next one
+        self._appended_since_compact = max(0, records - len(self._pending) - len(self._done_keys))
+        if self._pending:
+            logger.info(f"[OUTBOX] Recovered {len(self._pending)} pending notification(s) from {self.path}")
+
+    def _append(self, record: dict) -> None:
+        """Append one record (caller holds the lock)"""
+        try:
+            if self._log is None:
+                self._log = open(self.path, "a", encoding="utf-8")
+            self._log.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._log.flush()
+            self._appended_since_compact += 1
+        except Exception as e:
+            logger.error(f"[OUTBOX] Log write failed: {e}")
+
+    def compact(self) -> None:
+        """Rewrite the log with only pending items and live idempotency keys"""
+        with self._cond:
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        now = time.time()
+        self._done_keys = {k: v for k, v in self._done_keys.items() if now - v[1] < self.dedupe_seconds}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for item in self._pending.values():
+                    # An in-flight item is rewritten as due now; its outcome is appended afterwards
+                    f.write(json.dumps(dict(item, due=item.get("due") or now), separators=(",", ":")) + "\n")
+                for key, (item_id, at) in self._done_keys.items():
+                    record = {"op": "done", "id": item_id, "key": key, "status": "sent", "at": at}
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"[OUTBOX] Compaction failed: {e}")
+        finally:
+            # Also after a failure: try again after another compact_after appends, not on every record
+            self._appended_since_compact = 0
+
+    # ------------------------------------------------------------ lifecycle
+
+    def register_channel(self, channel: str, handler: Callable[[dict], bool],
+                         available: Optional[Callable[[], bool]] = None) -> None:
+        """``available`` tells whether the channel is configured (used to pick fallbacks)"""
+        self._handlers[channel] = handler
+        if available is not None:
+            self._available[channel] = available
+
+    def channel_available(self, channel: str) -> bool:
+        if channel not in self._handlers:
+            return False
+        check = self._available.get(channel)
+        try:
+            return check() if check else True
+        except Exception as e:
+            logger.debug(f"[OUTBOX] {channel} availability check failed: {e}")
+            return False
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"notify-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"[OUTBOX] {self.workers} delivery worker(s) started "
+                    f"({len(self._pending)} pending, channels: {', '.join(sorted(self._handlers)) or 'none'})")
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._cond:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # -------------------------------------------------------------- enqueue
+
+    def enqueue(self, channel: str, payload: dict, key: Optional[str] = None, delay: float = 0.0,
+                fallback: Optional[List[dict]] = None) -> Optional[str]:
+        """
+        Queue a notification; never blocks on delivery.
+
+        ``fallback`` is an ordered list of {"channel", "payload"} alternatives
+        used while this channel's provider is unavailable. Returns the item id
+        (the existing one for a duplicate ``key``), or None when the channel
+        is unknown.
+        """
+        if channel not in self._handlers:
+            logger.warning(f"[OUTBOX] No handler for channel '{channel}', dropping notification")
+            return None
+        with self._cond:
+            return self._add_locked(channel, payload, key, delay, fallback)
+
+    def _add_locked(self, channel: str, payload: dict, key: Optional[str], delay: float,
+                    fallback: Optional[List[dict]]) -> str:
+        """Insert one item (caller holds the lock)"""
+        now = time.time()
+        if key:
+            existing = self._pending_keys.get(key)
+            if existing:
+                self._stats["deduplicated"] += 1
+                return existing
+            done = self._done_keys.get(key)
+            if done is not None and now - done[1] < self.dedupe_seconds:
+                self._stats["deduplicated"] += 1
+                return done[0]
+        item = {
+            "op": "add",
+            "id": uuid.uuid4().hex[:16],
+            "key": key,
+            "channel": channel,
+            "payload": payload,
+            "created": now,
+            "due": now + max(0.0, delay),
+            "attempts": 0,
+        }
+        if fallback:
+            item["fallback"] = list(fallback)
+        self._append(item)
+        self._pending[item["id"]] = item
+        if key:
+            self._pending_keys[key] = item["id"]
+        heapq.heappush(self._heap, (item["due"], next(self._tie), item["id"]))
+        self._stats["enqueued"] += 1
+        self._cond.notify()
+        return item["id"]
+
+    # ------------------------------------------------------------- delivery
+
+    def _next_due(self) -> Optional[dict]:
+        """Pop the next due item, waiting up to a few seconds (caller holds the lock)"""
+        while self._heap:
+            due, _, item_id = self._heap[0]
+            item = self._pending.get(item_id)
+            if item is None or item.get("due") != due:
+                heapq.heappop(self._heap)  # completed or rescheduled
+                continue
+            wait = due - time.time()
+            if wait > 0:
+                self._cond.wait(min(wait, 5.0))
+                return None
+            heapq.heappop(self._heap)
+            item["due"] = None  # in flight: a replayed heap entry no longer matches
+            return item
+        self._cond.wait(5.0)
+        return None
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                item = self._next_due()
+            if item is not None:
+                self._deliver(item)
+
+    def _deliver(self, item: dict) -> None:
+        channel = item["channel"]
+        handler = self._handlers.get(channel)
+        error = None
+        unavailable = None
+        started = time.perf_counter()
+        try:
+            ok = bool(handler(item["payload"])) if handler else False
+            if not ok:
+                error = "rejected" if handler else "no handler"
+        except ProviderUnavailable as e:
+            ok, error, unavailable = False, str(e), e
+        except Exception as e:
+            ok, error = False, str(e) or e.__class__.__name__
+        observe("mecam_outbox_delivery_seconds", time.perf_counter() - started,
+                channel=channel, outcome="sent" if ok else "unavailable" if unavailable else "error")
+
+        # Fail over instead of waiting out the provider's circuit
+        fallback, remaining = None, []
+        if unavailable is not None:
+            chain = item.get("fallback") or []
+            for index, candidate in enumerate(chain):
+                if self.channel_available(candidate.get("channel")):
+                    fallback, remaining = candidate, chain[index + 1:]
+                    break
+
+        now = time.time()
+        with self._cond:
+            attempts = int(item.get("attempts", 0)) + 1
+            item["attempts"] = attempts
+            schedule = self.retry_schedules.get(channel, DEFAULT_RETRY_SCHEDULE)
+            if fallback is not None:
+                self._finish(item, "fallback", now, error)
+                key = f"{item['key']}>{fallback['channel']}" if item.get("key") else None
+                self._add_locked(fallback["channel"], fallback["payload"], key, 0.0, remaining)
+                self._stats["fallbacks"] += 1
+                logger.warning(f"[OUTBOX] {unavailable.provider} unavailable; {channel} {item['id']} "
+                               f"falls back to {fallback['channel']}")
+            elif ok:
+                self._finish(item, "sent", now)
+                self._stats["sent"] += 1
+                logger.debug(f"[OUTBOX] {channel} {item['id']} delivered (attempt {attempts})")
+            elif attempts > len(schedule) or now - item["created"] > self.max_age_seconds:
+                self._finish(item, "failed", now, error)
+                self._stats["failed"] += 1
+                logger.warning(f"[OUTBOX] Giving up on {channel} {item['id']} after {attempts} attempt(s): {error}")
+            else:
+                due = now + schedule[attempts - 1] * random.uniform(0.9, 1.1)
+                if unavailable is not None:
+                    due = max(due, now + unavailable.retry_after)
+                item["due"] = due
+                self._append({"op": "retry", "id": item["id"], "attempts": attempts, "due": due, "error": error})
+                heapq.heappush(self._heap, (due, next(self._tie), item["id"]))
+                self._stats["retries"] += 1
+                logger.info(f"[OUTBOX] {channel} {item['id']} failed ({error}); retry {attempts} in {due - now:.0f}s")
+            if self._appended_since_compact >= self.compact_after:
+                self._compact_locked()
+
+    def _finish(self, item: dict, status: str, now: float, error: Optional[str] = None) -> None:
+        """Record completion and release the idempotency key (caller holds the lock)"""
+        self._pending.pop(item["id"], None)
+        record = {"op": "done", "id": item["id"], "key": item.get("key"), "status": status, "at": now}
+        if error:
+            record["error"] = error
+        self._append(record)
+        key = item.get("key")
+        if key:
+            self._pending_keys.pop(key, None)
+            # Failed items keep no key so a later trigger can try again
+            if status == "sent":
+                self._done_keys[key] = (item["id"], now)
+
+    # ---------------------------------------------------------------- stats
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            by_channel = {}
+            for item in self._pending.values():
+                by_channel[item["channel"]] = by_channel.get(item["channel"], 0) + 1
+            return dict(self._stats, pending=len(self._pending), pending_by_channel=by_channel,
+                        workers=self.workers, running=self._running)
+
+
+# ============= DEFAULT CHANNELS =============
+
+def _deliver_sms(payload: dict) -> bool:
+    from src.core.sms_notifier import get_sms_notifier
+
+    return get_sms_notifier().deliver(payload["phone"], payload["message"])
+
+
+def _sms_available() -> bool:
+    from src.core.sms_notifier import get_sms_notifier
+
+    return get_sms_notifier().enabled
+
+
+def _deliver_webpush(payload: dict) -> bool:
+    from src.notifications.web_push_service import get_web_push_service
+
+    service = get_web_push_service()
+    if not service.vapid_enabled:
+        logger.debug("[OUTBOX] Web push not configured, skipping")
+        return True
+    results = service.broadcast_notification(payload["title"], payload["body"], **payload.get("options", {}))
+    # Partial success is success: retrying would repeat the alert on devices that already have it
+    return not results or any(results.values())
+
+
+def _webpush_available() -> bool:
+    from src.notifications.web_push_service import get_web_push_service
+
+    service = get_web_push_service()
+    return service.vapid_enabled and any(s.get("status") == "active" for s in service.get_subscriptions())
+
+
+def _active_fcm_devices(service) -> list:
+    return [d["device_id"] for d in service.get_devices() if d.get("status") == "active" and d.get("device_id")]
+
+
+def _deliver_fcm(payload: dict) -> bool:
+    from src.notifications.fcm_service import get_fcm_service
+
+    service = get_fcm_service()
+    if not service.fcm_enabled:
+        logger.debug("[OUTBOX] FCM not configured, skipping")
+        return True
+    device_ids = _active_fcm_devices(service)
+    if not device_ids:
+        return True
+    with provider_call("fcm") as call:
+        results = service.send_batch_notifications(device_ids, payload["title"], payload["body"],
+                                                   **payload.get("options", {}))
+        if not any(results.values()):
+            call.fail()
+    return any(results.values())
+
+
+def _fcm_available() -> bool:
+    from src.notifications.fcm_service import get_fcm_service
+
+    service = get_fcm_service()
+    return service.fcm_enabled and bool(_active_fcm_devices(service))
+
+
+def _email_cfg() -> dict:
+    from src.core.config_manager import get_config
+
+    return get_config().get("email", {}) or {}
+
+
+def _deliver_email(payload: dict) -> bool:
+    from src.utils.cloud.email_notifier import EmailNotifier
+
+    email_cfg = _email_cfg()
+    notifier = EmailNotifier(
+        enabled=bool(email_cfg.get("enabled")),
+        smtp_host=email_cfg.get("smtp_server", ""),
+        smtp_port=int(email_cfg.get("smtp_port", 587) or 587),
+        username=email_cfg.get("username", ""),
+        password=email_cfg.get("password", ""),
+        from_addr=email_cfg.get("from_address") or email_cfg.get("username", ""),
+        to_addr=email_cfg.get("to_address", ""),
+    )
+    if not notifier.enabled:
+        logger.debug("[OUTBOX] Email not configured, skipping")
+        return True
+    with provider_call("smtp") as call:
+        sent = notifier.send_alert(payload["subject"], payload["body"])
+        if not sent:
+            call.fail()
+    return sent
+
+
+def _email_available() -> bool:
+    email_cfg = _email_cfg()
+    return bool(email_cfg.get("enabled") and email_cfg.get("smtp_server") and email_cfg.get("to_address"))
+
+
+_outbox: Optional[NotificationOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_notification_outbox(config: Optional[dict] = None, base_dir: Optional[str] = None) -> NotificationOutbox:
+    """Get or start the shared outbox (``config`` is the notifications.outbox section)"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            if config is None:
+                try:
+                    from src.core.config_manager import get_config
+                    config = (get_config().get("notifications", {}) or {}).get("outbox", {}) or {}
+                except Exception:
+                    config = {}
+            if base_dir is None:
+                base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            outbox = NotificationOutbox(
+                os.path.join(base_dir, "logs", "notification_outbox.jsonl"),
+                workers=int(config.get("workers", 2) or 2),
+                retry_schedules=config.get("retry_schedules") or {},
+                dedupe_hours=float(config.get("dedupe_hours", 24) or 0),
+                max_age_hours=float(config.get("max_age_hours", 24) or 24),
+            )
+            outbox.register_channel("sms", _deliver_sms, _sms_available)
+            outbox.register_channel("webpush", _deliver_webpush, _webpush_available)
+            outbox.register_channel("fcm", _deliver_fcm, _fcm_available)
+            outbox.register_channel("email", _deliver_email, _email_available)
+            outbox.start()
+            atexit.register(outbox.stop)
+            _outbox = outbox
+        return _outbox
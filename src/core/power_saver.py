@@ -159,42 +159,30 @@ class PowerSaver:
         }
     
     @staticmethod
-    def estimate_runtime_on_mode(battery_percent: float, mode: str) -> tuple:
+    def estimate_runtime_on_mode(battery_percent: float, mode: str, monitor=None) -> tuple:
         """
-        Estimate runtime remaining in specific power mode.
+        Estimate runtime remaining from the measured discharge trend.
         
-        Estimates power consumption for each mode:
-        - critical: ~200 mA (minimal CPU, WiFi minimal)
-        - low: ~350 mA (low CPU, low WiFi)
-        - medium: ~500 mA (moderate CPU, normal WiFi)
-        - normal: ~700 mA (full CPU, full WiFi)
+        Uses the BatteryMonitor sampler's smoothed percent-per-hour drop, which
+        already reflects the draw of the mode in effect while it was measured
+        (the old fixed per-mode mA table ignored the actual hardware and load).
         
         Args:
             battery_percent: Current battery percentage
-            mode: Power mode name
+            mode: Power mode name (kept for callers; the trend is measured, not looked up)
+            monitor: BatteryMonitor whose telemetry sampler provides the trend
         
         Returns:
-            Tuple of (hours, minutes) estimated runtime
+            Tuple of (hours, minutes) estimated runtime, or (None, None) while
+            no discharge trend has been measured yet (or on external power)
         """
-        mode_current_ma = {
-            'critical': 200,
-            'low': 350,
-            'medium': 500,
-            'normal': 700
-        }
-        
-        if mode not in mode_current_ma:
-            mode = 'normal'
-        
-        # Assume 10,000 mAh powerbank with standard conversion
-        powerbank_mah = 10000
-        conversion_efficiency = 0.85
-        usable_mah = powerbank_mah * (3.7 / 5.0) * conversion_efficiency  # ~6,290 mAh
+        if mode not in PowerSaver.POWER_MODES:
+            logger.debug(f"[POWER] Unknown power mode for runtime estimate: {mode}")
         
-        remaining_mah = (battery_percent / 100.0) * usable_mah
-        current_ma = mode_current_ma[mode]
+        runtime_hours = monitor.predict_runtime_hours(battery_percent) if monitor is not None else None
+        if runtime_hours is None:
+            return None, None
         
-        runtime_hours = remaining_mah / current_ma
         hours = int(runtime_hours)
         minutes = int((runtime_hours - hours) * 60)
         
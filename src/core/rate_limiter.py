@@ -0,0 +1,115 @@
+"""
+Rate Limiter - sliding-window counters with bounded memory
+==========================================================
+Shared engine behind ``security.RateLimiter`` (per-route decorator) and
+``security_middleware.RateLimiter`` (before_request limits). The old
+limiters kept every request timestamp per IP, rescanned that list on each
+call and never forgot an IP, so a scan through the tunnel grew them without
+bound.
+
+- Sliding-window counter per key: the current and previous fixed window
+  counts, weighted by how far into the current window we are. Three numbers
+  per key, O(1) per check
+- Keys live in an LRU (OrderedDict); each hit evicts from the cold end the
+  keys idle for longer than ``idle_ttl`` (two windows by default, when their
+  counts no longer matter) and anything beyond ``max_keys``
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+DEFAULT_MAX_KEYS = 4096
+
+
+class SlidingWindowLimiter:
+    """
+    ``limit`` requests per ``window_seconds`` per key.
+
+    Usage:
+        limiter = SlidingWindowLimiter(10, 900)
+        if not limiter.hit(client_ip):
+            abort(429)
+    """
+
+    __slots__ = ("limit", "window_seconds", "max_keys", "idle_ttl", "_entries", "_lock", "evicted")
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = DEFAULT_MAX_KEYS,
+                 idle_ttl: Optional[float] = None):
+        self.limit = max(1, int(limit))
+        self.window_seconds = max(1.0, float(window_seconds))
+        self.max_keys = max(1, int(max_keys))
+        self.idle_ttl = float(idle_ttl) if idle_ttl else 2 * self.window_seconds
+        # key -> [window index, previous window count, current window count, last seen]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _entry_locked(self, key: Hashable, now: float) -> list:
+        index = int(now // self.window_seconds)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [index, 0, 0, now]
+            self._entries[key] = entry
+        else:
+            self._entries.move_to_end(key)
+            if entry[0] != index:
+                # Roll the window: the current count becomes the previous one
+                # (or zero when one or more whole windows passed in between)
+                entry[1] = entry[2] if index - entry[0] == 1 else 0
+                entry[2] = 0
+                entry[0] = index
+        return entry
+
+    def _estimate(self, entry: list, now: float) -> float:
+        elapsed = (now % self.window_seconds) / self.window_seconds
+        return entry[1] * (1.0 - elapsed) + entry[2]
+
+    def _evict_locked(self, now: float) -> None:
+        entries = self._entries
+        cutoff = now - self.idle_ttl
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if len(entries) <= self.max_keys and entry[3] >= cutoff:
+                break
+            del entries[key]
+            self.evicted += 1
+
+    def hit(self, key: Hashable) -> bool:
+        """Count a request for ``key``; False when it is over the limit (and is not counted)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entry_locked(key, now)
+            entry[3] = now
+            allowed = self._estimate(entry, now) < self.limit
+            if allowed:
+                entry[2] += 1
+            self._evict_locked(now)
+            return allowed
+
+    def remaining(self, key: Hashable) -> int:
+        """Requests ``key`` may still make in the current window"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self.limit
+            index = int(now // self.window_seconds)
+            previous, current = entry[1], entry[2]
+            if entry[0] != index:
+                previous, current = (current if index - entry[0] == 1 else 0), 0
+            elapsed = (now % self.window_seconds) / self.window_seconds
+            return max(0, int(self.limit - (previous * (1.0 - elapsed) + current)))
+
+    def reset(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "window_seconds": self.window_seconds,
+                    "keys": len(self._entries), "max_keys": self.max_keys, "evicted": self.evicted}
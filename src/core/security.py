@@ -5,7 +5,7 @@ Implements:
 - CSRF protection
 - XSS prevention
 - SQL injection prevention (parameterization)
-- Rate limiting
+- Rate limiting (sliding-window counters, see rate_limiter.py)
 - API authentication
 - HTTPS/SSL enforcement
 - Security headers
@@ -14,19 +14,24 @@ Implements:
 
 from functools import wraps
 from flask import request, abort, current_app
-from datetime import datetime, timedelta
+from datetime import datetime
 import hashlib
 import hmac
 import secrets
 import re
+import threading
+from typing import Optional
 from loguru import logger
 
+from .rate_limiter import DEFAULT_MAX_KEYS, SlidingWindowLimiter
+
 
 class RateLimiter:
-    """Simple rate limiter using in-memory cache."""
+    """Per-route rate limiter: one sliding-window counter per endpoint class."""
     
-    def __init__(self):
-        self.requests = {}  # {ip: [(timestamp, endpoint)]}
+    def __init__(self, window_seconds: int = 60, max_keys: int = DEFAULT_MAX_KEYS):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
         self.limits = {
             '/api/': 100,           # 100 requests per minute
             '/api/battery': 60,     # 60 per minute for battery
@@ -34,29 +39,40 @@ class RateLimiter:
             '/register': 3,         # 3 registrations per minute (spam protection)
             '/video_feed': 1,       # 1 concurrent stream per IP
         }
+        self.default_limit = 100
+        self._limiters = {}  # {(endpoint class, window): SlidingWindowLimiter}
+        self._classes = {}   # {endpoint: endpoint class}, resolved once per route
+        self._lock = threading.Lock()
+    
+    def _resolve(self, endpoint: str) -> str:
+        """Longest configured prefix of ``endpoint`` (the endpoint itself if none)"""
+        endpoint_class = self._classes.get(endpoint)
+        if endpoint_class is None:
+            matches = [prefix for prefix in self.limits if endpoint.startswith(prefix)]
+            endpoint_class = max(matches, key=len) if matches else endpoint
+            self._classes[endpoint] = endpoint_class
+        return endpoint_class
+    
+    def _limiter(self, endpoint_class: str, window_seconds: int) -> SlidingWindowLimiter:
+        key = (endpoint_class, window_seconds)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limit = self.limits.get(endpoint_class, self.default_limit)
+                    limiter = SlidingWindowLimiter(limit, window_seconds, max_keys=self.max_keys)
+                    self._limiters[key] = limiter
+        return limiter
     
-    def is_allowed(self, ip: str, endpoint: str, window_seconds: int = 60) -> bool:
+    def is_allowed(self, ip: str, endpoint: str, window_seconds: Optional[int] = None) -> bool:
         """Check if request is allowed."""
-        now = datetime.now()
-        cutoff = now - timedelta(seconds=window_seconds)
-        
-        if ip not in self.requests:
-            self.requests[ip] = []
-        
-        # Remove old requests
-        self.requests[ip] = [(ts, ep) for ts, ep in self.requests[ip] if ts > cutoff]
-        
-        # Get limit for endpoint
-        limit = self.limits.get(endpoint, 100)
-        
-        # Check count
-        count = sum(1 for ts, ep in self.requests[ip] if ep.startswith(endpoint))
-        if count >= limit:
-            return False
-        
-        # Add this request
-        self.requests[ip].append((now, endpoint))
-        return True
+        endpoint_class = self._resolve(endpoint or '')
+        return self._limiter(endpoint_class, window_seconds or self.window_seconds).hit(ip)
+    
+    def get_stats(self) -> dict:
+        """Counter sizes per endpoint class."""
+        return {endpoint_class: limiter.get_stats() for (endpoint_class, _), limiter in list(self._limiters.items())}
 
 
 class SecurityHeaders:
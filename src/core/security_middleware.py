@@ -5,52 +5,28 @@ Provides CSRF protection, rate limiting, security headers, and HTTPS enforcement
 
 from flask import Flask, request, session, abort
 from functools import wraps
-from datetime import datetime, timedelta
 import os
 import hashlib
 from loguru import logger
 from werkzeug.security import generate_password_hash, check_password_hash
-from collections import defaultdict, deque
-import threading
+
+from .rate_limiter import DEFAULT_MAX_KEYS, SlidingWindowLimiter
 
 class RateLimiter:
     """Track and limit requests per IP address"""
     
-    def __init__(self, max_requests=100, window_seconds=3600):
+    def __init__(self, max_requests=100, window_seconds=3600, max_keys=DEFAULT_MAX_KEYS):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(deque)
-        self.lock = threading.Lock()
+        self.counter = SlidingWindowLimiter(max_requests, window_seconds, max_keys=max_keys)
     
     def is_rate_limited(self, identifier):
         """Check if identifier (IP) has exceeded rate limit"""
-        with self.lock:
-            now = datetime.now()
-            cutoff = now - timedelta(seconds=self.window_seconds)
-            
-            # Clean old requests
-            while self.requests[identifier] and self.requests[identifier][0] < cutoff:
-                self.requests[identifier].popleft()
-            
-            # Check limit
-            if len(self.requests[identifier]) >= self.max_requests:
-                return True
-            
-            # Add current request
-            self.requests[identifier].append(now)
-            return False
+        return not self.counter.hit(identifier)
     
     def get_remaining(self, identifier):
         """Get remaining requests for identifier"""
-        with self.lock:
-            now = datetime.now()
-            cutoff = now - timedelta(seconds=self.window_seconds)
-            
-            # Clean old requests
-            while self.requests[identifier] and self.requests[identifier][0] < cutoff:
-                self.requests[identifier].popleft()
-            
-            return max(0, self.max_requests - len(self.requests[identifier]))
+        return self.counter.remaining(identifier)
 
 
 class CSRFProtection:
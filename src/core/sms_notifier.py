@@ -1,10 +1,11 @@
 """SMS/Text message alerting system for motion events"""
-import requests
 import os
 from datetime import datetime, timedelta
-from threading import RLock, Thread
+from threading import RLock
 import json
 from loguru import logger
+from src.utils.perf_metrics import timer
+from src.utils.http_client import ProviderUnavailable, post, provider_call
 
 _lock = RLock()
 
@@ -39,20 +40,28 @@ def save_sms_history(history):
         logger.error(f"[SMS] Error saving history: {e}")
 
 
+# phone -> timestamp of the last delivered SMS; seeded once from the history file
+_last_sent = None
+
+
+def _last_sent_times():
+    """Last-send index (caller holds _lock)"""
+    global _last_sent
+    if _last_sent is None:
+        _last_sent = {}
+        for s in load_sms_history():
+            phone = s.get('phone')
+            if phone and s.get('timestamp', 0) > _last_sent.get(phone, 0):
+                _last_sent[phone] = s.get('timestamp', 0)
+    return _last_sent
+
+
 def is_rate_limited(phone_number, min_interval_minutes=5):
     """Check if SMS sending is rate limited for this phone"""
     with _lock:
         try:
-            history = load_sms_history()
             cutoff_time = (datetime.now() - timedelta(minutes=min_interval_minutes)).timestamp()
-            
-            # Find recent SMS to this number
-            recent_sms = [
-                s for s in history
-                if s.get('phone') == phone_number and s.get('timestamp', 0) > cutoff_time
-            ]
-            
-            return len(recent_sms) > 0
+            return _last_sent_times().get(phone_number, 0) > cutoff_time
         except Exception as e:
             logger.error(f"[SMS] Error checking rate limit: {e}")
             return False
@@ -88,43 +97,56 @@ class SMSNotifier:
         self.provider = self.config.get("provider", "twilio")
         self.rate_limit_minutes = self.config.get("rate_limit_minutes", 5)
         self.motion_threshold = self.config.get("motion_threshold", 0.5)
+        self._sns_client = None
         
         if self.enabled:
             logger.info(f"[SMS] Notifier initialized with provider: {self.provider}")
     
-    def send_sms(self, phone_number, message):
-        """Send SMS to phone number (non-blocking)"""
+    def send_sms(self, phone_number, message, key=None, check_rate_limit=True, fallback=None):
+        """Queue an SMS on the notification outbox (non-blocking)
+
+        ``key`` is an idempotency key: a message with the same key is only
+        delivered once. Callers that pace their own messages (motion digests)
+        pass ``check_rate_limit=False``. ``fallback`` lists outbox channels to
+        try when the SMS provider's circuit is open.
+        """
         if not self.enabled:
             logger.debug("[SMS] SMS notifications disabled")
             return False
         
         # Rate limiting check
-        if is_rate_limited(phone_number, self.rate_limit_minutes):
+        if check_rate_limit and is_rate_limited(phone_number, self.rate_limit_minutes):
             logger.info(f"[SMS] Rate limited for {phone_number} (min interval: {self.rate_limit_minutes}m)")
             return False
         
-        # Send in background thread to avoid blocking
-        thread = Thread(target=self._send_sms_async, args=(phone_number, message), daemon=True)
-        thread.start()
-        return True
+        # Delivery, retries and backoff happen on the outbox workers
+        from .notification_outbox import get_notification_outbox
+        item_id = get_notification_outbox().enqueue(
+            "sms", {"phone": phone_number, "message": message}, key=key, fallback=fallback)
+        return item_id is not None
     
-    def _send_sms_async(self, phone_number, message):
-        """Actually send SMS (runs in background)"""
+    def deliver(self, phone_number, message):
+        """Send SMS now through the configured provider (outbox worker); True on success
+
+        Raises ProviderUnavailable while the provider's circuit is open.
+        """
         try:
             success = False
             
-            if self.provider == "twilio":
-                success = self._send_twilio(phone_number, message)
-            elif self.provider == "sns":
-                success = self._send_sns(phone_number, message)
-            elif self.provider == "plivo":
-                success = self._send_plivo(phone_number, message)
-            elif self.provider == "generic_http":
-                success = self._send_generic_http(phone_number, message)
+            with timer('mecam_notification_seconds', channel='sms'):
+                if self.provider == "twilio":
+                    success = self._send_twilio(phone_number, message)
+                elif self.provider == "sns":
+                    success = self._send_sns(phone_number, message)
+                elif self.provider == "plivo":
+                    success = self._send_plivo(phone_number, message)
+                elif self.provider == "generic_http":
+                    success = self._send_generic_http(phone_number, message)
             
             # Track SMS if successful
             if success:
                 with _lock:
+                    _last_sent_times()[phone_number] = datetime.now().timestamp()
                     history = load_sms_history()
                     history.append({
                         "phone": phone_number,
@@ -139,9 +161,13 @@ class SMSNotifier:
                     logger.success(f"[SMS] Sent to {phone_number}")
             else:
                 logger.error(f"[SMS] Failed to send to {phone_number}")
+            return success
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[SMS] Error sending SMS: {e}")
+            return False
     
     def _send_twilio(self, phone_number, message):
         """Send via Twilio"""
@@ -157,11 +183,11 @@ class SMSNotifier:
             
             url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
             
-            response = requests.post(
+            response = post(
+                "twilio",
                 url,
                 data={"From": phone_from, "To": phone_number, "Body": message},
-                auth=(account_sid, auth_token),
-                timeout=10
+                auth=(account_sid, auth_token)
             )
             
             if response.status_code in [200, 201]:
@@ -170,6 +196,8 @@ class SMSNotifier:
                 logger.error(f"[SMS] Twilio error: {response.status_code} - {response.text}")
                 return False
                 
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[SMS] Twilio send error: {e}")
             return False
@@ -177,13 +205,18 @@ class SMSNotifier:
     def _send_sns(self, phone_number, message):
         """Send via AWS SNS"""
         try:
-            import boto3
-            client = boto3.client("sns")
-            response = client.publish(
-                PhoneNumber=phone_number,
-                Message=message
-            )
+            with provider_call("sns"):
+                if self._sns_client is None:
+                    import boto3
+                    region = (self.config.get("sns", {}) or {}).get("region")
+                    self._sns_client = boto3.client("sns", region_name=region) if region else boto3.client("sns")
+                response = self._sns_client.publish(
+                    PhoneNumber=phone_number,
+                    Message=message
+                )
             return response.get("MessageId") is not None
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[SMS] SNS send error: {e}")
             return False
@@ -202,19 +235,21 @@ class SMSNotifier:
             
             url = f"https://api.plivo.com/v1/Account/{auth_id}/Message/"
             
-            response = requests.post(
+            response = post(
+                "plivo",
                 url,
                 data={
                     "src": phone_from,
                     "dst": phone_number,
                     "text": message
                 },
-                auth=(auth_id, auth_token),
-                timeout=10
+                auth=(auth_id, auth_token)
             )
             
             return response.status_code in [200, 201]
             
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[SMS] Plivo send error: {e}")
             return False
@@ -234,15 +269,17 @@ class SMSNotifier:
             if auth_token:
                 headers["Authorization"] = f"Bearer {auth_token}"
             
-            response = requests.post(
+            response = post(
+                "sms_http",
                 url,
                 json={"phone": phone_number, "message": message},
-                headers=headers,
-                timeout=10
+                headers=headers
             )
             
             return response.status_code in [200, 201]
             
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[SMS] Generic HTTP send error: {e}")
             return False
@@ -0,0 +1,255 @@
+"""
+Fleet-wide Event Search
+=======================
+Searches motion events across every camera from the hub in one query.
+
+- Devices are queried concurrently. The page waits at most ``timeout``; a
+  slow camera makes the page partial instead of blocking it, and its fetch
+  keeps running (up to ``fetch_timeout``) so a retry picks it up.
+- Each device's newest-first list goes into a k-way merge by timestamp.
+  The opaque cursor is the last (timestamp, device, id) returned, so the
+  next page resumes exactly there across all cameras.
+- Per-device results are cached briefly, so paging uses one consistent
+  snapshot instead of re-querying every Pi. Complete pages are cached in
+  a small LRU.
+- A device that returns ``fetch_limit`` events may have older ones that were
+  never fetched. Such a page has ``truncated`` set (and ``has_more``
+  true) instead of silently ending; narrowing ``hours`` reaches the rest.
+"""
+
+import base64
+import heapq
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+
+def _event_time(event: dict) -> float:
+    """Unix time of an event (motion_logger stores both unix_timestamp and ISO timestamp)."""
+    ts = event.get("unix_timestamp")
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    try:
+        dt = datetime.fromisoformat(str(event.get("timestamp")).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)  # motion_logger writes naive UTC
+        return dt.timestamp()
+    except Exception:
+        return 0.0
+
+
+class DeviceEvents(list):
+    """One device's newest-first events; ``truncated`` when the device hit ``fetch_limit``."""
+
+    truncated = False
+
+
+def _sort_key(event: dict):
+    return (event["_t"], event["device"], str(event.get("id", "")))
+
+
+def encode_cursor(event: dict) -> str:
+    raw = json.dumps([event["_t"], event["device"], str(event.get("id", ""))]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        t, device, event_id = json.loads(raw)
+        return (float(t), str(device), str(event_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class FleetEventSearch:
+    """
+    Concurrent fan-out search over each device's ``/api/motion/events``.
+
+    Usage:
+        search = FleetEventSearch([{"name": "Front Door", "url": "http://camera1.local:8080"}])
+        page = search.search(hours=12, event_type="person", limit=50)
+        more = search.search(hours=12, event_type="person", limit=50, cursor=page["next_cursor"])
+    """
+
+    def __init__(self, devices: List[dict], timeout: float = 3.0, fetch_timeout: float = 10.0,
+                 workers: int = 8, fetch_limit: int = 500, result_ttl: float = 30.0,
+                 failure_ttl: float = 10.0, page_cache_size: int = 64):
+        self.devices = [d for d in devices if d.get("url")]
+        self.timeout = float(timeout)
+        self.fetch_timeout = max(self.timeout, float(fetch_timeout))
+        self.failure_ttl = float(failure_ttl)
+        self.fetch_limit = int(fetch_limit)
+        self.result_ttl = float(result_ttl)
+        self.page_cache_size = int(page_cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="fleet-events")
+        self._sessions = {}
+        self._results = {}  # (device, hours, type) -> (fetched_at, events or exception)
+        self._inflight = {}  # (device, hours, type) -> future
+        self._pages = OrderedDict()
+        self._lock = threading.RLock()  # done-callbacks can fire inline under the lock
+
+    # ----- device fetches -----
+
+    def _session_for(self, name: str):
+        import requests
+
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._sessions[name] = requests.Session()
+            return session
+
+    def _fetch_device(self, device: dict, hours: int, event_type: Optional[str]) -> DeviceEvents:
+        name = device.get("name") or device["url"]
+        base = device["url"].rstrip("/")
+        session = self._session_for(name)
+        params = {"hours": hours, "limit": self.fetch_limit}
+        if event_type:
+            params["type"] = event_type
+        resp = session.get(f"{base}/api/motion/events", params=params, timeout=self.fetch_timeout)
+        if resp.status_code == 401 and device.get("username"):
+            session.post(f"{base}/login", timeout=self.fetch_timeout, allow_redirects=False,
+                         data={"username": device["username"], "password": device.get("password", "")})
+            resp = session.get(f"{base}/api/motion/events", params=params, timeout=self.fetch_timeout)
+        resp.raise_for_status()
+        raw_events = resp.json().get("events") or []
+        events = DeviceEvents()
+        events.truncated = len(raw_events) >= self.fetch_limit
+        for event in raw_events:
+            if not isinstance(event, dict):
+                continue
+            # app_lite ignores ?type=, so filter here as well
+            if event_type and event.get("type") != event_type:
+                continue
+            event = dict(event)
+            event["_t"] = _event_time(event)
+            event["device"] = name
+            event["device_url"] = base
+            events.append(event)
+        events.sort(key=_sort_key, reverse=True)
+        return events
+
+    def _device_results(self, hours: int, event_type: Optional[str]):
+        """Start (or reuse) every device's fetch; return {name: events, exception or future}."""
+        now = time.time()
+        pending = {}
+        with self._lock:
+            for device in self.devices:
+                name = device.get("name") or device["url"]
+                key = (name, hours, event_type)
+                cached = self._results.get(key)
+                ttl = self.failure_ttl if isinstance(cached and cached[1], Exception) else self.result_ttl
+                if cached and now - cached[0] < ttl:
+                    pending[name] = cached[1]
+                    continue
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._executor.submit(self._fetch_device, device, hours, event_type)
+                    # Later pages don't wait again for a fetch an earlier page already gave up on
+                    future.deadline = time.monotonic() + self.timeout
+                    self._inflight[key] = future
+                    future.add_done_callback(lambda f, key=key: self._store_result(key, f))
+                pending[name] = future
+        return pending
+
+    def _store_result(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            now = time.time()
+            # Failures are remembered briefly so an offline camera doesn't cost every page a full wait
+            error = future.exception()
+            self._results[key] = (now, error if error is not None else future.result())
+            for stale in [k for k, (at, _) in self._results.items() if now - at >= self.result_ttl]:
+                del self._results[stale]
+
+    # ----- search -----
+
+    def search(self, hours: int = 24, event_type: Optional[str] = None, limit: int = 50,
+               cursor: Optional[str] = None) -> dict:
+        hours = max(1, min(24 * 31, int(hours)))
+        limit = max(1, min(500, int(limit)))
+        after = decode_cursor(cursor)
+        page_key = (hours, event_type, limit, cursor)
+
+        with self._lock:
+            page = self._pages.get(page_key)
+            if page is not None and time.time() - page["generated_at"] < self.result_ttl:
+                self._pages.move_to_end(page_key)
+                return dict(page, cached=True)
+
+        started = time.monotonic()
+        results = self._device_results(hours, event_type)
+        futures = [r for r in results.values() if not isinstance(r, (list, Exception))]
+        if futures:
+            wait(futures, timeout=max(0.0, max(f.deadline for f in futures) - time.monotonic()))
+
+        lists, devices = [], {}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                devices[name] = {"ok": False, "error": str(result)}
+                continue
+            if not isinstance(result, list):
+                if not result.done():
+                    devices[name] = {"ok": False, "error": "timeout"}
+                    continue
+                if result.exception() is not None:
+                    devices[name] = {"ok": False, "error": str(result.exception())}
+                    continue
+                result = result.result()
+            lists.append(result)
+            devices[name] = {"ok": True, "events": len(result),
+                             "truncated": bool(getattr(result, "truncated", False))}
+
+        events = []
+        for event in heapq.merge(*lists, key=_sort_key, reverse=True):
+            if after is not None and _sort_key(event) >= after:
+                continue
+            events.append(event)
+            if len(events) > limit:
+                break
+        more_fetched = len(events) > limit
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1]) if more_fetched and events else None
+        # Some device has events older than the ones it returned; more may exist past this page
+        truncated = any(d.get("truncated") for d in devices.values())
+
+        partial = any(not d["ok"] for d in devices.values())
+        page = {
+            "ok": True,
+            "events": [{k: v for k, v in e.items() if k != "_t"} for e in events],
+            "count": len(events),
+            "next_cursor": next_cursor,
+            "has_more": more_fetched or truncated,
+            "truncated": truncated,
+            "partial": partial,
+            "devices": devices,
+            "took_ms": round((time.monotonic() - started) * 1000, 1),
+            "generated_at": time.time(),
+        }
+        if partial:
+            logger.info(f"[EVENTS] Partial fleet search: {', '.join(n for n, d in devices.items() if not d['ok'])}")
+        else:
+            # Only complete pages are cached; a partial one should fill in on retry
+            with self._lock:
+                self._pages[page_key] = page
+                while len(self._pages) > self.page_cache_size:
+                    self._pages.popitem(last=False)
+        return dict(page, cached=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "devices": len(self.devices),
+                "cached_results": len(self._results),
+                "cached_pages": len(self._pages),
+                "in_flight": len(self._inflight),
+            }
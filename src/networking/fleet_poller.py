@@ -0,0 +1,284 @@
+"""
+Fleet Status Poller
+===================
+Probes every configured camera in the background so ``/api/devices`` can
+answer from memory instead of probing each device inside the request.
+
+- Devices are probed concurrently on a small thread pool.
+- HTTP goes through one keep-alive ``requests.Session``, so repeat probes
+  reuse TCP connections.
+- Each device gets its own adaptive interval. Healthy devices are probed
+  less often over time, offline devices back off, and any status change
+  snaps back to the base interval.
+- ``/api/status`` on a camera supplies battery, storage and events_24h.
+  Devices without the API that still answer on TCP 8080/22 count as
+  online, without telemetry.
+- A device's configured ``url`` fixes the scheme. Otherwise HTTPS (the
+  camera default, self-signed) is tried before HTTP and the scheme that
+  answered is remembered.
+"""
+
+import socket
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from loguru import logger
+
+
+class FleetPoller:
+    """
+    Background, concurrent status cache for fleet devices.
+
+    Usage:
+        poller = FleetPoller()
+        poller.track(["192.168.1.20", "camera2.local"])   # starts on first call
+        poller.track({"camera2.local": {"url": "http://camera2.local:8080"}})
+        state = poller.get("192.168.1.20")                 # never blocks on the network
+    """
+
+    def __init__(self, port: int = 8080, workers: int = 8, timeout: float = 1.2,
+                 base_interval: float = 10.0, max_interval: float = 60.0,
+                 offline_max_interval: float = 120.0, verify_tls: bool = False):
+        self.port = int(port)
+        self.verify_tls = bool(verify_tls)
+        self.timeout = float(timeout)
+        self.base_interval = float(base_interval)
+        self.max_interval = float(max_interval)
+        self.offline_max_interval = float(offline_max_interval)
+        self.workers = max(1, int(workers))
+        self._states: Dict[str, dict] = {}
+        self._urls: Dict[str, str] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._first_round = threading.Event()
+        self._stop = threading.Event()
+        self._executor = None
+        self._thread = None
+        self._session = None
+
+    # ----- public API -----
+
+    def track(self, hosts: Iterable[str]) -> None:
+        """
+        Set the hosts to poll (new hosts are probed immediately, removed ones are forgotten).
+
+        ``hosts`` may map each host to its device config; a ``url`` there is
+        probed as-is instead of guessing the scheme.
+        """
+        wanted = {h for h in hosts if h}
+        urls = {}
+        if isinstance(hosts, Mapping):
+            for host, device in hosts.items():
+                url = device.get("url") if isinstance(device, dict) else None
+                if host and url:
+                    urls[host] = url.rstrip("/")
+        with self._lock:
+            self._urls = urls
+            for host in list(self._states):
+                if host not in wanted:
+                    del self._states[host]
+            added = [h for h in wanted if h not in self._states]
+            for host in added:
+                self._states[host] = self._new_state()
+        self._ensure_started()
+        if added:
+            self._wake.set()
+
+    def refresh(self, host: Optional[str] = None) -> None:
+        """Make ``host`` (or every host) due now."""
+        with self._lock:
+            for h, state in self._states.items():
+                if host is None or h == host:
+                    state["next_due"] = 0.0
+        self._wake.set()
+
+    def get(self, host: str) -> Optional[dict]:
+        with self._lock:
+            state = self._states.get(host)
+            return dict(state) if state else None
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Block until the first probe round finished (used once so a cold page isn't all 'unknown')."""
+        return self._first_round.wait(timeout)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            states = list(self._states.values())
+        return {
+            "devices": len(states),
+            "online": sum(1 for s in states if s["status"] == "online"),
+            "in_flight": len(self._in_flight),
+        }
+
+    # ----- internals -----
+
+    def _new_state(self) -> dict:
+        return {
+            "status": "unknown",
+            "reachable": False,
+            "last_seen": None,
+            "last_probe": None,
+            "latency_ms": None,
+            "failures": 0,
+            "interval": self.base_interval,
+            "next_due": 0.0,
+            "battery": None,
+            "storage_used_gb": None,
+            "events_24h": None,
+            "version": None,
+            "scheme": None,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._session = requests.Session()
+            if not self.verify_tls:
+                # Cameras serve a self-signed certificate; only status is read here
+                import urllib3
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers, max_retries=0)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fleet-probe")
+            self._thread = threading.Thread(target=self._schedule_loop, name="fleet-poller", daemon=True)
+            self._thread.start()
+            logger.info(f"[FLEET] Poller started ({self.workers} workers, {self.timeout}s timeout)")
+
+    def _schedule_loop(self) -> None:
+        while not self._stop.is_set():
+            now = time.time()
+            with self._lock:
+                due = [h for h, s in self._states.items()
+                       if s["next_due"] <= now and h not in self._in_flight]
+                self._in_flight.update(due)
+                pending = [s["next_due"] for h, s in self._states.items() if h not in self._in_flight]
+            futures = [self._executor.submit(self._probe_and_store, host) for host in due]
+            if futures and not self._first_round.is_set():
+                for future in futures:
+                    future.add_done_callback(lambda _f: self._mark_first_round())
+            elif not self._states:
+                self._first_round.set()
+            sleep_for = max(0.2, min(pending) - time.time()) if pending else 1.0
+            self._wake.wait(min(sleep_for, 5.0))
+            self._wake.clear()
+
+    def _mark_first_round(self) -> None:
+        with self._lock:
+            if not self._in_flight:
+                self._first_round.set()
+
+    def _probe_and_store(self, host: str) -> None:
+        try:
+            result = self._probe(host)
+        except Exception as e:
+            logger.debug(f"[FLEET] Probe error for {host}: {e}")
+            result = {"status": "offline", "reachable": False}
+        now = time.time()
+        with self._lock:
+            self._in_flight.discard(host)
+            state = self._states.get(host)
+            if state is None:
+                return
+            changed = state["status"] != result["status"]
+            state.update(result)
+            state["last_probe"] = now
+            if result["status"] == "online":
+                state["last_seen"] = now
+                state["failures"] = 0
+                # Stable devices are probed less and less often; a change resets the pace
+                state["interval"] = self.base_interval if changed else min(self.max_interval, state["interval"] * 1.5)
+            else:
+                state["failures"] += 1
+                state["interval"] = self.base_interval if changed else min(self.offline_max_interval, state["interval"] * 2)
+            state["next_due"] = now + state["interval"]
+        if changed:
+            logger.info(f"[FLEET] {host} is {result['status']}")
+
+    def _base_urls(self, host: str) -> list:
+        with self._lock:
+            url = self._urls.get(host)
+            state = self._states.get(host) or {}
+        if url:
+            return [url]
+        schemes = ("http", "https") if state.get("scheme") == "http" else ("https", "http")
+        return [f"{scheme}://{host}:{self.port}" for scheme in schemes]
+
+    def _probe(self, host: str) -> dict:
+        from requests.exceptions import ConnectTimeout
+
+        for base in self._base_urls(host):
+            started = time.monotonic()
+            try:
+                resp = self._session.get(f"{base}/api/status", timeout=self.timeout, verify=self.verify_tls)
+            except ConnectTimeout:
+                break  # host unreachable, the other scheme won't do better
+            except Exception:
+                continue  # TLS handshake against plain HTTP (or vice versa), refused, ...
+            latency_ms = round((time.monotonic() - started) * 1000, 1)
+            result = {"status": "online", "reachable": True, "latency_ms": latency_ms,
+                      "scheme": base.split("://", 1)[0]}
+            try:
+                if 200 <= resp.status_code < 300:
+                    result.update(self._parse_status(resp.json()))
+            except ValueError:
+                pass
+            finally:
+                resp.close()
+            return result
+
+        for port in (self.port, 22):
+            started = time.monotonic()
+            try:
+                with socket.create_connection((host, port), timeout=self.timeout):
+                    return {
+                        "status": "online",
+                        "reachable": True,
+                        "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                    }
+            except Exception:
+                continue
+        return {"status": "offline", "reachable": False, "latency_ms": None}
+
+    @staticmethod
+    def _parse_status(payload: dict) -> dict:
+        """Telemetry from a camera's /api/status (app_lite and app.py shapes)."""
+        if not isinstance(payload, dict):
+            return {}
+        battery = payload.get("battery") or {}
+        storage = payload.get("storage") or {}
+        return {
+            "battery": battery.get("percent") if isinstance(battery, dict) else None,
+            "storage_used_gb": storage.get("used_gb") if isinstance(storage, dict) else None,
+            "events_24h": payload.get("events_24h"),
+            "version": payload.get("version"),
+        }
+
+
+_fleet_poller: Optional[FleetPoller] = None
+
+
+def get_fleet_poller() -> FleetPoller:
+    """Process-wide poller instance."""
+    global _fleet_poller
+    if _fleet_poller is None:
+        _fleet_poller = FleetPoller()
+    return _fleet_poller
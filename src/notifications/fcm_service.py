@@ -6,7 +6,7 @@ Features:
 - Device token management
 - Rich notifications with images
 - Topic-based messaging
-- Batch notifications
+- Batch notifications (chunked multicast, one token-file write per batch)
 - Android and iOS support
 """
 
@@ -17,6 +17,8 @@ from threading import Lock
 from typing import Optional, Dict, List
 from loguru import logger
 
+from src.utils.perf_metrics import timer
+
 try:
     import firebase_admin
     from firebase_admin import credentials, messaging
@@ -28,6 +30,10 @@ except ImportError:
     FIREBASE_AVAILABLE = False
     logger.warning("[FCM] firebase-admin not available - FCM disabled")
 
+# FCM accepts at most 500 tokens per multicast request
+MULTICAST_LIMIT = 500
+MAX_CONSECUTIVE_FAILURES = 5
+
 
 class FirebaseCloudMessaging:
     """
@@ -191,77 +197,29 @@ class FirebaseCloudMessaging:
         Returns:
             Dictionary mapping device_id to success boolean
         """
-        if not self.fcm_enabled:
-            logger.warning("[FCM] FCM not enabled")
-            return {}
-        
-        results = {}
-        
-        for device_id in device_ids:
-            # Get device token
-            with self.tokens_lock:
-                device_info = self.device_tokens.get(device_id)
-            
-            if not device_info:
-                logger.warning(f"[FCM] Device not found: {device_id}")
-                results[device_id] = False
-                continue
-            
-            fcm_token = device_info['fcm_token']
-            platform = device_info.get('platform', 'android')
-            
-            # Send notification
-            success = self._send_fcm_message(
-                fcm_token,
-                title,
-                body,
-                image_url,
-                data,
-                platform,
-                android_priority,
-                ios_badge
-            )
-            
-            results[device_id] = success
-            
-            # Update device stats
-            if success:
-                with self.tokens_lock:
-                    device_info['last_used'] = datetime.utcnow().isoformat()
-                    device_info['notification_count'] += 1
-                    self._save_tokens()
-            else:
-                # Mark token as potentially invalid
-                with self.tokens_lock:
-                    device_info['status'] = 'error'
-                    self._save_tokens()
-        
-        return results
+        return self.send_batch_notifications(device_ids, title, body, image_url=image_url, data=data,
+                                             android_priority=android_priority, ios_badge=ios_badge)
     
-    def _send_fcm_message(self,
-                         fcm_token: str,
-                         title: str,
-                         body: str,
-                         image_url: Optional[str],
-                         data: Optional[Dict],
-                         platform: str,
-                         android_priority: str,
-                         ios_badge: Optional[int]) -> bool:
-        """Send a single FCM message"""
-        try:
-            # Build notification
-            notification = messaging.Notification(
+    def _build_multicast_template(self,
+                                  title: str,
+                                  body: str,
+                                  image_url: Optional[str] = None,
+                                  data: Optional[Dict] = None,
+                                  android_priority: str = 'high',
+                                  ios_badge: Optional[int] = None) -> Dict:
+        """Message fields shared by every chunk (FCM applies android/apns per platform)"""
+        # Build data payload
+        data_payload = dict(data or {})
+        data_payload['timestamp'] = str(int(datetime.utcnow().timestamp()))
+        
+        return {
+            'notification': messaging.Notification(
                 title=title,
                 body=body,
                 image=image_url
-            )
-            
-            # Build data payload
-            data_payload = data or {}
-            data_payload['timestamp'] = str(int(datetime.utcnow().timestamp()))
-            
-            # Platform-specific configuration
-            android_config = messaging.AndroidConfig(
+            ),
+            'data': {k: str(v) for k, v in data_payload.items()},  # FCM requires string values
+            'android': messaging.AndroidConfig(
                 priority=android_priority,
                 notification=messaging.AndroidNotification(
                     icon='camera_icon',
@@ -269,9 +227,8 @@ class FirebaseCloudMessaging:
                     sound='default',
                     channel_id='mecam_alerts'
                 )
-            )
-            
-            apns_config = messaging.APNSConfig(
+            ),
+            'apns': messaging.APNSConfig(
                 payload=messaging.APNSPayload(
                     aps=messaging.Aps(
                         badge=ios_badge,
@@ -279,33 +236,8 @@ class FirebaseCloudMessaging:
                         category='MECAM_ALERT'
                     )
                 )
-            )
-            
-            # Create message
-            message = messaging.Message(
-                notification=notification,
-                data={k: str(v) for k, v in data_payload.items()},  # FCM requires string values
-                token=fcm_token,
-                android=android_config if platform == 'android' else None,
-                apns=apns_config if platform == 'ios' else None
-            )
-            
-            # Send message
-            response = messaging.send(message)
-            logger.debug(f"[FCM] Sent notification: {title} (response: {response})")
-            return True
-            
-        except messaging.UnregisteredError:
-            logger.warning("[FCM] Token unregistered")
-            return False
-            
-        except messaging.SenderIdMismatchError:
-            logger.error("[FCM] Sender ID mismatch")
-            return False
-            
-        except Exception as e:
-            logger.error(f"[FCM] Send failed: {e}")
-            return False
+            ),
+        }
     
     def send_batch_notifications(self,
                                 device_ids: List[str],
@@ -313,13 +245,19 @@ class FirebaseCloudMessaging:
                                 body: str,
                                 **kwargs) -> Dict[str, bool]:
         """
-        Send notifications in batch (more efficient)
+        Send notifications in batch via FCM multicast
+        
+        Tokens go out in chunks of MULTICAST_LIMIT sharing one message
+        template. Per-device stats are updated in memory and the token file
+        is written once; unregistered tokens are dropped. Only per-token
+        errors count toward a device's failures; if a chunk fails as a whole
+        and nothing was sent, its exception is raised instead.
         
         Args:
             device_ids: List of device IDs
             title: Notification title
             body: Notification body
-            **kwargs: Additional arguments passed to _send_fcm_message
+            **kwargs: image_url, data, android_priority, ios_badge
         
         Returns:
             Dictionary mapping device_id to success boolean
@@ -331,6 +269,7 @@ class FirebaseCloudMessaging:
         # Get FCM tokens
         tokens = []
         device_id_map = {}
+        results = {}
         
         with self.tokens_lock:
             for device_id in device_ids:
@@ -339,59 +278,79 @@ class FirebaseCloudMessaging:
                     fcm_token = device_info['fcm_token']
                     tokens.append(fcm_token)
                     device_id_map[fcm_token] = device_id
+                else:
+                    results[device_id] = False
         
         if not tokens:
             logger.warning("[FCM] No valid tokens found")
-            return {}
+            return results
         
         try:
-            # Build messages
-            messages = []
-            for token in tokens:
-                device_id = device_id_map[token]
-                device_info = self.device_tokens[device_id]
-                platform = device_info.get('platform', 'android')
-                
-                # Build message (simplified for batch)
-                message = messaging.Message(
-                    notification=messaging.Notification(
-                        title=title,
-                        body=body,
-                        image=kwargs.get('image_url')
-                    ),
-                    data=kwargs.get('data', {}),
-                    token=token
-                )
-                messages.append(message)
-            
-            # Send batch
-            batch_response = messaging.send_all(messages)
-            
-            logger.info(f"[FCM] Batch sent: {batch_response.success_count}/{len(messages)} successful")
+            template = self._build_multicast_template(title, body, **kwargs)
+        except Exception as e:
+            logger.error(f"[FCM] Batch send failed: {e}")
+            return results
+        
+        # Send each chunk; collect outcomes without touching shared state
+        outcomes = {}  # token -> 'sent' | 'unregistered' | 'failed'
+        chunk_error = None
+        for start in range(0, len(tokens), MULTICAST_LIMIT):
+            chunk = tokens[start:start + MULTICAST_LIMIT]
+            try:
+                with timer('mecam_notification_seconds', channel='fcm_batch'):
+                    batch_response = messaging.send_each_for_multicast(
+                        messaging.MulticastMessage(tokens=chunk, **template)
+                    )
+            except Exception as e:
+                # Transport/auth outage says nothing about these tokens: leave their state alone
+                logger.error(f"[FCM] Multicast chunk of {len(chunk)} failed: {e}")
+                chunk_error = e
+                for token in chunk:
+                    results[device_id_map[token]] = False
+                continue
             
-            # Map results back to device IDs
-            results = {}
-            for i, response in enumerate(batch_response.responses):
-                token = tokens[i]
+            for token, response in zip(chunk, batch_response.responses):
+                if response.success:
+                    outcomes[token] = 'sent'
+                elif isinstance(response.exception, messaging.UnregisteredError):
+                    outcomes[token] = 'unregistered'
+                else:
+                    outcomes[token] = 'failed'
+                    logger.debug(f"[FCM] Send to {device_id_map[token]} failed: {response.exception}")
+        
+        # Apply every stat update in memory, then persist once
+        now_iso = datetime.utcnow().isoformat()
+        dropped = 0
+        with self.tokens_lock:
+            for token, outcome in outcomes.items():
                 device_id = device_id_map[token]
-                success = response.success
-                results[device_id] = success
-                
-                # Update device stats
-                with self.tokens_lock:
-                    device_info = self.device_tokens[device_id]
-                    if success:
-                        device_info['last_used'] = datetime.utcnow().isoformat()
-                        device_info['notification_count'] += 1
-                    else:
+                results[device_id] = outcome == 'sent'
+                device_info = self.device_tokens.get(device_id)
+                if device_info is None or device_info.get('fcm_token') != token:
+                    continue  # re-registered while we were sending
+                if outcome == 'sent':
+                    device_info['last_used'] = now_iso
+                    device_info['notification_count'] = device_info.get('notification_count', 0) + 1
+                    device_info['consecutive_failures'] = 0
+                    device_info['status'] = 'active'
+                elif outcome == 'unregistered':
+                    del self.device_tokens[device_id]
+                    dropped += 1
+                else:
+                    failures = device_info.get('consecutive_failures', 0) + 1
+                    device_info['consecutive_failures'] = failures
+                    if failures >= MAX_CONSECUTIVE_FAILURES:
+                        # Mark token as potentially invalid
                         device_info['status'] = 'error'
-                    self._save_tokens()
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"[FCM] Batch send failed: {e}")
-            return {}
+            self._save_tokens()
+        
+        sent = sum(1 for outcome in outcomes.values() if outcome == 'sent')
+        logger.info(f"[FCM] Batch sent: {sent}/{len(tokens)} successful"
+                    + (f", dropped {dropped} unregistered token(s)" if dropped else ""))
+        if chunk_error is not None and not sent:
+            # Nothing got through: raise so the outbox retries (and the fcm breaker counts it)
+            raise chunk_error
+        return results
     
     def subscribe_to_topic(self, device_ids: List[str], topic: str) -> bool:
         """Subscribe devices to a topic for broadcast messaging"""
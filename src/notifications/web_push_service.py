@@ -9,16 +9,24 @@ Features:
 - Service Worker integration
 - Desktop and mobile browser support
 - Offline notification queue
+- Concurrent fan-out (bounded worker pool) with batched subscription
+  persistence; expired subscriptions (404/410) are pruned in the same pass
 """
 
+import atexit
 import os
 import json
 import time
 from datetime import datetime, timedelta
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Timer
 from typing import Optional, Dict, List
+from urllib.parse import urlparse
 from loguru import logger
 
+from src.utils.http_client import ProviderUnavailable, default_timeout, get_session, provider_call
+from src.utils.perf_metrics import timer
+
 try:
     from pywebpush import webpush, WebPushException
     from py_vapid import Vapid01 as Vapid
@@ -46,7 +54,9 @@ class WebPushService:
     def __init__(self,
                  base_dir: str,
                  contact_email: str = "mailto:admin@mecam.dev",
-                 vapid_private_key: Optional[str] = None):
+                 vapid_private_key: Optional[str] = None,
+                 max_concurrency: int = 4,
+                 flush_interval: float = 30.0):
         """
         Initialize web push service
         
@@ -54,6 +64,8 @@ class WebPushService:
             base_dir: Base directory for config/logs
             contact_email: Contact email for VAPID claims
             vapid_private_key: Existing VAPID private key (PEM format)
+            max_concurrency: Pushes in flight at once during a fan-out
+            flush_interval: Minimum seconds between subscription file writes
         """
         self.base_dir = base_dir
         self.contact_email = contact_email
@@ -71,6 +83,15 @@ class WebPushService:
         self.rate_limits = {}  # {subscription_id: [timestamps]}
         self.max_notifications_per_hour = 50
         
+        # Fan-out pool and batched persistence
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.max_consecutive_failures = 5
+        self._executor = None
+        self._dirty = False
+        self._last_flush = 0.0
+        self._flush_timer = None
+        
         # Create directories
         os.makedirs(os.path.dirname(self.subscriptions_file), exist_ok=True)
         os.makedirs(os.path.dirname(self.vapid_key_file), exist_ok=True)
@@ -237,6 +258,10 @@ class WebPushService:
         
         Returns:
             Dictionary mapping subscription_id to success boolean
+        
+        Raises:
+            ProviderUnavailable: nothing was sent because every attempted push
+                service had its circuit open (subscriptions are left untouched)
         """
         if not self.vapid_enabled:
             logger.warning("[WEBPUSH] Web push not enabled")
@@ -262,53 +287,128 @@ class WebPushService:
         if actions:
             notification['actions'] = actions
         
-        # Send to each subscriber
+        # Resolve targets up front; rate-limited and unknown ids fail without a send
         results = {}
+        targets = []
+        with self.subscriptions_lock:
+            subscriptions = {sub_id: self.subscriptions.get(sub_id) for sub_id in subscription_ids}
         
-        for subscription_id in subscription_ids:
-            # Check rate limit
-            if not self._check_rate_limit(subscription_id):
-                logger.warning(f"[WEBPUSH] Rate limit exceeded: {subscription_id}")
-                results[subscription_id] = False
-                continue
-            
-            # Get subscription
-            with self.subscriptions_lock:
-                subscription = self.subscriptions.get(subscription_id)
-            
+        for subscription_id, subscription in subscriptions.items():
             if not subscription:
                 logger.warning(f"[WEBPUSH] Subscription not found: {subscription_id}")
                 results[subscription_id] = False
                 continue
             
-            # Send notification
-            success = self._send_push_notification(
-                subscription['subscription_info'],
-                notification,
-                ttl
-            )
-            
-            results[subscription_id] = success
+            if not self._check_rate_limit(subscription_id):
+                logger.warning(f"[WEBPUSH] Rate limit exceeded: {subscription_id}")
+                results[subscription_id] = False
+                continue
             
-            # Update subscription stats
-            if success:
-                with self.subscriptions_lock:
-                    subscription['last_used'] = datetime.utcnow().isoformat()
-                    subscription['notification_count'] += 1
-                    self._save_subscriptions()
-            else:
-                # Mark subscription as potentially invalid
-                with self.subscriptions_lock:
-                    subscription['status'] = 'error'
-                    self._save_subscriptions()
+            targets.append((subscription_id, subscription['subscription_info']))
+        
+        if not targets:
+            return results
+        
+        # Fan out with bounded concurrency
+        unavailable = []
         
+        def _attempt(info):
+            try:
+                return self._send_push_notification(info, notification, ttl)
+            except ProviderUnavailable as e:
+                # Circuit open: nothing was sent, so this says nothing about the subscription
+                unavailable.append(e)
+                return 'skipped'
+        
+        if len(targets) == 1:
+            outcomes = {targets[0][0]: _attempt(targets[0][1])}
+        else:
+            executor = self._get_executor()
+            futures = {sub_id: executor.submit(_attempt, info) for sub_id, info in targets}
+            outcomes = {sub_id: future.result() for sub_id, future in futures.items()}
+        
+        # Apply every stat update in memory, then persist once for the batch
+        now_iso = datetime.utcnow().isoformat()
+        pruned = 0
+        with self.subscriptions_lock:
+            for subscription_id, outcome in outcomes.items():
+                results[subscription_id] = outcome == 'sent'
+                subscription = self.subscriptions.get(subscription_id)
+                if subscription is None:
+                    continue
+                if outcome == 'sent':
+                    subscription['last_used'] = now_iso
+                    subscription['notification_count'] = subscription.get('notification_count', 0) + 1
+                    subscription['consecutive_failures'] = 0
+                    subscription['status'] = 'active'
+                elif outcome == 'expired':
+                    del self.subscriptions[subscription_id]
+                    self.rate_limits.pop(subscription_id, None)
+                    pruned += 1
+                elif outcome == 'skipped':
+                    continue
+                else:
+                    failures = subscription.get('consecutive_failures', 0) + 1
+                    subscription['consecutive_failures'] = failures
+                    if failures >= self.max_consecutive_failures:
+                        # Mark subscription as potentially invalid
+                        subscription['status'] = 'error'
+            self._dirty = True
+        
+        if pruned:
+            logger.info(f"[WEBPUSH] Pruned {pruned} expired subscription(s)")
+        self._schedule_flush()
+        
+        sent = sum(1 for ok in results.values() if ok)
+        logger.debug(f"[WEBPUSH] Fan-out: {sent}/{len(results)} delivered")
+        if unavailable and not sent:
+            # Every reachable attempt hit an open circuit: let the outbox fall back or retry
+            logger.warning(f"[WEBPUSH] Skipped {len(unavailable)} push(es): {unavailable[0]}")
+            raise unavailable[0]
         return results
     
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self.subscriptions_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                        thread_name_prefix="webpush-send")
+        return self._executor
+    
+    def _schedule_flush(self):
+        """Write subscriptions now, or once ``flush_interval`` after the last write"""
+        with self.subscriptions_lock:
+            if not self._dirty or self._flush_timer is not None:
+                return
+            wait = self._last_flush + self.flush_interval - time.time()
+            if wait > 0:
+                self._flush_timer = Timer(wait, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+                return
+        self.flush()
+    
+    def flush(self):
+        """Persist pending subscription changes"""
+        with self.subscriptions_lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            self._save_subscriptions()
+            self._dirty = False
+            self._last_flush = time.time()
+    
     def _send_push_notification(self,
                                subscription_info: Dict,
                                notification: Dict,
-                               ttl: int) -> bool:
-        """Send a single push notification"""
+                               ttl: int) -> str:
+        """Send a single push notification: 'sent', 'expired' or 'failed'
+
+        Pushes reuse the shared keep-alive session, and each push service host
+        (FCM, Mozilla, Apple) has its own circuit breaker. Raises
+        ProviderUnavailable while that circuit is open (nothing is sent).
+        """
+        host = urlparse(subscription_info.get('endpoint', '')).netloc or 'unknown'
         try:
             # Prepare VAPID claims
             vapid_claims = {
@@ -319,30 +419,37 @@ class WebPushService:
             data = json.dumps(notification)
             
             # Send push notification
-            response = webpush(
-                subscription_info=subscription_info,
-                data=data,
-                vapid_private_key=self.vapid_private_key,
-                vapid_claims=vapid_claims,
-                ttl=ttl
-            )
+            with provider_call(f"webpush:{host}") as call, timer('mecam_notification_seconds', channel='webpush'):
+                try:
+                    webpush(
+                        subscription_info=subscription_info,
+                        data=data,
+                        vapid_private_key=self.vapid_private_key,
+                        vapid_claims=vapid_claims,
+                        ttl=ttl,
+                        timeout=default_timeout()[1],
+                        requests_session=get_session()
+                    )
+                except WebPushException as e:
+                    status = e.response.status_code if e.response is not None else None
+                    # 404/410 mean a dead subscription, not a failing push service
+                    if status is None or status >= 500 or status == 429:
+                        call.fail()
+                    if status in (404, 410):
+                        logger.info(f"[WEBPUSH] Subscription expired ({status})")
+                        return 'expired'
+                    logger.error(f"[WEBPUSH] Push failed: {e}")
+                    return 'failed'
             
             logger.debug(f"[WEBPUSH] Sent notification: {notification['title']}")
-            return True
+            return 'sent'
             
-        except WebPushException as e:
-            logger.error(f"[WEBPUSH] Push failed: {e}")
-            
-            # Handle expired subscriptions (410 Gone)
-            if e.response and e.response.status_code == 410:
-                logger.warning("[WEBPUSH] Subscription expired")
-                # Note: caller should remove this subscription
-            
-            return False
+        except ProviderUnavailable:
+            raise
             
         except Exception as e:
             logger.error(f"[WEBPUSH] Push failed: {e}")
-            return False
+            return 'failed'
     
     def broadcast_notification(self,
                               title: str,
@@ -460,4 +567,5 @@ def get_web_push_service(base_dir: str = None, **kwargs) -> WebPushService:
         if base_dir is None:
             base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
         _web_push_service = WebPushService(base_dir, **kwargs)
+        atexit.register(_web_push_service.flush)
     return _web_push_service
@@ -0,0 +1,575 @@
+"""
+Analysis Pool - CPU-heavy frame analysis in worker processes
+=============================================================
+The Flask app, the camera threads and every motion loop share one Python
+interpreter, so JPEG decode, frame differencing, Canny edges and contour
+analysis all compete for the GIL with request handling. On the quad-core
+Pi Zero 2W / Pi 4 this pool moves that work into separate processes.
+
+- Frames travel through one shared-memory slot per worker (no pickling)
+- Results come back as small dicts of scalars over a pipe
+- Backpressure: a busy worker drops the new frame, nothing is ever queued
+- Workers that die or hang past ``task_timeout`` are restarted
+
+Tasks are stateful per ``key`` (the previous grayscale frame lives inside
+the worker), so a keyed stream always lands on the same worker. Callers
+``release(key)`` when a stream ends; keys idle past ``state_ttl`` are
+evicted on both sides as a backstop.
+"""
+
+import atexit
+import importlib
+import os
+import threading
+import time
+import zlib
+from typing import Callable, NamedTuple, Optional
+
+import multiprocessing as mp
+from multiprocessing import connection as mp_connection
+from multiprocessing import shared_memory
+
+from loguru import logger
+
+from src.utils.perf_metrics import observe
+
+
+DEFAULT_MAX_FRAME_BYTES = 4 * 1024 * 1024  # fits one 1280x720 RGB frame
+DEFAULT_STATE_TTL = 300.0  # seconds a key may sit idle before its state is dropped
+
+
+class AnalysisResult(NamedTuple):
+    """Result of one analysis task."""
+    seq: int
+    task: str
+    key: str
+    ok: bool
+    elapsed_ms: float
+    completed_at: float
+    data: dict
+
+
+# ============= ANALYSIS FUNCTIONS (shared with the in-process path) =============
+
+def decode_gray(jpeg_bytes):
+    """Decode a JPEG straight to grayscale (skips chroma upsampling)."""
+    import cv2
+    import numpy as np
+
+    return cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+def motion_metrics(previous_gray, current_gray, min_area: int) -> dict:
+    """Frame-difference metrics used by the rpicam motion path."""
+    import cv2
+
+    diff = cv2.absdiff(previous_gray, current_gray)
+    blur = cv2.GaussianBlur(diff, (11, 11), 0)
+    _, thresh = cv2.threshold(blur, 28, 255, cv2.THRESH_BINARY)
+    thresh = cv2.dilate(thresh, None, iterations=2)
+    thresh = cv2.erode(thresh, None, iterations=1)
+
+    motion_pixels = cv2.countNonZero(thresh)
+    total_pixels = current_gray.shape[0] * current_gray.shape[1]
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    significant_contours = sum(1 for c in contours if cv2.contourArea(c) >= min_area)
+    return {
+        'motion_ratio': motion_pixels / float(total_pixels),
+        'motion_pixels': int(motion_pixels),
+        'significant_contours': int(significant_contours),
+    }
+
+
+def motion_activity(previous_gray, current_gray) -> tuple:
+    """(motion_ratio, mean_diff) used to decide whether a clip should keep recording."""
+    import cv2
+
+    diff = cv2.absdiff(previous_gray, current_gray)
+    blur = cv2.GaussianBlur(diff, (11, 11), 0)
+    _, thresh = cv2.threshold(blur, 24, 255, cv2.THRESH_BINARY)
+    thresh = cv2.dilate(thresh, None, iterations=1)
+    motion_ratio = cv2.countNonZero(thresh) / float(current_gray.shape[0] * current_gray.shape[1])
+    return motion_ratio, float(diff.mean())
+
+
+def motion_edge_metrics(previous_gray, current_gray, min_area: int) -> dict:
+    """Shadow-resistant metrics (edges + contour shape) used by the picamera2 path."""
+    import cv2
+    import numpy as np
+
+    diff = cv2.absdiff(previous_gray, current_gray)
+    blurred_diff = cv2.GaussianBlur(diff, (21, 21), 0)
+    _, thresh = cv2.threshold(blurred_diff, 25, 255, cv2.THRESH_BINARY)
+
+    motion_pixels = int(np.count_nonzero(thresh))
+    total_pixels = thresh.shape[0] * thresh.shape[1]
+    edges = cv2.Canny(current_gray, 50, 150)
+
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    labels = []
+    for c in contours:
+        if cv2.contourArea(c) < min_area:
+            continue
+        _, _, w, h = cv2.boundingRect(c)
+        aspect = w / float(h)
+        if 0.3 <= aspect <= 0.8:
+            labels.append("person")
+        elif 0.8 < aspect <= 3.5:
+            labels.append("vehicle")
+
+    return {
+        'mean_diff': float(diff.mean()),
+        'max_diff': float(diff.max()),
+        'motion_percent': (motion_pixels / float(total_pixels)) * 100,
+        'edge_motion': int(np.count_nonzero(edges)),
+        'contour_count': len(contours),
+        'labels': labels,
+    }
+
+
+def _task_motion(state: dict, gray, params: dict) -> dict:
+    previous = state.get('previous_gray')
+    state['previous_gray'] = gray
+    if previous is None or previous.shape != gray.shape:
+        return {'primed': False}
+    return motion_metrics(previous, gray, int(params.get('min_area', 0)))
+
+
+def _task_motion_edges(state: dict, gray, params: dict) -> dict:
+    previous = state.get('previous_gray')
+    state['previous_gray'] = gray
+    if previous is None or previous.shape != gray.shape:
+        return {'primed': False}
+    return motion_edge_metrics(previous, gray, int(params.get('min_area', 0)))
+
+
+BUILTIN_TASKS = {
+    'motion': _task_motion,
+    'motion_edges': _task_motion_edges,
+}
+
+
+# ============= WORKER PROCESS =============
+
+def _load_gray(kind: str, buf, meta: dict):
+    """Turn the shared-memory payload into a private grayscale array."""
+    import cv2
+    import numpy as np
+
+    if kind == 'jpeg':
+        return cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    array = np.ndarray(tuple(meta['shape']), dtype=np.dtype(meta['dtype']), buffer=buf)
+    if array.ndim == 2:
+        return array.copy()
+    code = cv2.COLOR_BGR2GRAY if meta.get('color') == 'bgr' else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(array, code)
+
+
+def _resolve_task(spec: str) -> Callable:
+    module_name, _, func_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _worker_main(worker_id: int, shm_name: str, conn, extra_tasks: dict,
+                 state_ttl: float = DEFAULT_STATE_TTL) -> None:
+    """Worker loop: read a job descriptor, analyse the slot, reply with a small dict."""
+    # Children share the parent's resource tracker, so the parent's unlink() covers this attach.
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    tasks = dict(BUILTIN_TASKS)
+    for name, spec in (extra_tasks or {}).items():
+        try:
+            tasks[name] = _resolve_task(spec)
+        except Exception as e:
+            logger.warning(f"[ANALYSIS] Worker {worker_id} could not load task {name} ({spec}): {e}")
+
+    states = {}
+    last_used = {}
+    last_sweep = time.monotonic()
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except (EOFError, OSError):
+                break
+            if job is None:
+                break
+            if job[0] == 'release':
+                # ('release', key): the stream ended, drop its state (no reply)
+                states.pop(job[1], None)
+                last_used.pop(job[1], None)
+                continue
+
+            seq, task, key, kind, meta, nbytes, params = job
+            now = time.monotonic()
+            last_used[key] = now
+            if now - last_sweep > state_ttl / 4:
+                for idle in [k for k, used in last_used.items() if now - used > state_ttl]:
+                    states.pop(idle, None)
+                    del last_used[idle]
+                last_sweep = now
+
+            started = time.perf_counter()
+            view = shm.buf[:nbytes]
+            try:
+                func = tasks[task]
+                gray = _load_gray(kind, view, meta)
+                if gray is None:
+                    raise ValueError("frame could not be decoded")
+                data = func(states.setdefault(key, {}), gray, params or {})
+                ok = True
+            except Exception as e:
+                data = {'error': str(e)}
+                ok = False
+            finally:
+                try:
+                    view.release()
+                except BufferError:
+                    pass
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+            try:
+                conn.send((seq, task, key, ok, elapsed_ms, data))
+            except (EOFError, OSError):
+                break
+    finally:
+        shm.close()
+
+
+# ============= PARENT-SIDE POOL =============
+
+class _WorkerSlot:
+    """Parent-side bookkeeping for one worker process."""
+
+    def __init__(self, index: int, shm):
+        self.index = index
+        self.shm = shm
+        self.process = None
+        self.conn = None
+        self.busy_since = 0.0
+        self.busy_seq = 0
+        self.restarts = 0
+
+
+class AnalysisPool:
+    """
+    Fixed pool of analysis worker processes.
+
+    Usage:
+        pool = AnalysisPool(workers=3)
+        pool.start()
+        pool.submit('motion', jpeg_bytes, key='stream-1', params={'min_area': 220})
+        result = pool.latest('stream-1')
+        pool.release('stream-1')  # when the stream ends
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+                 task_timeout: float = 5.0, start_method: str = 'spawn',
+                 extra_tasks: Optional[dict] = None, on_result: Optional[Callable] = None,
+                 state_ttl: float = DEFAULT_STATE_TTL):
+        if not workers or workers <= 0:
+            workers = max(1, min(3, (os.cpu_count() or 2) - 1))
+        self.worker_count = int(workers)
+        self.max_frame_bytes = int(max_frame_bytes)
+        self.task_timeout = float(task_timeout)
+        self.extra_tasks = dict(extra_tasks or {})
+        self.on_result = on_result
+        self.state_ttl = max(1.0, float(state_ttl))
+
+        self._ctx = mp.get_context(start_method)
+        self._lock = threading.Lock()
+        self._slots = []
+        self._latest = {}
+        self._seq = 0
+        self._running = False
+        self._collector = None
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'dropped_busy': 0,
+            'dropped_oversize': 0,
+            'restarts': 0,
+            'released': 0,
+            'expired': 0,
+            'last_elapsed_ms': 0.0,
+        }
+
+    # ----- lifecycle -----
+
+    def start(self) -> bool:
+        """Create shared-memory slots and launch workers."""
+        if self._running:
+            return True
+        try:
+            for index in range(self.worker_count):
+                shm = shared_memory.SharedMemory(create=True, size=self.max_frame_bytes)
+                slot = _WorkerSlot(index, shm)
+                self._spawn(slot)
+                self._slots.append(slot)
+        except Exception as e:
+            logger.error(f"[ANALYSIS] Failed to start worker pool: {e}")
+            self.stop()
+            return False
+
+        self._running = True
+        self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+        self._collector.start()
+        logger.success(f"[ANALYSIS] Worker pool started: {self.worker_count} processes, "
+                       f"{self.max_frame_bytes // 1024}KB frame slots")
+        return True
+
+    def stop(self) -> None:
+        """Stop workers and release shared memory."""
+        self._running = False
+        with self._lock:
+            slots = list(self._slots)
+            self._slots = []
+        for slot in slots:
+            self._terminate(slot, graceful=True)
+            try:
+                slot.shm.close()
+                slot.shm.unlink()
+            except Exception:
+                pass
+        if self._collector and self._collector.is_alive():
+            self._collector.join(timeout=2)
+        if slots:
+            logger.info("[ANALYSIS] Worker pool stopped")
+
+    def _spawn(self, slot: _WorkerSlot) -> None:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(slot.index, slot.shm.name, child_conn, self.extra_tasks, self.state_ttl),
+            name=f"mecam-analysis-{slot.index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        slot.process = process
+        slot.conn = parent_conn
+        slot.busy_since = 0.0
+        slot.busy_seq = 0
+
+    @staticmethod
+    def _terminate_handles(process, conn, graceful: bool = False) -> None:
+        if conn is not None:
+            if graceful:
+                try:
+                    conn.send(None)
+                except Exception:
+                    pass
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if process is not None:
+            process.join(timeout=1.0 if graceful else 0.1)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=1.0)
+
+    def _terminate(self, slot: _WorkerSlot, graceful: bool = False) -> None:
+        process, conn = slot.process, slot.conn
+        slot.process = None
+        slot.conn = None
+        self._terminate_handles(process, conn, graceful=graceful)
+
+    # ----- submission -----
+
+    def _pick_slot(self, key: Optional[str]) -> Optional[_WorkerSlot]:
+        if not self._slots:
+            return None
+        if key is not None:
+            # Stateful tasks (previous frame) must keep hitting the same worker.
+            return self._slots[zlib.crc32(key.encode()) % len(self._slots)]
+        for slot in self._slots:
+            if not slot.busy_since:
+                return slot
+        return None
+
+    def submit(self, task: str, frame, key: Optional[str] = None, params: Optional[dict] = None,
+               color: str = 'rgb') -> bool:
+        """
+        Offer a frame for analysis.
+
+        ``frame`` is either encoded JPEG bytes or a numpy array. Returns False
+        when the frame was dropped because the target worker is still busy.
+        """
+        if not self._running:
+            return False
+
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            kind, meta, payload = 'jpeg', {}, memoryview(frame).cast('B')
+        else:
+            kind = 'array'
+            meta = {'shape': tuple(frame.shape), 'dtype': frame.dtype.str, 'color': color}
+            payload = memoryview(frame).cast('B') if frame.flags['C_CONTIGUOUS'] else memoryview(frame.tobytes())
+        nbytes = payload.nbytes
+
+        with self._lock:
+            if nbytes > self.max_frame_bytes:
+                self._stats['dropped_oversize'] += 1
+                return False
+
+            slot = self._pick_slot(key)
+            if slot is None or slot.busy_since or slot.conn is None:
+                self._stats['dropped_busy'] += 1
+                return False
+
+            self._seq += 1
+            seq = self._seq
+            slot.shm.buf[:nbytes] = payload
+            try:
+                slot.conn.send((seq, task, key or '', kind, meta, nbytes, params or {}))
+            except Exception as e:
+                logger.debug(f"[ANALYSIS] Submit to worker {slot.index} failed: {e}")
+                return False
+            slot.busy_since = time.time()
+            slot.busy_seq = seq
+            self._stats['submitted'] += 1
+        return True
+
+    def latest(self, key: Optional[str] = None) -> Optional[AnalysisResult]:
+        """Most recent result for ``key`` (None when nothing has completed yet)."""
+        return self._latest.get(key or '')
+
+    def release(self, key: str) -> None:
+        """Forget ``key``: drop its latest result and tell its worker to free the state."""
+        with self._lock:
+            self._latest.pop(key, None)
+            slot = self._pick_slot(key)
+            if slot is None or slot.conn is None:
+                return
+            try:
+                slot.conn.send(('release', key))
+            except Exception as e:
+                logger.debug(f"[ANALYSIS] Release on worker {slot.index} failed: {e}")
+                return
+            self._stats['released'] += 1
+
+    # ----- result collection and health -----
+
+    def _collect_loop(self) -> None:
+        while self._running:
+            with self._lock:
+                conns = {slot.conn: slot for slot in self._slots if slot.conn is not None}
+
+            ready = []
+            if conns:
+                try:
+                    ready = mp_connection.wait(list(conns), timeout=0.25)
+                except Exception:
+                    ready = []
+            else:
+                time.sleep(0.25)
+
+            for conn in ready:
+                slot = conns[conn]
+                try:
+                    seq, task, key, ok, elapsed_ms, data = conn.recv()
+                except (EOFError, OSError):
+                    continue
+                result = AnalysisResult(seq, task, key, ok, elapsed_ms, time.time(), data)
+                observe('mecam_motion_analysis_seconds', elapsed_ms / 1000.0, task=task)
+                with self._lock:
+                    if slot.busy_seq == seq:
+                        slot.busy_since = 0.0
+                    self._latest[key] = result
+                    self._stats['completed' if ok else 'failed'] += 1
+                    self._stats['last_elapsed_ms'] = elapsed_ms
+                if not ok:
+                    logger.debug(f"[ANALYSIS] Task {task} failed: {data.get('error')}")
+                if self.on_result:
+                    try:
+                        self.on_result(result)
+                    except Exception as e:
+                        logger.debug(f"[ANALYSIS] Result callback error: {e}")
+
+            self._check_health()
+
+    def _check_health(self) -> None:
+        now = time.time()
+        stale = []
+        with self._lock:
+            expired = [k for k, r in self._latest.items() if now - r.completed_at > self.state_ttl]
+            for key in expired:
+                del self._latest[key]
+            self._stats['expired'] += len(expired)
+            for slot in self._slots:
+                if slot.process is None or not slot.process.is_alive():
+                    reason = "process exited"
+                elif slot.busy_since and (now - slot.busy_since) > self.task_timeout:
+                    reason = f"task exceeded {self.task_timeout:.1f}s"
+                else:
+                    continue
+                # Detach under the lock so submit() skips this slot while it restarts.
+                stale.append((slot, slot.process, slot.conn, reason))
+                slot.process = None
+                slot.conn = None
+                slot.busy_since = 0.0
+
+        for slot, process, conn, reason in stale:
+            if not self._running:
+                return
+            logger.warning(f"[ANALYSIS] Restarting worker {slot.index}: {reason}")
+            self._terminate_handles(process, conn)
+            with self._lock:
+                slot.restarts += 1
+                self._stats['restarts'] += 1
+                try:
+                    self._spawn(slot)
+                except Exception as e:
+                    logger.error(f"[ANALYSIS] Worker {slot.index} respawn failed: {e}")
+
+    def get_stats(self) -> dict:
+        """Counters for status endpoints."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = [
+                {
+                    'index': slot.index,
+                    'pid': slot.process.pid if slot.process else None,
+                    'alive': bool(slot.process and slot.process.is_alive()),
+                    'busy': bool(slot.busy_since),
+                    'restarts': slot.restarts,
+                }
+                for slot in self._slots
+            ]
+        stats['running'] = self._running
+        return stats
+
+
+# Global pool instance
+_analysis_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_analysis_pool(config: Optional[dict] = None) -> Optional[AnalysisPool]:
+    """Get or start the shared analysis pool (None when disabled or unavailable)."""
+    global _analysis_pool
+    with _pool_lock:
+        if _analysis_pool is None and config and config.get('enabled'):
+            pool = AnalysisPool(
+                workers=int(config.get('workers', 0) or 0),
+                max_frame_bytes=int(config.get('max_frame_bytes', DEFAULT_MAX_FRAME_BYTES) or DEFAULT_MAX_FRAME_BYTES),
+                task_timeout=float(config.get('task_timeout_seconds', 5.0) or 5.0),
+                start_method=config.get('start_method', 'spawn') or 'spawn',
+                extra_tasks=config.get('extra_tasks') or {},
+                state_ttl=float(config.get('state_ttl_seconds', DEFAULT_STATE_TTL) or DEFAULT_STATE_TTL),
+            )
+            if pool.start():
+                _analysis_pool = pool
+                atexit.register(shutdown_analysis_pool)
+        return _analysis_pool
+
+
+def shutdown_analysis_pool() -> None:
+    """Stop the shared pool if it was started."""
+    global _analysis_pool
+    with _pool_lock:
+        if _analysis_pool is not None:
+            _analysis_pool.stop()
+            _analysis_pool = None
@@ -0,0 +1,227 @@
+"""
+HLS Segmenter for Remote Viewing
+================================
+Turns an Annex-B H.264 elementary stream (the camera's hardware encoder)
+into short fMP4 segments plus a rolling playlist. ffmpeg only remuxes
+(``-c:v copy``) - the Pi does no extra encoding.
+
+Segments live in a RAM-backed ring directory (``/dev/shm`` when present);
+ffmpeg deletes segments that fall off the playlist, so disk usage is
+bounded by ``playlist_size`` segments. A configured ``output_dir`` gets its
+own ``mecam-hls`` subdirectory, and cleanup only unlinks the playlist and
+segment names the packager writes, never the directory's other files.
+
+The segmenter is started on the first playlist request and stopped again
+after ``idle_timeout`` seconds without a viewer.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+
+PLAYLIST_NAME = "stream.m3u8"
+INIT_SEGMENT_NAME = "init.mp4"
+RING_DIR_NAME = "mecam-hls"
+_SEGMENT_RE = re.compile(r"^(init\.mp4|seg_\d{1,9}\.m4s|stream\.m3u8)$")
+# What cleanup may delete: served names plus ffmpeg's playlist temp file
+_RING_FILE_RE = re.compile(r"^(init\.mp4|seg_\d{1,9}\.m4s|stream\.m3u8(\.tmp)?)$")
+
+
+def default_hls_dir() -> str:
+    """RAM-backed directory for segments (tmpfs on Raspberry Pi OS)."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, "mecam_hls")
+
+
+class HlsSegmenter:
+    """
+    ffmpeg-backed HLS packager fed with raw H.264 via ``write()``.
+
+    Usage:
+        seg = HlsSegmenter(fps=15)
+        seg.start()
+        camera.start_live_h264(seg.write)    # encoder callback
+        ... serve seg.playlist_path / seg.segment_path(name) ...
+        seg.stop()
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, fps: int = 15, segment_seconds: float = 1.0,
+                 playlist_size: int = 6, idle_timeout: float = 60.0,
+                 on_idle: Optional[Callable[[], None]] = None):
+        # Never the configured directory itself: cleanup must not touch files it doesn't own
+        self.output_dir = os.path.join(output_dir, RING_DIR_NAME) if output_dir else default_hls_dir()
+        self.fps = max(1, int(fps))
+        self.segment_seconds = max(0.5, float(segment_seconds))
+        self.playlist_size = max(3, int(playlist_size))
+        self.idle_timeout = max(5.0, float(idle_timeout))
+        self.on_idle = on_idle
+        self.process = None
+        self.lock = threading.Lock()
+        self.last_access = 0.0
+        self.bytes_in = 0
+        self.started_at = 0.0
+
+    @property
+    def playlist_path(self) -> str:
+        return os.path.join(self.output_dir, PLAYLIST_NAME)
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _build_command(self, ffmpeg: str) -> list:
+        return [
+            ffmpeg, "-loglevel", "error", "-nostdin", "-y",
+            # Small probe so the first segment isn't held back by seconds of analysis
+            "-probesize", "32768", "-analyzeduration", "0", "-fflags", "+genpts",
+            "-f", "h264", "-framerate", str(self.fps), "-i", "pipe:0",
+            # Raw H.264 carries no PTS; the camera runs at a fixed FrameRate, so PTS = generated DTS
+            "-c:v", "copy", "-bsf:v", "setts=pts=DTS",
+            "-f", "hls",
+            "-hls_time", f"{self.segment_seconds:g}",
+            "-hls_list_size", str(self.playlist_size),
+            "-hls_flags", "delete_segments+independent_segments+omit_endlist",
+            "-hls_segment_type", "fmp4",
+            "-hls_fmp4_init_filename", INIT_SEGMENT_NAME,
+            "-hls_segment_filename", os.path.join(self.output_dir, "seg_%05d.m4s"),
+            self.playlist_path,
+        ]
+
+    def start(self) -> bool:
+        """Spawn the packager. Returns False if ffmpeg is missing or fails to start."""
+        with self.lock:
+            if self.is_running():
+                self.touch()
+                return True
+            ffmpeg = shutil.which("ffmpeg")
+            if not ffmpeg:
+                logger.warning("[HLS] ffmpeg not installed - HLS disabled")
+                return False
+            # Fresh ring: stale segments from a previous run would confuse players
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._clear_ring()
+            try:
+                process = subprocess.Popen(
+                    self._build_command(ffmpeg),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            except Exception as e:
+                logger.error(f"[HLS] Failed to start ffmpeg: {e}")
+                self.process = None
+                return False
+            self.process = process
+            self.bytes_in = 0
+            self.started_at = time.time()
+            self.touch()
+            # One reaper per ffmpeg process; a reaper whose process was replaced just exits
+            threading.Thread(target=self._idle_loop, args=(process,), name="hls-reaper", daemon=True).start()
+        logger.info(f"[HLS] Segmenter started ({self.segment_seconds:g}s x {self.playlist_size} in {self.output_dir})")
+        return True
+
+    def write(self, data):
+        """Encoder callback: append H.264 to ffmpeg's stdin (drops silently once stopped)."""
+        process = self.process
+        if process is None or process.stdin is None:
+            return
+        try:
+            process.stdin.write(data)
+            process.stdin.flush()
+            self.bytes_in += len(data)
+        except (BrokenPipeError, ValueError, OSError):
+            logger.warning("[HLS] ffmpeg pipe closed")
+            self.process = None
+
+    def touch(self):
+        """Record viewer activity (playlist or segment fetch)."""
+        self.last_access = time.time()
+
+    def wait_for_playlist(self, timeout: float) -> bool:
+        """First segment takes ~segment_seconds after start; block briefly so players don't 404."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if os.path.exists(self.playlist_path):
+                return True
+            if not self.is_running():
+                return False
+            time.sleep(0.1)
+        return os.path.exists(self.playlist_path)
+
+    def segment_path(self, name: str) -> Optional[str]:
+        """Absolute path for a playlist/segment name, or None for anything outside the ring."""
+        if not _SEGMENT_RE.match(name or ""):
+            return None
+        path = os.path.join(self.output_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def _clear_ring(self):
+        try:
+            names = os.listdir(self.output_dir)
+        except OSError:
+            return
+        for name in names:
+            if _RING_FILE_RE.match(name):
+                try:
+                    os.unlink(os.path.join(self.output_dir, name))
+                except OSError:
+                    pass
+
+    def stop(self):
+        with self.lock:
+            process, self.process = self.process, None
+        self._terminate(process)
+
+    def _terminate(self, process):
+        if process is None:
+            return
+        try:
+            if process.stdin:
+                process.stdin.close()
+            process.wait(timeout=3)
+        except Exception:
+            process.kill()
+            try:
+                process.wait(timeout=1)
+            except Exception:
+                pass
+        with self.lock:
+            if self.process is None:  # not restarted meanwhile
+                self._clear_ring()
+        logger.info(f"[HLS] Segmenter stopped ({self.bytes_in / 1024:.0f} KiB in)")
+
+    def _idle_loop(self, process):
+        while True:
+            time.sleep(min(5.0, self.idle_timeout / 2))
+            with self.lock:
+                if self.process is not process:
+                    return  # stopped or replaced; the new process has its own reaper
+                if process.poll() is None:
+                    if time.time() - self.last_access <= self.idle_timeout:
+                        continue
+                    logger.info("[HLS] No viewers, stopping segmenter")
+                # Idle, or ffmpeg exited on its own: release the encoder; the next viewer restarts both.
+                # Decided and detached under the lock, so a concurrent start() waits and then spawns afresh.
+                if self.on_idle:
+                    try:
+                        self.on_idle()
+                    except Exception as e:
+                        logger.debug(f"[HLS] on_idle error: {e}")
+                self.process = None
+            self._terminate(process)
+            return
+
+    def get_stats(self) -> dict:
+        return {
+            "running": self.is_running(),
+            "output_dir": self.output_dir,
+            "bytes_in": self.bytes_in,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.is_running() else 0,
+            "idle_seconds": round(time.time() - self.last_access, 1) if self.last_access else None,
+        }
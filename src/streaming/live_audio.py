@@ -0,0 +1,362 @@
+"""
+Live Microphone - one arecord, many listeners
+=============================================
+"Hear Now" used to run ``arecord`` for a few seconds into a temp WAV on the
+SD card and only then send the file, and motion clips had to skip audio
+whenever a listener held the microphone. Now a single capture process owns
+the microphone and fans raw PCM out to subscribers:
+
+- ``arecord`` writes raw S16_LE PCM to stdout. It starts with the first
+  subscriber and stops when the last one leaves. ``audio_capture_lock`` is
+  held while it runs, so capture code that still takes the lock directly
+  keeps working
+- Each subscriber has a small jitter buffer (``buffer_ms``). A slow client
+  loses its oldest chunks instead of falling behind, and the first read
+  waits for ``prebuffer_ms`` so playback starts smoothly
+- Live listeners get a chunked response (WAV, or Ogg/Opus and ADTS/AAC
+  through a per-listener ffmpeg pipe) that stays open until they disconnect
+- Motion clips call ``record_wav(path, seconds)`` and get the same PCM,
+  whether or not someone is listening. The returned handle has Popen's
+  ``wait``/``kill`` API
+"""
+
+import collections
+import io
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import wave
+from typing import Callable, Iterator, List, Optional
+
+from loguru import logger
+
+SAMPLE_RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # S16_LE
+
+# codec -> (content type, ffmpeg output args)
+ENCODERS = {
+    "opus": ("audio/ogg", ["-c:a", "libopus", "-application", "lowdelay", "-frame_duration", "20",
+                           "-page_duration", "100000", "-f", "ogg"]),
+    "aac": ("audio/aac", ["-c:a", "aac", "-f", "adts"]),
+}
+
+
+class MicBusy(Exception):
+    """The microphone is held by another capture (outside the hub)."""
+
+
+def wav_stream_header(sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> bytes:
+    """WAV header for a stream of unknown length (sizes set to the maximum)"""
+    byte_rate = sample_rate * channels * SAMPLE_WIDTH
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                                    channels * SAMPLE_WIDTH, SAMPLE_WIDTH * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+class Subscription:
+    """Bounded PCM buffer of one consumer (drop-oldest)."""
+
+    def __init__(self, hub: "LiveMicCapture", max_chunks: int, prebuffer_chunks: int, listener: bool = False):
+        self._hub = hub
+        self.listener = listener
+        self._chunks = collections.deque(maxlen=max(1, max_chunks))
+        self._prebuffer = min(max(0, prebuffer_chunks), self._chunks.maxlen)
+        self._started = False
+        self.dropped = 0
+        self.closed = False
+
+    def _push(self, chunk: bytes) -> None:
+        if len(self._chunks) == self._chunks.maxlen:
+            self.dropped += 1
+        self._chunks.append(chunk)
+
+    def read(self, timeout: float = 1.0) -> Optional[bytes]:
+        """Buffered PCM (b"" on timeout), or None once the capture has ended"""
+        deadline = time.monotonic() + timeout
+        with self._hub._cond:
+            needed = 1 if self._started else max(1, self._prebuffer)
+            while len(self._chunks) < needed and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return b""
+                self._hub._cond.wait(remaining)
+            if not self._chunks:
+                return None
+            self._started = True
+            data = b"".join(self._chunks)
+            self._chunks.clear()
+            return data
+
+    def close(self) -> None:
+        self._hub.unsubscribe(self)
+
+
+class WavRecording:
+    """Writes ``seconds`` of hub PCM to a WAV file on a thread; Popen-like ``wait``/``kill``."""
+
+    def __init__(self, subscription: Subscription, path: str, seconds: float):
+        self._subscription = subscription
+        self._path = path
+        self._target_bytes = int(seconds * SAMPLE_RATE) * CHANNELS * SAMPLE_WIDTH
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mic-wav", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        written = 0
+        try:
+            with wave.open(self._path, "wb") as out:
+                out.setnchannels(CHANNELS)
+                out.setsampwidth(SAMPLE_WIDTH)
+                out.setframerate(SAMPLE_RATE)
+                while written < self._target_bytes and not self._stop.is_set():
+                    data = self._subscription.read(timeout=0.5)
+                    if data is None:
+                        break
+                    data = data[:self._target_bytes - written]
+                    out.writeframes(data)
+                    written += len(data)
+        except Exception as e:
+            logger.warning(f"[AUDIO] WAV recording {self._path} failed: {e}")
+        finally:
+            self._subscription.close()
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise subprocess.TimeoutExpired("mic-wav", timeout)
+        return 0
+
+    def kill(self) -> None:
+        self._stop.set()
+        self._thread.join(2.0)
+
+
+class LiveBody:
+    """Response iterable that leaves the capture even if it is closed before the first chunk"""
+
+    def __init__(self, chunks: Iterator[bytes], subscription: Subscription):
+        self._chunks = chunks
+        self._subscription = subscription
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self) -> None:
+        try:
+            self._chunks.close()
+        finally:
+            self._subscription.close()
+
+
+class LiveMicCapture:
+    """
+    Shared microphone capture with per-subscriber jitter buffers.
+
+    Usage:
+        mic = LiveMicCapture(audio_capture_lock, _build_arecord_stream_command)
+        sub = mic.subscribe()              # raises MicBusy if the mic is taken
+        while (pcm := sub.read()) is not None: ...
+        sub.close()
+    """
+
+    def __init__(self, lock: threading.Lock, command_builder: Callable[[], List[str]],
+                 chunk_ms: int = 100, buffer_ms: int = 1000, prebuffer_ms: int = 200, max_listeners: int = 3):
+        self._lock = lock
+        self._command_builder = command_builder
+        self.chunk_bytes = max(1, SAMPLE_RATE * chunk_ms // 1000) * CHANNELS * SAMPLE_WIDTH
+        self.max_chunks = max(1, buffer_ms // max(1, chunk_ms))
+        self.prebuffer_chunks = max(0, prebuffer_ms // max(1, chunk_ms))
+        self.max_listeners = max(1, int(max_listeners))
+        self._cond = threading.Condition()
+        self._subscribers: List[Subscription] = []
+        self._listeners = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+
+    @property
+    def listeners(self) -> int:
+        return self._listeners
+
+    def is_running(self) -> bool:
+        return self._proc is not None
+
+    def subscribe(self, listener: bool = False) -> Subscription:
+        """Join the capture, starting arecord if needed; ``listener`` counts against max_listeners"""
+        with self._cond:
+            if listener and self._listeners >= self.max_listeners:
+                raise MicBusy(f"{self.max_listeners} listener(s) already connected")
+            if self._proc is None:
+                self._start_locked()
+            subscription = Subscription(self, self.max_chunks, self.prebuffer_chunks if listener else 0, listener)
+            self._subscribers.append(subscription)
+            if listener:
+                self._listeners += 1
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._cond:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+                if subscription.listener:
+                    self._listeners -= 1
+            subscription.closed = True
+            if not self._subscribers:
+                self._stop_locked()
+
+    def record_wav(self, path: str, seconds: float) -> Optional[WavRecording]:
+        """Tap ``seconds`` of audio into a WAV file, or None when the mic is unavailable"""
+        try:
+            return WavRecording(self.subscribe(), path, seconds)
+        except MicBusy as e:
+            logger.info(f"[AUDIO] Microphone busy: {e}")
+        except Exception as e:
+            logger.warning(f"[AUDIO] Failed to start audio capture: {e}")
+        return None
+
+    def _start_locked(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            raise MicBusy("microphone is held by another capture")
+        try:
+            self._proc = subprocess.Popen(self._command_builder(), stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, bufsize=0)
+        except Exception:
+            self._lock.release()
+            raise
+        self._reader = threading.Thread(target=self._read_loop, args=(self._proc,), name="mic-capture", daemon=True)
+        self._reader.start()
+        logger.info("[AUDIO] Microphone capture started")
+
+    def _stop_locked(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.terminate()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+        self._lock.release()
+        logger.info("[AUDIO] Microphone capture stopped")
+
+    def _read_loop(self, proc: subprocess.Popen) -> None:
+        stdout = proc.stdout
+        while True:
+            try:
+                chunk = stdout.read(self.chunk_bytes)
+            except Exception:
+                chunk = b""
+            if not chunk:
+                break
+            with self._cond:
+                for subscription in self._subscribers:
+                    subscription._push(chunk)
+                self._cond.notify_all()
+        # arecord exited (device error or stop): end every subscriber
+        with self._cond:
+            if self._proc is proc:
+                logger.warning(f"[AUDIO] Microphone capture ended (arecord exit {proc.poll()})")
+                subscribers, self._subscribers, self._listeners = self._subscribers, [], 0
+                for subscription in subscribers:
+                    subscription.closed = True
+                self._stop_locked()
+            self._cond.notify_all()
+
+    def stream(self, codec: str = "wav", bitrate_kbps: int = 24) -> "LiveBody":
+        """
+        Chunked body for one live listener; runs until the client disconnects.
+
+        Raises MicBusy up front when no capture can be joined.
+        """
+        subscription = self.subscribe(listener=True)
+        if codec not in ENCODERS:
+            return LiveBody(self._stream_wav(subscription), subscription)
+        return LiveBody(self._stream_encoded(subscription, codec, bitrate_kbps), subscription)
+
+    def _stream_wav(self, subscription: Subscription) -> Iterator[bytes]:
+        try:
+            yield wav_stream_header()
+            while True:
+                data = subscription.read(timeout=1.0)
+                if data is None:
+                    break
+                if data:
+                    yield data
+        finally:
+            subscription.close()
+
+    def _stream_encoded(self, subscription: Subscription, codec: str, bitrate_kbps: int) -> Iterator[bytes]:
+        cmd = [shutil.which("ffmpeg") or "ffmpeg", "-hide_banner", "-loglevel", "error",
+               "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "-i", "pipe:0",
+               "-b:a", f"{int(bitrate_kbps)}k", "-flush_packets", "1"] + ENCODERS[codec][1] + ["pipe:1"]
+        try:
+            encoder = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, bufsize=0)
+        except Exception:
+            subscription.close()
+            raise
+
+        def _feed():
+            try:
+                while True:
+                    data = subscription.read(timeout=1.0)
+                    if data is None:
+                        break
+                    if data:
+                        encoder.stdin.write(data)
+            except (BrokenPipeError, ValueError, OSError):
+                pass
+            finally:
+                try:
+                    encoder.stdin.close()
+                except Exception:
+                    pass
+
+        feeder = threading.Thread(target=_feed, name=f"mic-{codec}", daemon=True)
+        feeder.start()
+        try:
+            while True:
+                data = encoder.stdout.read(4096)
+                if not data:
+                    break
+                yield data
+        finally:
+            subscription.close()
+            try:
+                encoder.kill()
+                encoder.wait(timeout=2)
+            except Exception:
+                pass
+            feeder.join(timeout=2)
+
+    def capture_wav_bytes(self, seconds: float) -> bytes:
+        """A short in-memory WAV clip (no temp file on the SD card)"""
+        subscription = self.subscribe()
+        target = int(seconds * SAMPLE_RATE) * CHANNELS * SAMPLE_WIDTH
+        pcm = bytearray()
+        deadline = time.monotonic() + seconds + 4
+        try:
+            while len(pcm) < target and time.monotonic() < deadline:
+                data = subscription.read(timeout=0.5)
+                if data is None:
+                    break
+                pcm.extend(data)
+        finally:
+            subscription.close()
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as out:
+            out.setnchannels(CHANNELS)
+            out.setsampwidth(SAMPLE_WIDTH)
+            out.setframerate(SAMPLE_RATE)
+            out.writeframes(bytes(pcm[:target]))
+        return buf.getvalue()
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {"running": self._proc is not None, "subscribers": len(self._subscribers),
+                    "listeners": self._listeners,
+                    "dropped_chunks": sum(s.dropped for s in self._subscribers)}
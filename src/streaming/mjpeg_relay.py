@@ -0,0 +1,299 @@
+"""
+MJPEG Relay for the Multi-camera Hub
+====================================
+The hub holds at most one upstream connection per camera and fans frames
+out to any number of browser tiles, so a Pi Zero streams once no matter
+how many people watch the grid.
+
+- Upstreams start with the first viewer and close ``linger`` seconds after
+  the last one leaves. They reconnect with backoff when the Pi drops.
+- Each viewer gets a small bounded queue. A slow viewer loses its oldest
+  frames instead of stalling the upstream or other viewers.
+- Grid tiles share one downscaled copy per source frame, made with
+  ``TierEncodeCache``. Nothing is encoded while no tile is open.
+- ``mode: "snapshot"`` long-polls ``/api/snapshot.jpg`` with ETags instead
+  of holding ``/video_feed`` open.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from src.streaming.quality_tiers import TierEncodeCache
+
+TILE_TIER = "tile"
+MULTIPART_BOUNDARY = b"frame"
+
+
+def iter_multipart_jpegs(chunks, boundary: bytes = MULTIPART_BOUNDARY):
+    """Split a multipart/x-mixed-replace byte stream into JPEG payloads."""
+    marker = b"--" + boundary
+    buf = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf += chunk
+        while True:
+            start = buf.find(marker)
+            if start < 0:
+                buf = buf[-len(marker):]
+                break
+            header_end = buf.find(b"\r\n\r\n", start)
+            if header_end < 0:
+                buf = buf[start:]
+                break
+            body_start = header_end + 4
+            body_end = buf.find(b"\r\n" + marker, body_start)
+            if body_end < 0:
+                buf = buf[start:]
+                if len(buf) > 8 * 1024 * 1024:
+                    buf = b""  # runaway part, resync on the next boundary
+                break
+            body = buf[body_start:body_end]
+            buf = buf[body_end + 2:]
+            if body[:2] == b"\xff\xd8":
+                yield body
+
+
+class RelayViewer:
+    """Bounded frame queue for one downstream connection (drops oldest when full)."""
+
+    def __init__(self, tile: bool = False, max_queue: int = 2):
+        self.tile = tile
+        self.frames = deque(maxlen=max(1, int(max_queue)))
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, jpeg: bytes):
+        with self.cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(jpeg)
+            self.cond.notify()
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        with self.cond:
+            if not self.frames and not self.closed:
+                self.cond.wait(timeout)
+            return self.frames.popleft() if self.frames else None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class MjpegUpstream:
+    """
+    Single upstream connection to one camera, shared by all its viewers.
+
+    Usage:
+        upstream = MjpegUpstream("Front Door", "http://camera1.local:8080")
+        viewer = upstream.subscribe(tile=True)
+        jpeg = viewer.get(timeout=5)
+        upstream.unsubscribe(viewer)
+    """
+
+    def __init__(self, name: str, url: str, mode: str = "stream", username: Optional[str] = None,
+                 password: Optional[str] = None, tile_size=(320, 240), tile_fps: int = 5,
+                 tile_quality: int = 70, max_queue: int = 2, linger: float = 10.0,
+                 timeout: float = 5.0):
+        self.name = name
+        self.url = (url or "").rstrip("/")
+        self.mode = "snapshot" if mode == "snapshot" else "stream"
+        self.username = username
+        self.password = password
+        self.max_queue = max_queue
+        self.linger = float(linger)
+        self.timeout = float(timeout)
+        self.tile_fps = max(1, int(tile_fps))
+        self.tiles = TierEncodeCache({TILE_TIER: {
+            "width": int(tile_size[0]), "height": int(tile_size[1]),
+            "fps": self.tile_fps, "quality": int(tile_quality),
+        }})
+        self.viewers: List[RelayViewer] = []
+        self.lock = threading.Lock()
+        self.latest = None
+        self.latest_at = 0.0
+        self.frames_in = 0
+        self.connects = 0
+        self.connected = False
+        self._last_tile_at = 0.0
+        self._idle_since = None
+        self._thread = None
+
+    # ----- viewers -----
+
+    def subscribe(self, tile: bool = False) -> RelayViewer:
+        viewer = RelayViewer(tile=tile, max_queue=self.max_queue)
+        with self.lock:
+            self.viewers.append(viewer)
+            self._idle_since = None
+            latest = self.latest
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"relay-{self.name}", daemon=True)
+                self._thread.start()
+        if latest is not None:
+            # New viewers get the last frame right away instead of waiting for the next one
+            viewer.put(self.tiles.get(TILE_TIER, latest) if tile else latest)
+        return viewer
+
+    def unsubscribe(self, viewer: RelayViewer):
+        viewer.close()
+        with self.lock:
+            if viewer in self.viewers:
+                self.viewers.remove(viewer)
+            if not self.viewers:
+                self._idle_since = time.monotonic()
+
+    def _publish(self, jpeg: bytes):
+        now = time.monotonic()
+        with self.lock:
+            self.latest = jpeg
+            self.latest_at = time.time()
+            self.frames_in += 1
+            viewers = list(self.viewers)
+        full = [v for v in viewers if not v.tile]
+        tiles = [v for v in viewers if v.tile]
+        for viewer in full:
+            viewer.put(jpeg)
+        if tiles and now - self._last_tile_at >= 1.0 / self.tile_fps:
+            self._last_tile_at = now
+            tile_jpeg = self.tiles.get(TILE_TIER, jpeg)
+            for viewer in tiles:
+                viewer.put(tile_jpeg)
+
+    def _should_stop(self) -> bool:
+        """True when this upstream thread should close (clears ``_thread`` so a new viewer starts a fresh one)."""
+        with self.lock:
+            if self._thread is not threading.current_thread():
+                return True  # superseded by a newer upstream thread
+            if self.viewers or self._idle_since is None:
+                return False
+            if time.monotonic() - self._idle_since < self.linger:
+                return False
+            self._thread = None
+            return True
+
+    # ----- upstream -----
+
+    def _run(self):
+        import requests
+
+        # The session belongs to this thread: a newer upstream thread never shares it
+        session = requests.Session()
+        backoff = 1.0
+        logger.info(f"[RELAY] {self.name}: upstream opening ({self.mode})")
+        try:
+            while not self._should_stop():
+                try:
+                    if self.mode == "snapshot":
+                        self._poll_snapshots(session)
+                    else:
+                        self._read_stream(session)
+                    # Both loops only return once _should_stop() said so; asking
+                    # again could race a viewer that just started a new thread.
+                    break
+                except Exception as e:
+                    self.connected = False
+                    logger.warning(f"[RELAY] {self.name}: upstream error: {e}")
+                    time.sleep(backoff)
+                    backoff = min(30.0, backoff * 2)
+        finally:
+            session.close()
+            with self.lock:
+                if self._thread is None:
+                    self.connected = False
+            logger.info(f"[RELAY] {self.name}: upstream closed (no viewers)")
+
+    def _get(self, session, path: str, **kwargs):
+        resp = session.get(self.url + path, timeout=self.timeout, **kwargs)
+        if resp.status_code == 401 and self.username:
+            resp.close()
+            session.post(self.url + "/login", timeout=self.timeout,
+                         data={"username": self.username, "password": self.password or ""},
+                         allow_redirects=False).close()
+            resp = session.get(self.url + path, timeout=self.timeout, **kwargs)
+        if resp.status_code >= 400 and resp.status_code != 304:
+            resp.close()
+            raise RuntimeError(f"HTTP {resp.status_code} from {path}")
+        return resp
+
+    def _read_stream(self, session):
+        resp = self._get(session, "/video_feed", stream=True)
+        self.connects += 1
+        self.connected = True
+        boundary = MULTIPART_BOUNDARY
+        content_type = resp.headers.get("Content-Type", "")
+        if "boundary=" in content_type:
+            boundary = content_type.split("boundary=", 1)[1].strip().strip('"').encode()
+        try:
+            for jpeg in iter_multipart_jpegs(resp.iter_content(chunk_size=16384), boundary):
+                self._publish(jpeg)
+                if self._should_stop():
+                    return
+        finally:
+            resp.close()
+        raise RuntimeError("stream ended")
+
+    def _poll_snapshots(self, session):
+        etag = None
+        self.connects += 1
+        while not self._should_stop():
+            headers = {"If-None-Match": etag} if etag else {}
+            resp = self._get(session, "/api/snapshot.jpg?wait=2000", headers=headers)
+            self.connected = True
+            try:
+                if resp.status_code == 200 and resp.content[:2] == b"\xff\xd8":
+                    etag = resp.headers.get("ETag")
+                    self._publish(resp.content)
+            finally:
+                resp.close()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            viewers = list(self.viewers)
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "connected": self.connected,
+            "viewers": sum(1 for v in viewers if not v.tile),
+            "tile_viewers": sum(1 for v in viewers if v.tile),
+            "frames_in": self.frames_in,
+            "connects": self.connects,
+            "dropped": sum(v.dropped for v in viewers),
+            "frame_age_seconds": round(time.time() - self.latest_at, 1) if self.latest_at else None,
+            "tiles": self.tiles.get_stats(),
+        }
+
+
+class MjpegRelay:
+    """All hub upstreams, indexed like ``hub_config.json``."""
+
+    def __init__(self, devices: List[dict], defaults: Optional[dict] = None):
+        defaults = defaults or {}
+        self.upstreams: List[MjpegUpstream] = []
+        for i, dev in enumerate(devices):
+            opts = dict(defaults)
+            opts.update({k: v for k, v in dev.items() if k in (
+                "mode", "username", "password", "tile_fps", "tile_quality", "max_queue", "linger")})
+            tile_size = dev.get("tile_size", defaults.get("tile_size", "320x240"))
+            opts.pop("tile_size", None)
+            try:
+                w, h = str(tile_size).lower().split("x", 1)
+                opts["tile_size"] = (int(w), int(h))
+            except Exception:
+                opts["tile_size"] = (320, 240)
+            self.upstreams.append(MjpegUpstream(dev.get("name") or f"camera{i + 1}", dev.get("url", ""), **opts))
+
+    def get(self, index: int) -> Optional[MjpegUpstream]:
+        if 0 <= index < len(self.upstreams):
+            return self.upstreams[index]
+        return None
+
+    def get_stats(self) -> Dict[str, dict]:
+        return {str(i): u.get_stats() for i, u in enumerate(self.upstreams)}
@@ -0,0 +1,234 @@
+"""
+Per-client Quality Tiers for the MJPEG Live View
+================================================
+Viewers pick a tier from ``camera.quality_options`` (``/video_feed?tier=low``)
+and step down on their own when their socket can't keep up.
+
+Each tier is transcoded at most once per source frame into a shared cache,
+so N viewers on the same tier cost one decode + resize + encode. Tiers at or
+above the source resolution are passed through untouched (no re-encode).
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+# Matches the stream_quality names used by the camera init.
+DEFAULT_TIER_JPEG_QUALITY = {"low": 70, "standard": 80, "high": 90, "ultra": 95}
+
+
+def _parse_size(value, default):
+    try:
+        w, h = str(value).lower().split("x", 1)
+        return max(16, int(w)), max(16, int(h))
+    except Exception:
+        return default
+
+
+def load_quality_tiers(camera_cfg: dict) -> Dict[str, dict]:
+    """
+    Build tier specs from ``camera.quality_options``.
+
+    Returns {name: {width, height, fps, quality}} ordered from the smallest
+    to the largest tier, which is the order auto-downgrade walks.
+    """
+    options = (camera_cfg or {}).get("quality_options") or {}
+    tiers = {}
+    for name, opt in options.items():
+        if not isinstance(opt, dict):
+            continue
+        width, height = _parse_size(opt.get("resolution"), (640, 480))
+        try:
+            fps = int(opt.get("fps", 15) or 15)
+        except Exception:
+            fps = 15
+        try:
+            quality = int(opt.get("jpeg_quality", DEFAULT_TIER_JPEG_QUALITY.get(name, 80)))
+        except Exception:
+            quality = 80
+        tiers[name] = {
+            "width": width,
+            "height": height,
+            "fps": max(1, min(30, fps)),
+            "quality": max(30, min(100, quality)),
+        }
+    if not tiers:
+        tiers["standard"] = {"width": 640, "height": 480, "fps": 15, "quality": 80}
+    return dict(sorted(tiers.items(), key=lambda kv: (kv[1]["width"] * kv[1]["height"], kv[1]["fps"])))
+
+
+class TierEncodeCache:
+    """
+    Shared per-tier JPEG cache keyed on the source frame.
+
+    Camera backends hand out the same ``bytes`` object until a new frame
+    arrives, so the source is tracked by identity - no hashing of the JPEG.
+    """
+
+    def __init__(self, tiers: Dict[str, dict]):
+        self.tiers = tiers
+        self._entries = {}  # tier -> (source_jpeg, tier_jpeg)
+        self._tier_locks = {name: threading.Lock() for name in tiers}
+        self._decode_lock = threading.Lock()
+        self._decoded = {}  # reduce factor -> (source_jpeg, frame)
+        self._source_size = None
+        self.encodes = 0
+        self.hits = 0
+        self.passthrough = 0
+
+    def get(self, tier: str, source_jpeg: bytes) -> bytes:
+        """Return ``source_jpeg`` rendered for ``tier`` (encoded once per source frame)."""
+        if not source_jpeg or tier not in self.tiers:
+            return source_jpeg
+        entry = self._entries.get(tier)
+        if entry is not None and entry[0] is source_jpeg:
+            self.hits += 1
+            return entry[1]
+        with self._tier_locks[tier]:
+            # Another viewer on this tier may have encoded it while we waited.
+            entry = self._entries.get(tier)
+            if entry is not None and entry[0] is source_jpeg:
+                self.hits += 1
+                return entry[1]
+            jpeg = self._transcode(self.tiers[tier], source_jpeg)
+            self._entries[tier] = (source_jpeg, jpeg)
+            return jpeg
+
+    def _transcode(self, spec: dict, source_jpeg: bytes) -> bytes:
+        import cv2
+
+        size = self._source_size
+        if size and spec["width"] >= size[0] and spec["height"] >= size[1]:
+            self.passthrough += 1
+            return source_jpeg
+
+        # Let libjpeg scale in the DCT domain when the tier is at most half/quarter size.
+        factor = 1
+        if size:
+            while factor < 8 and spec["width"] * factor * 2 <= size[0] and spec["height"] * factor * 2 <= size[1]:
+                factor *= 2
+        frame = self._decode(source_jpeg, factor)
+        if frame is None:
+            return source_jpeg
+        if factor == 1:
+            self._source_size = (frame.shape[1], frame.shape[0])
+            if spec["width"] >= frame.shape[1] and spec["height"] >= frame.shape[0]:
+                self.passthrough += 1
+                return source_jpeg
+
+        if (frame.shape[1], frame.shape[0]) != (spec["width"], spec["height"]):
+            frame = cv2.resize(frame, (spec["width"], spec["height"]), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, spec["quality"]])
+        if not ok:
+            return source_jpeg
+        self.encodes += 1
+        return buf.tobytes()
+
+    def _decode(self, source_jpeg: bytes, factor: int):
+        import cv2
+        import numpy as np
+
+        flags = {
+            1: cv2.IMREAD_COLOR,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }[factor]
+        with self._decode_lock:
+            cached = self._decoded.get(factor)
+            if cached is not None and cached[0] is source_jpeg:
+                return cached[1]
+            frame = cv2.imdecode(np.frombuffer(source_jpeg, np.uint8), flags)
+            if frame is not None:
+                self._decoded[factor] = (source_jpeg, frame)
+            return frame
+
+    def get_stats(self) -> dict:
+        return {
+            "tiers": {name: f"{s['width']}x{s['height']}@{s['fps']}" for name, s in self.tiers.items()},
+            "encodes": self.encodes,
+            "cache_hits": self.hits,
+            "passthrough": self.passthrough,
+        }
+
+
+class TierViewer:
+    """
+    One live-view connection: tier choice, frame pacing and backpressure.
+
+    ``record_send`` is fed the time the server spent writing each chunk (the
+    gap between yield and resume of the WSGI generator). When that stays well
+    above the tier's frame interval the viewer drops a tier; after a quiet
+    period it climbs back toward the tier it asked for.
+    """
+
+    DOWNGRADE_RATIO = 1.5     # send time / frame interval that counts as congested
+    UPGRADE_RATIO = 0.25      # ... and as comfortably idle
+    DOWNGRADE_AFTER = 5       # consecutive congested frames before stepping down
+    UPGRADE_AFTER_SECONDS = 15.0
+    CHANGE_HOLDOFF_SECONDS = 5.0
+    RESEND_SECONDS = 2.0      # repeat an unchanged frame this often so the connection stays warm
+
+    def __init__(self, cache: TierEncodeCache, requested: Optional[str] = None,
+                 default_tier: str = "standard", adaptive: bool = True):
+        self.cache = cache
+        self.names = list(cache.tiers)
+        if requested not in cache.tiers:
+            requested = default_tier if default_tier in cache.tiers else self.names[-1]
+        self.ceiling = requested
+        self.tier = requested
+        self.adaptive = adaptive
+        self._send_avg = 0.0
+        self._congested = 0
+        self._idle_since = None
+        self._hold_until = 0.0
+        self._last_source = None
+        self._last_sent_at = 0.0
+
+    def frame(self, source_jpeg: bytes) -> Optional[bytes]:
+        """JPEG to send for this source frame, or None to skip (duplicate / over tier fps)."""
+        now = time.monotonic()
+        elapsed = now - self._last_sent_at
+        if source_jpeg is self._last_source and elapsed < self.RESEND_SECONDS:
+            return None
+        if elapsed < 1.0 / self.cache.tiers[self.tier]["fps"]:
+            return None
+        self._last_source = source_jpeg
+        self._last_sent_at = now
+        return self.cache.get(self.tier, source_jpeg)
+
+    def record_send(self, seconds: float):
+        if not self.adaptive:
+            return
+        self._send_avg = seconds if self._send_avg == 0.0 else 0.7 * self._send_avg + 0.3 * seconds
+        now = time.monotonic()
+        if now < self._hold_until:
+            return
+        budget = 1.0 / self.cache.tiers[self.tier]["fps"]
+        index = self.names.index(self.tier)
+
+        if self._send_avg > budget * self.DOWNGRADE_RATIO:
+            self._congested += 1
+            self._idle_since = None
+            if self._congested >= self.DOWNGRADE_AFTER and index > 0:
+                self._switch(self.names[index - 1], now, "backpressure")
+            return
+        self._congested = 0
+
+        if self._send_avg < budget * self.UPGRADE_RATIO and self.tier != self.ceiling:
+            if self._idle_since is None:
+                self._idle_since = now
+            elif now - self._idle_since >= self.UPGRADE_AFTER_SECONDS:
+                self._switch(self.names[index + 1], now, "recovered")
+        else:
+            self._idle_since = None
+
+    def _switch(self, tier: str, now: float, reason: str):
+        logger.info(f"[STREAM] Viewer tier {self.tier} -> {tier} ({reason}, send {self._send_avg * 1000:.0f}ms)")
+        self.tier = tier
+        self._congested = 0
+        self._idle_since = None
+        self._send_avg = 0.0
+        self._hold_until = now + self.CHANGE_HOLDOFF_SECONDS
@@ -8,10 +8,17 @@ Architecture:
   Pi (Broadcaster) ←→ [STUN/TURN] ←→ Browser (Viewer)
   
 No server needed - direct peer-to-peer connection negotiated via signaling.
+
+For the live view use WebRTCBroadcaster: one camera encode feeds every peer
+through a MediaRelay, and all peer connections share one asyncio loop.
 """
 
 import asyncio
 import json
+import threading
+import time
+import uuid
+from fractions import Fraction
 from loguru import logger
 from typing import Optional, Dict, List, Callable
 import av
@@ -20,10 +27,13 @@ import numpy as np
 # Note: aiortc requires manual installation
 # pip install aiortc>=1.5.0
 try:
-    from aiortc import RTCPeerConnection, RTCConfiguration, RTCIceServer, RTCSessionDescription
-    from aiortc.contrib.media import MediaPlayer, MediaRecorder
+    from aiortc import (RTCPeerConnection, RTCConfiguration, RTCIceServer, RTCSessionDescription,
+                        RTCRtpSender, MediaStreamTrack, VideoStreamTrack)
+    from aiortc.contrib.media import MediaPlayer, MediaRecorder, MediaRelay
+    from aiortc.mediastreams import MediaStreamError
     AIORTC_AVAILABLE = True
 except ImportError:
+    MediaStreamTrack = VideoStreamTrack = object
     AIORTC_AVAILABLE = False
     logger.warning("[WebRTC] aiortc not installed - WebRTC disabled. Install: pip install aiortc")
 
@@ -265,6 +275,248 @@ class WebRTCSignalingServer:
             self.logger.info(f"[PEER] Closed connection: {peer_id}")
 
 
+class _LoopThread:
+    """One long-lived asyncio loop (ICE, DTLS, RTP timers) shared by every peer connection."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="webrtc-loop", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run ``coro`` on the loop from a Flask worker thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+class EncodedH264Track(MediaStreamTrack):
+    """
+    Video track yielding pre-encoded H.264 access units as ``av.Packet``.
+
+    aiortc only packetizes packets (no decode, no encode), so each extra peer
+    costs RTP framing only. ``push`` must be called on the track's loop.
+    """
+
+    kind = "video"
+    TIME_BASE = Fraction(1, 90000)
+
+    def __init__(self, max_queue: int = 30):
+        super().__init__()
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._started = None
+        self.packets = 0
+        self.dropped = 0
+
+    def push(self, data: bytes) -> None:
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+        if self._queue.full():
+            # Slow consumer: shed the oldest frame (decoder recovers at the next keyframe)
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait((data, now))
+
+    def stop(self) -> None:
+        super().stop()
+        # Wake a pending recv() so the relay task ends instead of waiting forever
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def recv(self):
+        item = await self._queue.get()
+        if item is None or self.readyState != "live":
+            raise MediaStreamError
+        data, captured = item
+        packet = av.Packet(data)
+        packet.pts = int((captured - self._started) * 90000)
+        packet.time_base = self.TIME_BASE
+        self.packets += 1
+        return packet
+
+
+class JpegVideoTrack(VideoStreamTrack):
+    """
+    Fallback source for backends without an H.264 encoder (rpicam-jpeg).
+
+    Decodes the backend's latest JPEG once per new frame. Shared through the
+    relay, but aiortc still software-encodes per peer on this path.
+    """
+
+    def __init__(self, camera_getter: Callable):
+        super().__init__()
+        self._camera_getter = camera_getter
+        self._last_jpeg = None
+        self._last_frame = None
+
+    async def recv(self):
+        import cv2
+
+        pts, time_base = await self.next_timestamp()
+        camera = self._camera_getter()
+        jpeg = camera.get_jpeg_frame() if camera is not None and hasattr(camera, 'get_jpeg_frame') else None
+        if jpeg and jpeg is not self._last_jpeg:
+            bgr = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if bgr is not None:
+                self._last_jpeg = jpeg
+                self._last_frame = bgr
+        if self._last_frame is None:
+            self._last_frame = np.zeros((480, 640, 3), np.uint8)
+        frame = av.VideoFrame.from_ndarray(self._last_frame, format="bgr24")
+        frame.pts = pts
+        frame.time_base = time_base
+        return frame
+
+
+class WebRTCBroadcaster:
+    """
+    Many browser peers, one camera encode.
+
+    Hardware path: ``camera.start_live_h264()`` -> EncodedH264Track -> MediaRelay
+    -> each peer (H.264 negotiated, packetization only). Backends without an
+    H.264 encoder fall back to JpegVideoTrack.
+
+    Methods without a leading underscore are called from Flask threads; all
+    aiortc work runs on one background loop.
+    """
+
+    def __init__(self, camera_getter: Callable, bitrate: int = 400_000,
+                 stun_servers: Optional[List[str]] = None,
+                 turn_servers: Optional[List[Dict]] = None,
+                 max_peers: int = 4):
+        if not AIORTC_AVAILABLE:
+            raise RuntimeError("aiortc not installed")
+        self._camera_getter = camera_getter
+        self.bitrate = int(bitrate)
+        self.max_peers = max(1, int(max_peers))
+        stun_servers = stun_servers or ["stun:stun.l.google.com:19302"]
+        ice_servers = [RTCIceServer(urls=[url]) for url in stun_servers]
+        for turn_config in turn_servers or []:
+            ice_servers.append(RTCIceServer(**turn_config))
+        self.config = RTCConfiguration(iceServers=ice_servers)
+        self.peers: Dict[str, RTCPeerConnection] = {}
+        self._loop = _LoopThread()
+        self._relay = MediaRelay()
+        self._source = None
+        self._source_kind = None
+        self._source_camera = None
+        self._on_h264 = None
+
+    # ----- Flask-thread API -----
+
+    def handle_offer(self, offer: Dict, timeout: float = 15.0) -> Dict:
+        """Answer a browser's SDP offer (video recvonly). Returns {'type', 'sdp', 'peer_id'}."""
+        return self._loop.run(self._handle_offer(offer), timeout)
+
+    def close_peer(self, peer_id: str, timeout: float = 5.0) -> None:
+        self._loop.run(self._close_peer(peer_id), timeout)
+
+    def close_all(self, timeout: float = 5.0) -> None:
+        self._loop.run(self._close_all(), timeout)
+
+    def get_stats(self) -> Dict:
+        states = {pid: pc.connectionState for pid, pc in list(self.peers.items())}
+        stats = {
+            "peers": len(states),
+            "peers_connected": sum(1 for state in states.values() if state == "connected"),
+            "source": self._source_kind,
+        }
+        if isinstance(self._source, EncodedH264Track):
+            stats["packets"] = self._source.packets
+            stats["dropped"] = self._source.dropped
+            stats["queue_depth"] = self._source._queue.qsize()
+        return stats
+
+    # ----- loop-thread internals -----
+
+    def _ensure_source(self):
+        camera = self._camera_getter()
+        if self._source is not None and self._source.readyState != "ended":
+            if self._source_kind == "h264" and camera is self._source_camera:
+                # Idempotent; re-attaches the encoder after a camera restart
+                camera.start_live_h264(self._on_h264, bitrate=self.bitrate)
+                return self._source
+            if self._source_kind == "jpeg":
+                return self._source
+            self._stop_source()
+
+        if camera is not None and hasattr(camera, 'start_live_h264'):
+            track = EncodedH264Track()
+            loop = self._loop.loop
+
+            def on_h264(data, track=track):
+                # Encoder thread -> peer loop
+                loop.call_soon_threadsafe(track.push, bytes(data))
+
+            if camera.start_live_h264(on_h264, bitrate=self.bitrate):
+                self._source, self._source_kind = track, "h264"
+                self._source_camera, self._on_h264 = camera, on_h264
+                logger.info("[WebRTC] Shared hardware H.264 source started")
+                return track
+        self._source, self._source_kind = JpegVideoTrack(self._camera_getter), "jpeg"
+        self._source_camera = camera
+        logger.info("[WebRTC] Shared JPEG source started (no hardware H.264 on this backend)")
+        return self._source
+
+    def _stop_source(self):
+        if self._source_kind == "h264" and self._source_camera is not None:
+            try:
+                self._source_camera.stop_live_h264(self._on_h264)
+            except Exception as e:
+                logger.debug(f"[WebRTC] Encoder release error: {e}")
+        if self._source is not None:
+            self._source.stop()
+        self._source = self._source_kind = self._source_camera = self._on_h264 = None
+        self._relay = MediaRelay()
+
+    async def _handle_offer(self, offer: Dict) -> Dict:
+        if len(self.peers) >= self.max_peers:
+            raise RuntimeError(f"Too many WebRTC viewers (max {self.max_peers})")
+        peer_id = uuid.uuid4().hex[:12]
+        pc = RTCPeerConnection(configuration=self.config)
+        self.peers[peer_id] = pc
+
+        @pc.on("connectionstatechange")
+        async def _on_state():
+            logger.info(f"[WebRTC] Peer {peer_id}: {pc.connectionState}")
+            if pc.connectionState in ("failed", "closed"):
+                await self._close_peer(peer_id)
+
+        try:
+            source = self._ensure_source()
+            sender = pc.addTrack(self._relay.subscribe(source, buffered=False))
+            if self._source_kind == "h264":
+                # Pre-encoded packets can only be sent as H.264; must be set before the offer is applied
+                codecs = [c for c in RTCRtpSender.getCapabilities("video").codecs if c.mimeType == "video/H264"]
+                for transceiver in pc.getTransceivers():
+                    if transceiver.sender is sender:
+                        transceiver.setCodecPreferences(codecs)
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=offer["sdp"], type=offer["type"]))
+            answer = await pc.createAnswer()
+            await pc.setLocalDescription(answer)
+        except Exception:
+            await self._close_peer(peer_id)
+            raise
+        logger.success(f"[WebRTC] Peer {peer_id} answered ({len(self.peers)} active, source={self._source_kind})")
+        return {"type": pc.localDescription.type, "sdp": pc.localDescription.sdp, "peer_id": peer_id}
+
+    async def _close_peer(self, peer_id: str):
+        pc = self.peers.pop(peer_id, None)
+        if pc is not None:
+            await pc.close()
+        if not self.peers and self._source is not None:
+            self._stop_source()
+            logger.info("[WebRTC] Last peer gone, shared source stopped")
+
+    async def _close_all(self):
+        for peer_id in list(self.peers):
+            await self._close_peer(peer_id)
+
+
 # ===== Demo/Testing =====
 
 async def demo_webrtc():
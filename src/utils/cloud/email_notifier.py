@@ -5,7 +5,8 @@ from loguru import logger
 
 class EmailNotifier:
     def __init__(self, enabled: bool = False, smtp_host: str = "", smtp_port: int = 587,
-                 username: str = "", password: str = "", from_addr: str = "", to_addr: str = ""):
+                 username: str = "", password: str = "", from_addr: str = "", to_addr: str = "",
+                 timeout: float = 15.0):
         self.enabled = enabled
         self.smtp_host = smtp_host
         self.smtp_port = smtp_port
@@ -13,10 +14,11 @@ class EmailNotifier:
         self.password = password
         self.from_addr = from_addr
         self.to_addr = to_addr
+        self.timeout = timeout
 
-    def send_alert(self, subject: str, body: str):
+    def send_alert(self, subject: str, body: str) -> bool:
         if not self.enabled:
-            return
+            return False
 
         msg = MIMEText(body)
         msg["Subject"] = subject
@@ -24,10 +26,12 @@ class EmailNotifier:
         msg["To"] = self.to_addr
 
         try:
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as s:
+            with smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=self.timeout) as s:
                 s.starttls()
                 s.login(self.username, self.password)
                 s.send_message(msg)
             logger.info("Alert email sent.")
+            return True
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
+            return False
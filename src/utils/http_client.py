@@ -0,0 +1,233 @@
+"""
+HTTP Client - pooled keep-alive sessions and provider circuit breakers
+======================================================================
+Alerts and uploads leave the device over a slow hotspot link, so every
+one-off ``requests.post`` paid a fresh TCP + TLS handshake, and a provider
+outage made every motion event wait out a full timeout.
+
+- One shared ``requests.Session`` with per-host connection pools and
+  keep-alive (mounted adapters, no urllib3 retries: the outbox owns retries)
+- Split connect/read timeouts so a dead host fails in seconds
+- One circuit breaker per provider: after ``failure_threshold`` consecutive
+  failures calls fail fast with ProviderUnavailable for ``reset_timeout``
+  seconds, then a single probe decides whether it closes again
+- ``mecam_provider_request_seconds{provider,outcome}`` latency histogram
+
+Non-requests clients (boto3, Drive) use ``provider_call`` for the same
+breaker and metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from loguru import logger
+
+from src.utils.perf_metrics import observe
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} circuit open (retry in {retry_after:.0f}s)")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (closed -> open -> half-open).
+
+    Usage:
+        breaker = CircuitBreaker("twilio")
+        if breaker.allow():
+            ok = call()
+            breaker.record_success() if ok else breaker.record_failure()
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = max(1.0, float(reset_timeout))
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked(time.time())
+
+    def _state_locked(self, now: float) -> str:
+        if self._failures < self.failure_threshold:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._failures < self.failure_threshold:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.time())
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state_locked(time.time())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True  # one probe at a time
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._failures >= self.failure_threshold:
+                logger.info(f"[HTTP] {self.name} circuit closed")
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            was_probe, self._probing = self._probing, False
+            if self._failures == self.failure_threshold or was_probe:
+                self._opened_at = time.time()
+                self.opened_count += 1
+                logger.warning(f"[HTTP] {self.name} circuit open for {self.reset_timeout:.0f}s "
+                               f"after {self._failures} consecutive failure(s)")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"state": self._state_locked(time.time()), "consecutive_failures": self._failures,
+                    "opened": self.opened_count}
+
+
+_lock = threading.Lock()
+_session = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_settings = {
+    "connect_timeout": DEFAULT_CONNECT_TIMEOUT,
+    "read_timeout": DEFAULT_READ_TIMEOUT,
+    "pool_maxsize": 4,
+    "breaker_failures": 3,
+    "breaker_reset_seconds": 60.0,
+}
+
+
+def configure(config: Optional[dict]) -> None:
+    """Apply the ``http_client`` config section (call before first use)"""
+    if not config:
+        return
+    with _lock:
+        for key, cast in (("connect_timeout", float), ("read_timeout", float), ("pool_maxsize", int),
+                          ("breaker_failures", int), ("breaker_reset_seconds", float)):
+            if config.get(key) is not None:
+                try:
+                    _settings[key] = cast(config[key])
+                except (TypeError, ValueError):
+                    pass
+        for breaker in _breakers.values():
+            breaker.failure_threshold = max(1, _settings["breaker_failures"])
+            breaker.reset_timeout = max(1.0, _settings["breaker_reset_seconds"])
+
+
+def get_session():
+    """The shared keep-alive session"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                size = max(1, int(_settings["pool_maxsize"]))
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=size, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(provider, _settings["breaker_failures"], _settings["breaker_reset_seconds"])
+            _breakers[provider] = breaker
+        return breaker
+
+
+def default_timeout() -> tuple:
+    return (_settings["connect_timeout"], _settings["read_timeout"])
+
+
+@contextmanager
+def provider_call(provider: str):
+    """
+    Guard a provider call: fail fast while its circuit is open, time it and
+    count an exception as a failure. Call ``.fail()`` on the yielded handle
+    for failures that do not raise.
+    """
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        observe("mecam_provider_request_seconds", 0.0, provider=provider, outcome="circuit_open")
+        raise ProviderUnavailable(provider, breaker.retry_after())
+    outcome = _CallOutcome()
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome.failed = True
+        raise
+    finally:
+        observe("mecam_provider_request_seconds", time.perf_counter() - started,
+                provider=provider, outcome="error" if outcome.failed else "ok")
+        if outcome.failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+
+class _CallOutcome:
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self) -> None:
+        self.failed = True
+
+
+def request(provider: str, method: str, url: str, **kwargs):
+    """
+    ``requests`` call on the shared session behind the provider's breaker.
+
+    5xx and 429 responses count as provider failures; the response is still
+    returned so callers can log it.
+    """
+    kwargs.setdefault("timeout", default_timeout())
+    with provider_call(provider) as call:
+        response = get_session().request(method, url, **kwargs)
+        if response.status_code >= 500 or response.status_code == 429:
+            call.fail()
+        return response
+
+
+def post(provider: str, url: str, **kwargs):
+    return request(provider, "POST", url, **kwargs)
+
+
+def get_stats() -> dict:
+    with _lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_stats() for name, breaker in breakers.items()}
@@ -0,0 +1,59 @@
+"""
+Lazy Import - package exports loaded on first access
+====================================================
+Package ``__init__`` modules used to import every submodule eagerly, so
+``from src.camera import RpicamStreamer`` also loaded numpy and picamera2,
+and ``import src.core`` loaded qrcode/PIL. With ``lazy_exports`` the
+package exposes the same names, but a submodule is only imported when one
+of its names is first used (PEP 562 module ``__getattr__``). The import
+time is recorded in the startup report.
+
+Usage (in a package ``__init__``):
+    __getattr__ = lazy_exports(__name__, {"RpicamStreamer": ".rpicam_streamer"})
+"""
+
+import importlib
+import importlib.util
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from src.utils.startup_report import record_import
+
+_recorded = set()
+
+
+def lazy_exports(package: str, exports: Dict[str, str], optional: Optional[Dict[str, object]] = None) -> Callable:
+    """
+    Build a module ``__getattr__`` resolving ``exports`` (name -> relative module).
+
+    Names in ``optional`` fall back to the given value when their module
+    fails to import (e.g. picamera2 missing off-Pi). A name may not equal
+    its submodule's name: importing the submodule would shadow it.
+    """
+    optional = optional or {}
+    for name, module_name in exports.items():
+        # ``import package.name`` sets the submodule as that attribute, shadowing the export
+        if module_name.rsplit(".", 1)[-1] == name:
+            raise ValueError(f"{package}.{name} shares its name with its submodule; import it eagerly")
+
+    def __getattr__(name: str):
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        full_name = importlib.util.resolve_name(module_name, package)
+        started = time.perf_counter()
+        try:
+            loaded = sys.modules.get(full_name) or importlib.import_module(full_name)
+            value = getattr(loaded, name)
+        except ImportError:
+            if name not in optional:
+                raise
+            value = optional[name]
+        if full_name not in _recorded:
+            _recorded.add(full_name)
+            record_import(full_name, time.perf_counter() - started, lazy=True)
+        setattr(sys.modules[package], name, value)  # later lookups skip __getattr__
+        return value
+
+    return __getattr__
@@ -0,0 +1,239 @@
+"""
+In-process Performance Metrics
+==============================
+Lightweight histograms and gauges for the hot paths, exported at
+``/metrics`` in the Prometheus text exposition format.
+
+Recording is meant to be cheap enough for the per-frame loop:
+- ``observe()`` is one ``bisect`` plus three additions under a per-metric
+  lock.
+- ``timer()`` adds two ``perf_counter()`` calls.
+- Gauges that are expensive or already tracked elsewhere (RSS, queue files,
+  viewer counts) are registered as callbacks and read only at scrape time.
+
+Usage:
+    from src.utils.perf_metrics import observe, timer, set_gauge, gauge_callback
+
+    with timer("mecam_clip_write_seconds"):
+        write_clip()
+    observe("mecam_capture_seconds", 0.042)
+    gauge_callback("mecam_stream_viewers", lambda: viewers)
+
+Scrapes are gated by ``scrape_authorized`` (shared by app_lite and app):
+a bearer ``metrics.token`` or a direct loopback client, on top of each
+app's own logged-in session.
+"""
+
+import bisect
+import hmac
+import ipaddress
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+# Seconds; spans a sub-millisecond decode up to a slow cloud upload.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HISTOGRAM_HELP = {
+    "mecam_capture_seconds": "Camera frame capture latency",
+    "mecam_jpeg_decode_seconds": "JPEG decode time in the web process",
+    "mecam_motion_analysis_seconds": "Motion analysis time per frame (decode + diff in the analysis pool)",
+    "mecam_stream_send_seconds": "Time to hand one MJPEG frame to a viewer socket",
+    "mecam_clip_write_seconds": "Motion clip recording and write time",
+    "mecam_encrypt_seconds": "Clip encryption time",
+    "mecam_mux_seconds": "ffmpeg wrap/mux time for motion clips",
+    "mecam_upload_seconds": "Cloud upload time per file",
+    "mecam_notification_seconds": "Notification send time",
+}
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    def __init__(self, name: str, help_text: str = "", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-2]):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound if bound == float("inf") else float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]!r}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Set-able gauge per label set, or a callback evaluated at scrape time."""
+
+    def __init__(self, name: str, help_text: str = "", callback: Optional[Callable] = None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, labels: tuple = ()):
+        self._values[labels] = value
+
+    def render(self) -> list:
+        values = dict(self._values)
+        if self.callback is not None:
+            try:
+                result = self.callback()
+            except Exception as e:
+                logger.debug(f"[METRICS] Gauge {self.name} callback failed: {e}")
+                result = None
+            if isinstance(result, dict):
+                values.update(result)
+            elif result is not None:
+                values[()] = result
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Name -> metric map with get-or-create accessors."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = Histogram(name, help_text or HISTOGRAM_HELP.get(name, name), buckets)
+        return metric
+
+    def gauge(self, name: str, help_text: str = "", callback: Optional[Callable] = None) -> Gauge:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = Gauge(name, help_text or name, callback)
+        if callback is not None:
+            metric.callback = callback
+        return metric
+
+    def observe(self, name: str, value: float, **labels):
+        self.histogram(name).observe(value, tuple(sorted(labels.items())) if labels else ())
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def set_gauge(self, name: str, value: float, **labels):
+        self.gauge(name).set(value, tuple(sorted(labels.items())) if labels else ())
+
+    def gauge_callback(self, name: str, callback: Callable, help_text: str = ""):
+        """``callback`` returns a number, or {labels_tuple: number} for labelled series."""
+        self.gauge(name, help_text, callback)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process (reads /proc, no psutil needed)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except Exception:
+            return None
+
+
+METRICS_AUTH_CHALLENGE = 'Bearer realm="metrics"'
+
+
+def get_metrics_cfg(cfg: dict) -> dict:
+    """``metrics`` config section; MECAM_METRICS_TOKEN overrides ``metrics.token``."""
+    metrics = (cfg or {}).get("metrics", {}) or {}
+    return {
+        "token": os.environ.get("MECAM_METRICS_TOKEN", "").strip() or str(metrics.get("token", "") or "").strip(),
+        "allow_loopback": bool(metrics.get("allow_loopback", True)),
+    }
+
+
+def scrape_authorized(metrics_cfg: dict, authorization: Optional[str], remote_addr: Optional[str],
+                      forwarded_for: Optional[str]) -> bool:
+    """``Authorization: Bearer <metrics.token>``, or a scraper on this host (session checks stay in the apps)."""
+    token = metrics_cfg.get("token") or ""
+    header = authorization or ""
+    if token and header.startswith("Bearer ") and hmac.compare_digest(header[7:].strip(), token):
+        return True
+    # remote_addr is the socket peer (or the ProxyFix'd client with trust_proxy);
+    # anything relayed by a local proxy carries X-Forwarded-For and is not "local".
+    if metrics_cfg.get("allow_loopback", True) and not forwarded_for:
+        try:
+            return ipaddress.ip_address(remote_addr or "").is_loopback
+        except ValueError:
+            return False
+    return False
+
+
+registry = MetricsRegistry()
+observe = registry.observe
+timer = registry.timer
+set_gauge = registry.set_gauge
+gauge_callback = registry.gauge_callback
+render_metrics = registry.render
+
+registry.gauge_callback("mecam_process_resident_memory_bytes", process_rss_bytes, "Resident memory of the web process")
@@ -0,0 +1,190 @@
+"""
+On-demand Sampling Profiler
+===========================
+Samples every thread's Python stack via ``sys._current_frames()`` for a
+fixed window. The result comes back as collapsed stacks (the
+flamegraph.pl / speedscope input format) or as a self-contained SVG
+flamegraph that a browser can open.
+
+The sampler runs on its own daemon thread, so it works from any request
+thread. ``signal.setitimer`` handlers can only be installed from the main
+thread, which under the Flask/WSGI server is not the one serving the
+request. Each tick walks the frames of all threads and increments a
+counter, which costs well under a millisecond on a Pi Zero at the default
+100 Hz. Nothing runs outside a profiling window.
+
+Usage:
+    profiler = SamplingProfiler(interval=0.01)
+    counts = profiler.run(10.0)               # blocks ~10 s
+    text = collapse(counts)
+    svg = render_flamegraph_svg(counts, title="frame loop")
+"""
+
+import html
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename.replace("\\", "/")
+    # Keep the last two path parts: enough to tell web/app_lite.py from src/core/x.py
+    short = "/".join(filename.rsplit("/", 2)[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Periodic sampler of all Python thread stacks."""
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 96):
+        self.interval = max(0.001, float(interval))
+        self.max_depth = int(max_depth)
+        self.samples = 0
+        self.overruns = 0
+
+    def run(self, seconds: float, include_idle: bool = False) -> Counter:
+        """Sample for ``seconds``; returns Counter{(thread, frame, ...): hits}. One profile at a time."""
+        if not _profile_lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            counts = Counter()
+            done = threading.Event()
+            sampler = threading.Thread(target=self._sample_loop, args=(counts, seconds, include_idle, done),
+                                       name="stack-profiler", daemon=True)
+            sampler.start()
+            done.wait(seconds + 5.0)
+            return counts
+        finally:
+            _profile_lock.release()
+
+    def _sample_loop(self, counts: Counter, seconds: float, include_idle: bool, done: threading.Event):
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        next_tick = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if not include_idle and _is_idle(frame):
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    if not stack:
+                        continue
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    counts[tuple(reversed(stack))] += 1
+                self.samples += 1
+                next_tick += self.interval
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.overruns += 1
+                    next_tick = time.monotonic()
+        finally:
+            done.set()
+
+
+_IDLE_FRAMES = {
+    "threading.py": ("wait", "_wait_for_tstate_lock", "join"),
+    "selectors.py": ("select",),
+    "socket.py": ("accept", "readinto"),
+    "queue.py": ("get",),
+    "socketserver.py": ("serve_forever",),
+}
+
+
+def _is_idle(leaf) -> bool:
+    """Leaf frames that are just blocked waiting (lock, select, queue) - noise in a CPU flamegraph."""
+    code = leaf.f_code
+    basename = code.co_filename.replace("\\", "/").rsplit("/", 1)[-1]
+    return code.co_name in _IDLE_FRAMES.get(basename, ())
+
+
+def collapse(counts: Dict[Tuple[str, ...], int]) -> str:
+    """Brendan Gregg's collapsed format: ``thread;outer;...;leaf count``."""
+    lines = [";".join(part.replace(";", ":") for part in stack) + f" {n}"
+             for stack, n in sorted(counts.items(), key=lambda kv: -kv[1])]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def render_flamegraph_svg(counts: Dict[Tuple[str, ...], int], title: str = "Flame Graph",
+                          width: int = 1200, row_height: int = 16) -> str:
+    """Self-contained SVG flamegraph (no scripts, hover titles show frame and share)."""
+    root = {"children": {}, "value": 0}
+    for stack, n in counts.items():
+        node = root
+        node["value"] += n
+        for name in stack:
+            node = node["children"].setdefault(name, {"children": {}, "value": 0})
+            node["value"] += n
+
+    total = root["value"] or 1
+    rects = []
+    max_depth = [0]
+
+    def walk(node, depth, x):
+        for name, child in sorted(node["children"].items()):
+            w = child["value"] / total * (width - 20)
+            if w >= 0.3:
+                rects.append((depth, x, w, name, child["value"]))
+                max_depth[0] = max(max_depth[0], depth)
+                walk(child, depth + 1, x)
+            x += w
+
+    walk(root, 0, 10.0)
+    top = 40
+    height = top + (max_depth[0] + 1) * row_height + 10
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="Verdana, sans-serif" font-size="11">',
+        f'<rect x="0" y="0" width="{width}" height="{height}" fill="#f8f8f0"/>',
+        f'<text x="{width // 2}" y="22" text-anchor="middle" font-size="15">{html.escape(title)} '
+        f'({total} samples)</text>',
+    ]
+    for depth, x, w, name, value in rects:
+        y = height - 10 - (depth + 1) * row_height
+        # Stable warm colour per frame name, like flamegraph.pl
+        h = sum(ord(c) for c in name)
+        fill = f"rgb({205 + h % 50},{80 + h * 7 % 130},{40 + h * 3 % 40})"
+        label = html.escape(name)
+        share = value / total * 100
+        out.append(f'<g><title>{label} - {value} samples ({share:.1f}%)</title>'
+                   f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="{fill}" rx="2"/>')
+        chars = int(w / 7)
+        if chars >= 3:
+            text = name if len(name) <= chars else name[:chars - 2] + ".."
+            out.append(f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{html.escape(text)}</text>')
+        out.append("</g>")
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+def profile(seconds: float, interval: float = 0.01, fmt: str = "collapsed",
+            include_idle: bool = False, title: Optional[str] = None) -> Tuple[str, dict]:
+    """Run one profile and render it; returns (body, info)."""
+    profiler = SamplingProfiler(interval=interval)
+    started = time.time()
+    counts = profiler.run(seconds, include_idle=include_idle)
+    info = {
+        "started_at": started,
+        "seconds": round(time.time() - started, 2),
+        "ticks": profiler.samples,
+        "overruns": profiler.overruns,
+        "stacks": len(counts),
+    }
+    if fmt == "svg":
+        return render_flamegraph_svg(counts, title=title or f"ME_CAM profile {seconds:g}s"), info
+    return collapse(counts), info
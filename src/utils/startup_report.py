@@ -0,0 +1,99 @@
+"""
+Startup Report - boot timing and readiness phases
+=================================================
+On a Pi Zero the first page after boot used to wait for every heavy import
+and for the camera warm-up. Boot is now split into phases that finish
+independently:
+
+- ``imports`` / ``app``: module imports and ``create_lite_app`` (main thread)
+- ``camera``: backend warm-up on a background thread
+- ``server``: listening socket is up and requests are answered
+
+``snapshot()`` is what ``/api/health`` reports. ``timed_import`` and
+``record_import`` collect per-module import times, including lazy imports
+that happen later on first use. One timing report is logged when every
+started phase has finished and the server is up.
+"""
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from loguru import logger
+
+_BOOT = time.monotonic()
+_lock = threading.Lock()
+_phases = {}   # name -> {"state", "started", "seconds", "detail"}
+_imports = []  # (module, seconds, lazy)
+_reported = False
+
+
+def begin(name: str) -> None:
+    with _lock:
+        _phases[name] = {"state": "running", "started": round(time.monotonic() - _BOOT, 3),
+                         "seconds": None, "detail": None}
+
+
+def finish(name: str, ok: bool = True, detail: Optional[str] = None) -> None:
+    """Mark a phase finished (``ok=False``: failed or degraded, e.g. no camera)"""
+    with _lock:
+        phase = _phases.setdefault(name, {"started": round(time.monotonic() - _BOOT, 3)})
+        phase["seconds"] = round(time.monotonic() - _BOOT - phase["started"], 3)
+        phase["state"] = "ready" if ok else "failed"
+        phase["detail"] = detail
+    _maybe_log_report()
+
+
+@contextmanager
+def phase(name: str):
+    begin(name)
+    try:
+        yield
+    except BaseException as e:
+        finish(name, ok=False, detail=str(e))
+        raise
+    finish(name)
+
+
+def record_import(module: str, seconds: float, lazy: bool = False) -> None:
+    with _lock:
+        _imports.append((module, seconds, lazy))
+
+
+def timed_import(module: str):
+    """``importlib.import_module`` that records how long the (uncached) import took"""
+    started = time.perf_counter()
+    loaded = importlib.import_module(module)
+    record_import(module, time.perf_counter() - started)
+    return loaded
+
+
+def snapshot() -> dict:
+    """Readiness for /api/health: ``ready`` once no phase is still running"""
+    with _lock:
+        phases = {name: {k: v for k, v in p.items() if v is not None} for name, p in _phases.items()}
+    return {
+        "ready": bool(phases) and all(p["state"] != "running" for p in phases.values()),
+        "uptime_seconds": round(time.monotonic() - _BOOT, 1),
+        "phases": phases,
+    }
+
+
+def _maybe_log_report() -> None:
+    global _reported
+    with _lock:
+        if _reported or "server" not in _phases or any(p["state"] == "running" for p in _phases.values()):
+            return
+        _reported = True
+        phases = sorted(_phases.items(), key=lambda kv: kv[1]["started"])
+        imports = sorted(_imports, key=lambda item: -item[1])
+    lines = [f"[STARTUP] Boot report ({time.monotonic() - _BOOT:.2f}s since start)"]
+    for name, p in phases:
+        detail = f" - {p['detail']}" if p.get("detail") else ""
+        lines.append(f"[STARTUP]   phase {name:<8} {p['state']:<6} {p['seconds']:7.3f}s "
+                     f"(at +{p['started']:.2f}s){detail}")
+    for module, seconds, lazy in imports[:10]:
+        lines.append(f"[STARTUP]   import {module:<40} {seconds:7.3f}s{' (lazy)' if lazy else ''}")
+    logger.info("\n".join(lines))
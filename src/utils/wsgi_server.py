@@ -0,0 +1,320 @@
+"""
+WSGI Server - bounded production serving for MJPEG streams
+==========================================================
+``app.run(threaded=True)`` starts a new OS thread for every connection with
+no upper bound. Each MJPEG viewer holds its thread for as long as it
+watches, so a few reconnect storms were enough to run a Pi Zero out of
+memory. This server keeps Werkzeug's request handling but bounds it:
+
+- Two budgets of connection threads. Every connection starts in the API
+  budget (``api_workers``). When a response turns out to be a long-lived
+  stream (``multipart/x-mixed-replace``, ``text/event-stream``, or live
+  ``audio/*`` without a Content-Length), its thread moves to the stream
+  budget (``max_streams``) and frees the API slot, so ``/api/status``
+  never waits behind viewers or listeners
+- Once ``max_streams`` streams are open, a new stream gets 503 with
+  Retry-After; its generator is closed before it touches the camera
+- While every API slot is busy the accept loop stops accepting, and new
+  connections wait in the listen backlog instead of becoming threads
+- ``idle_timeout`` on every socket, so a silent client or a stalled viewer
+  is dropped instead of holding a slot
+- TLS: ``tls: true`` does the handshake on the connection's own thread (not
+  the accept loop) with the certs/ files. Alternatively set ``tls: false``
+  and ``trust_proxy: true`` behind nginx (nginx-me-camera.conf) so TLS is
+  terminated outside Python
+- SIGTERM/SIGINT: stop accepting, end open streams at their next frame,
+  give requests ``shutdown_grace_seconds`` to drain, then run the app's
+  shutdown hooks (``app.extensions['mecam.shutdown']``: camera stop)
+
+``server.mode: "werkzeug"`` keeps the old development server.
+"""
+
+import os
+import signal
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from loguru import logger
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler, load_ssl_context
+
+from src.utils import startup_report
+from src.utils.perf_metrics import gauge_callback
+
+STREAM_CONTENT_TYPES = ("multipart/x-mixed-replace", "text/event-stream")
+LIVE_AUDIO_PREFIX = "audio/"
+SHUTDOWN_HOOKS = "mecam.shutdown"
+
+DEFAULT_SERVER_CONFIG = {
+    "mode": "bounded",
+    "host": "0.0.0.0",
+    "port": 8080,
+    "api_workers": 6,
+    "max_streams": 3,
+    "idle_timeout": 30,
+    "tls": True,
+    "trust_proxy": False,
+    "shutdown_grace_seconds": 5,
+}
+
+_local = threading.local()
+
+
+def add_shutdown_hook(app, hook: Callable[[], None]) -> None:
+    """Register ``hook`` to run once the server has stopped (e.g. release the camera)"""
+    app.extensions.setdefault(SHUTDOWN_HOOKS, []).append(hook)
+
+
+def _is_stream(headers) -> bool:
+    content_type, sized = "", False
+    for key, value in headers:
+        key = key.lower()
+        if key == "content-type":
+            content_type = value.lower()
+        elif key == "content-length":
+            sized = True
+    if content_type.startswith(STREAM_CONTENT_TYPES):
+        return True
+    # Live microphone audio: chunked with no length (recorded clips always have one)
+    return content_type.startswith(LIVE_AUDIO_PREFIX) and not sized
+
+
+class _StreamBody:
+    """Response iterable of an admitted stream: ends at shutdown, frees its slot on close"""
+
+    def __init__(self, body: Iterable[bytes], server: "BoundedWSGIServer"):
+        self._body = body
+        self._server = server
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._body:
+            yield chunk
+            if self._server.stopping:
+                break
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._server.release_stream()
+
+
+class StreamGate:
+    """
+    WSGI middleware that admits long-lived streams against ``max_streams``.
+
+    Installed by BoundedWSGIServer around the app it serves.
+    """
+
+    def __init__(self, app, server: "BoundedWSGIServer"):
+        self.app = app
+        self.server = server
+
+    def __call__(self, environ, start_response):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured["args"] = (status, headers, exc_info)
+            return lambda data: None  # write() is not used by Flask
+
+        body = self.app(environ, capture)
+        status, headers, exc_info = captured["args"]
+        if not _is_stream(headers):
+            start_response(status, headers, exc_info)
+            return body
+
+        if not self.server.acquire_stream():
+            if hasattr(body, "close"):
+                body.close()
+            self.server.rejected_streams += 1
+            logger.warning(f"[SERVER] Stream limit reached ({self.server.max_streams}), "
+                           f"rejecting {environ.get('PATH_INFO')} from {environ.get('REMOTE_ADDR')}")
+            start_response("503 Service Unavailable",
+                           [("Content-Type", "text/plain; charset=utf-8"), ("Retry-After", "5")])
+            return [b"Too many live streams, retry shortly\n"]
+
+        self.server.release_api_slot()
+        start_response(status, headers, exc_info)
+        return _StreamBody(body, self.server)
+
+
+class _BoundedRequestHandler(WSGIRequestHandler):
+    def setup(self):
+        self.timeout = self.server.idle_timeout
+        super().setup()
+
+
+class BoundedWSGIServer(BaseWSGIServer):
+    """
+    Werkzeug server with bounded API and stream thread budgets.
+
+    Usage:
+        server = BoundedWSGIServer("0.0.0.0", 8080, app, api_workers=6, max_streams=3)
+        server.serve_forever()
+    """
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, api_workers: int = 6, max_streams: int = 3,
+                 idle_timeout: float = 30, ssl_context=None):
+        super().__init__(host, port, StreamGate(app, self), handler=_BoundedRequestHandler)
+        # Handshake per connection on its own thread instead of wrapping the listening socket
+        self.ssl_context = ssl_context
+        self.api_workers = max(1, int(api_workers))
+        self.max_streams = max(1, int(max_streams))
+        self.idle_timeout = max(1.0, float(idle_timeout))
+        self.api_slots = threading.BoundedSemaphore(self.api_workers)
+        self.stopping = False
+        self.rejected_streams = 0
+        self._streams = 0
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def process_request(self, request, client_address):
+        # Backpressure: with every API slot busy, leave new connections in the backlog
+        while not self.api_slots.acquire(timeout=0.5):
+            if self.stopping:
+                self.shutdown_request(request)
+                return
+        with self._cond:
+            self._active += 1
+        threading.Thread(target=self._handle_connection, args=(request, client_address),
+                         name="http-conn", daemon=True).start()
+
+    def _handle_connection(self, request, client_address):
+        _local.api_slot = True
+        try:
+            if self.ssl_context is not None:
+                request.settimeout(self.idle_timeout)
+                request = self.ssl_context.wrap_socket(request, server_side=True)
+            self.finish_request(request, client_address)
+        except OSError as e:
+            logger.debug(f"[SERVER] Connection from {client_address[0]} dropped: {e}")
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.release_api_slot()
+            self.shutdown_request(request)
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def release_api_slot(self) -> None:
+        """Give back this connection thread's API slot (once)"""
+        if getattr(_local, "api_slot", False):
+            _local.api_slot = False
+            self.api_slots.release()
+
+    def acquire_stream(self) -> bool:
+        with self._cond:
+            if self.stopping or self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self) -> None:
+        with self._cond:
+            self._streams -= 1
+
+    def open_streams(self) -> int:
+        return self._streams
+
+    def active_connections(self) -> int:
+        return self._active
+
+    def wait_idle(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+def _server_config(config: Optional[dict]) -> dict:
+    merged = dict(DEFAULT_SERVER_CONFIG)
+    merged.update({k: v for k, v in (config or {}).items() if v is not None})
+    return merged
+
+
+def _run_shutdown_hooks(app) -> None:
+    # Last registered first, like atexit: consumers stop before the camera they read from
+    for hook in reversed(app.extensions.get(SHUTDOWN_HOOKS, [])):
+        try:
+            hook()
+        except Exception as e:
+            logger.warning(f"[SERVER] Shutdown hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+
+def run_server(app, config: Optional[dict] = None, cert_file: Optional[str] = None,
+               key_file: Optional[str] = None) -> None:
+    """
+    Serve ``app`` according to the ``server`` config section until SIGTERM/SIGINT.
+
+    TLS is used when ``tls`` is enabled and both cert files exist.
+    """
+    startup_report.begin("server")
+    cfg = _server_config(config)
+    host, port = cfg["host"], int(cfg["port"])
+    use_tls = bool(cfg["tls"]) and bool(cert_file and key_file) and \
+        os.path.exists(cert_file) and os.path.exists(key_file)
+
+    if cfg["trust_proxy"]:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+        logger.info("[SERVER] Trusting X-Forwarded-* from the reverse proxy")
+
+    if str(cfg["mode"]).lower() == "werkzeug":
+        logger.warning("[SERVER] Using the Werkzeug development server (unbounded threads)")
+        startup_report.finish("server", detail="werkzeug")
+        try:
+            app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False,
+                    ssl_context=(cert_file, key_file) if use_tls else None)
+        finally:
+            _run_shutdown_hooks(app)
+        return
+
+    ssl_context = None
+    if use_tls:
+        ssl_context = load_ssl_context(cert_file, key_file)
+
+    server = BoundedWSGIServer(host, port, app, api_workers=cfg["api_workers"], max_streams=cfg["max_streams"],
+                               idle_timeout=cfg["idle_timeout"], ssl_context=ssl_context)
+    gauge_callback("mecam_http_connections",
+                   lambda: {(("pool", "stream"),): server.open_streams(),
+                            (("pool", "api"),): server.active_connections() - server.open_streams()},
+                   "Open HTTP connections by pool")
+    gauge_callback("mecam_http_streams_rejected", lambda: server.rejected_streams,
+                   "Streams refused because max_streams were open")
+
+    def _stop(signum, frame):
+        if server.stopping:
+            return
+        logger.info(f"[SERVER] {signal.Signals(signum).name} received, shutting down")
+        server.stopping = True
+        # shutdown() waits for serve_forever, which runs on this (main) thread
+        threading.Thread(target=server.shutdown, name="http-shutdown", daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():  # signals can only be handled there
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, _stop)
+
+    logger.info(f"[SERVER] Serving on {'https' if ssl_context else 'http'}://{host}:{port} "
+                f"({server.api_workers} API workers, {server.max_streams} streams max)")
+    startup_report.finish("server")
+    try:
+        server.serve_forever()
+    finally:
+        server.stopping = True
+        grace = float(cfg["shutdown_grace_seconds"])
+        if not server.wait_idle(grace):
+            logger.warning(f"[SERVER] {server.active_connections()} connection(s) still open after {grace:.0f}s")
+        _run_shutdown_hooks(app)
+        logger.info("[SERVER] Stopped")
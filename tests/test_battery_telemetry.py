@@ -0,0 +1,47 @@
+import pytest
+
+from src.core.battery_monitor import TelemetryRing, discharge_slope
+
+
+def test_ring_keeps_the_newest_samples_oldest_first():
+    ring = TelemetryRing(3)
+    for i in range(5):
+        ring.append(100.0 + i, 90 - i, 500.0, 0, 50.0, False)
+
+    assert len(ring) == 3
+    assert [s[0] for s in ring.samples()] == [102.0, 103.0, 104.0]
+    assert [s[1] for s in ring.samples()] == [88, 87, 86]
+
+
+def test_since_filters_older_samples():
+    ring = TelemetryRing(10)
+    for ts in (10.0, 20.0, 30.0):
+        ring.append(ts, 80, None, 0, None, False)
+    assert [s[0] for s in ring.samples(since=20.0)] == [20.0, 30.0]
+    assert ring.samples(since=31.0) == []
+
+
+def test_unknown_values_round_trip_as_none():
+    ring = TelemetryRing(2)
+    ring.append(1.0, None, None, 0x50005, None, True)
+    ts, percent, current_ma, throttled, temp_c, external = ring.samples()[0]
+    assert (percent, current_ma, temp_c) == (None, None, None)
+    assert throttled == 0x50005 and external is True
+
+
+def test_discharge_slope_is_percent_per_hour():
+    # 1% every 6 minutes on battery = 10%/h
+    samples = [(t * 360.0, 90 - t, None, 0, None, False) for t in range(6)]
+    assert discharge_slope(samples) == pytest.approx(10.0)
+
+
+def test_discharge_slope_needs_enough_battery_history():
+    short = [(t * 60.0, 90 - t, None, 0, None, False) for t in range(3)]  # 2 minutes
+    assert discharge_slope(short) is None
+    assert discharge_slope(short[:2]) is None
+
+    charging = [(t * 360.0, 50 + t, None, 0, None, True) for t in range(6)]
+    assert discharge_slope(charging) is None
+
+    unknown = [(t * 360.0, None, None, 0, None, False) for t in range(6)]
+    assert discharge_slope(unknown) is None
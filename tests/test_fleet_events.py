@@ -0,0 +1,62 @@
+import pytest
+
+from src.networking.fleet_events import DeviceEvents, FleetEventSearch, decode_cursor
+
+
+def _events(device, times):
+    events = DeviceEvents()
+    for i, t in enumerate(sorted(times, reverse=True)):
+        events.append({"id": f"{device}-{i}", "_t": float(t), "device": device, "type": "motion"})
+    return events
+
+
+@pytest.fixture
+def search(monkeypatch):
+    search = FleetEventSearch([{"name": "front", "url": "http://front"}, {"name": "back", "url": "http://back"}],
+                              fetch_limit=100)
+    feeds = {"front": _events("front", [100, 80, 60, 40]), "back": _events("back", [90, 70, 50])}
+    monkeypatch.setattr(search, "_fetch_device", lambda device, hours, event_type: feeds[device["name"]])
+    search.feeds = feeds
+    return search
+
+
+def test_cursor_pages_merge_devices_newest_first(search):
+    first = search.search(limit=3)
+    assert [e["id"] for e in first["events"]] == ["front-0", "back-0", "front-1"]
+    assert first["has_more"] and first["next_cursor"]
+
+    second = search.search(limit=3, cursor=first["next_cursor"])
+    assert [e["id"] for e in second["events"]] == ["back-1", "front-2", "back-2"]
+
+    last = search.search(limit=3, cursor=second["next_cursor"])
+    assert [e["id"] for e in last["events"]] == ["front-3"]
+    assert last["next_cursor"] is None
+    assert not last["has_more"] and not last["truncated"]
+
+
+def test_device_at_fetch_limit_marks_page_truncated(search):
+    search.feeds["back"].truncated = True
+    page = search.search(limit=50)
+    assert page["count"] == 7
+    assert page["next_cursor"] is None
+    assert page["truncated"] and page["has_more"]
+    assert page["devices"]["back"]["truncated"]
+    assert not page["devices"]["front"]["truncated"]
+
+
+def test_failed_device_makes_page_partial(search, monkeypatch):
+    def fetch(device, hours, event_type):
+        if device["name"] == "back":
+            raise ConnectionError("offline")
+        return search.feeds["front"]
+
+    monkeypatch.setattr(search, "_fetch_device", fetch)
+    page = search.search(limit=10)
+    assert page["partial"]
+    assert page["devices"]["back"]["ok"] is False
+    assert [e["device"] for e in page["events"]] == ["front"] * 4
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
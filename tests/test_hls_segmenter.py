@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from src.streaming import hls
+from src.streaming.hls import HlsSegmenter
+
+
+class FakeProcess:
+    def __init__(self, *args, **kwargs):
+        self.stdin = None
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.returncode = 0
+        return 0
+
+    def kill(self):
+        self.returncode = -9
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    monkeypatch.setattr(hls.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(hls.subprocess, "Popen", FakeProcess)
+
+
+def test_segment_path_only_serves_ring_names(tmp_path):
+    seg = HlsSegmenter(output_dir=str(tmp_path))
+    ring = tmp_path / hls.RING_DIR_NAME
+    ring.mkdir()
+    for name in ("stream.m3u8", "init.mp4", "seg_00001.m4s", "notes.txt"):
+        (ring / name).write_bytes(b"x")
+
+    assert seg.segment_path("seg_00001.m4s") == str(ring / "seg_00001.m4s")
+    assert seg.segment_path("init.mp4") == str(ring / "init.mp4")
+    assert seg.segment_path("stream.m3u8") == str(ring / "stream.m3u8")
+    assert seg.segment_path("seg_00002.m4s") is None  # not on disk
+    for name in ("notes.txt", "../stream.m3u8", "seg_1.m4s/../../x", "", None):
+        assert seg.segment_path(name) is None
+
+
+def test_start_and_stop_leave_foreign_files_alone(tmp_path, fake_ffmpeg):
+    (tmp_path / "keep.mp4").write_bytes(b"recording")
+    seg = HlsSegmenter(output_dir=str(tmp_path))
+    assert seg.output_dir == str(tmp_path / hls.RING_DIR_NAME)
+
+    assert seg.start()
+    ring = tmp_path / hls.RING_DIR_NAME
+    (ring / "seg_00003.m4s").write_bytes(b"x")
+    (ring / "stream.m3u8.tmp").write_bytes(b"x")
+    (ring / "user.txt").write_bytes(b"x")
+    seg.stop()
+
+    assert (tmp_path / "keep.mp4").read_bytes() == b"recording"
+    assert sorted(p.name for p in ring.iterdir()) == ["user.txt"]
+
+
+def test_restart_after_idle_gets_its_own_reaper(tmp_path, fake_ffmpeg):
+    released = []
+    seg = HlsSegmenter(output_dir=str(tmp_path), idle_timeout=5, on_idle=lambda: released.append(1))
+    seg.idle_timeout = 0.2  # below the constructor floor, to keep the test short
+
+    assert seg.start()
+    first = seg.process
+    seg.last_access = 0
+    deadline = time.time() + 5
+    while seg.process is first and time.time() < deadline:
+        time.sleep(0.05)
+    assert seg.process is None and released == [1]
+
+    # Restart: the new process must idle out as well
+    assert seg.start()
+    second = seg.process
+    assert second is not first
+    seg.last_access = 0
+    deadline = time.time() + 5
+    while seg.process is second and time.time() < deadline:
+        time.sleep(0.05)
+    assert seg.process is None and released == [1, 1]
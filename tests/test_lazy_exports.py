@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+
+from src.utils.lazy_import import lazy_exports
+
+
+def _run(code):
+    """Fresh interpreter, so imports from other tests don't hide what is eager or lazy."""
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_camera_coordinator_survives_submodule_import():
+    out = _run(
+        "import src.camera.camera_coordinator\n"
+        "from src.camera import camera_coordinator\n"
+        "from src.camera.camera_coordinator import CameraCoordinator\n"
+        "print(isinstance(camera_coordinator, CameraCoordinator), hasattr(camera_coordinator, 'access'))"
+    )
+    assert out == "True True"
+
+
+def test_camera_backends_load_on_first_use():
+    out = _run(
+        "import sys, src.camera\n"
+        "print('src.camera.rpicam_streamer' in sys.modules)\n"
+        "from src.camera import RpicamStreamer\n"
+        "print('src.camera.rpicam_streamer' in sys.modules, RpicamStreamer.__name__)"
+    )
+    assert out.splitlines() == ["False", "True RpicamStreamer"]
+
+
+def test_optional_export_falls_back_and_unknown_name_raises():
+    out = _run(
+        "import src.camera as camera\n"
+        "print(camera.PICAMERA2_AVAILABLE in (True, False),\n"
+        "      camera.FastCameraStreamer is None or callable(camera.FastCameraStreamer))\n"
+        "try:\n"
+        "    camera.NoSuchBackend\n"
+        "except AttributeError:\n"
+        "    print('missing')"
+    )
+    assert out.splitlines() == ["True True", "missing"]
+
+
+def test_export_named_like_its_submodule_is_rejected():
+    with pytest.raises(ValueError):
+        lazy_exports("src.camera", {"camera_coordinator": ".camera_coordinator"})
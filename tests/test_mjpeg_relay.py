@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from src.streaming.mjpeg_relay import MjpegUpstream
+
+JPEG = b"\xff\xd8fake-jpeg\xff\xd9"
+PART = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + JPEG + b"\r\n"
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "multipart/x-mixed-replace; boundary=frame"}
+
+    def __init__(self, session):
+        self.session = session
+
+    def iter_content(self, chunk_size=None):
+        while not self.session.closed:
+            yield PART
+            time.sleep(0.01)
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    instances = []
+
+    def __init__(self):
+        self.closed = False
+        self.gets = 0
+        FakeSession.instances.append(self)
+
+    def get(self, url, **kwargs):
+        if self.closed:
+            raise RuntimeError("session used after close")
+        self.gets += 1
+        return FakeResponse(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_requests(monkeypatch):
+    FakeSession.instances = []
+    monkeypatch.setattr(requests, "Session", FakeSession)
+
+
+def _relay_threads(name):
+    return [t for t in threading.enumerate() if t.name == f"relay-{name}" and t.is_alive()]
+
+
+def test_subscribe_during_stop_keeps_one_upstream_with_a_live_session(fake_requests):
+    upstream = MjpegUpstream("cam", "http://cam", linger=0)
+    original = upstream._should_stop
+    late = []
+
+    def should_stop():
+        stop = original()
+        if stop and not late:
+            # A viewer arrives right after the old thread decided to close
+            late.append(upstream.subscribe())
+        return stop
+
+    upstream._should_stop = should_stop
+    first = upstream.subscribe()
+    assert first.get(timeout=2) == JPEG
+    upstream.unsubscribe(first)
+
+    deadline = time.time() + 5
+    while not late and time.time() < deadline:
+        time.sleep(0.01)
+    assert late, "the old thread never reached its stop decision"
+
+    viewer = late[0]
+    time.sleep(0.2)
+    assert len(_relay_threads("cam")) == 1
+    assert viewer.get(timeout=2) == JPEG
+    old, new = FakeSession.instances
+    assert old.closed and not new.closed
+
+    upstream._should_stop = original
+    upstream.unsubscribe(viewer)
+    deadline = time.time() + 5
+    while _relay_threads("cam") and time.time() < deadline:
+        time.sleep(0.01)
+    assert not _relay_threads("cam") and new.closed
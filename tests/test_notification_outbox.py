@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+
+from src.core.notification_outbox import NotificationOutbox
+from src.utils.http_client import ProviderUnavailable
+
+
+def _run_due(outbox):
+    """Deliver every item that is due now on the calling thread (no worker pool)."""
+    delivered = 0
+    while True:
+        with outbox._cond:
+            if not outbox._heap or outbox._heap[0][0] > time.time():
+                return delivered
+            item = outbox._next_due()
+        if item is None:
+            return delivered
+        outbox._deliver(item)
+        delivered += 1
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "outbox.jsonl")
+
+
+def test_failed_delivery_is_retried_then_sent(log_path):
+    outbox = NotificationOutbox(log_path, retry_schedules={"sms": [0, 0]})
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload["n"])
+        return len(calls) >= 2
+
+    outbox.register_channel("sms", flaky)
+    outbox.enqueue("sms", {"n": 1})
+    _run_due(outbox)
+
+    stats = outbox.get_stats()
+    assert calls == [1, 1]
+    assert stats["retries"] == 1 and stats["sent"] == 1 and stats["pending"] == 0
+
+
+def test_item_is_dropped_once_its_schedule_is_exhausted(log_path):
+    outbox = NotificationOutbox(log_path, retry_schedules={"sms": [0]})
+    outbox.register_channel("sms", lambda payload: False)
+    outbox.enqueue("sms", {"n": 1})
+    _run_due(outbox)
+    assert outbox.get_stats()["failed"] == 1
+    assert outbox.pending_count() == 0
+
+
+def test_idempotency_key_deduplicates_pending_and_delivered(log_path):
+    outbox = NotificationOutbox(log_path)
+    sent = []
+    outbox.register_channel("sms", lambda payload: sent.append(payload) or True)
+
+    first = outbox.enqueue("sms", {"n": 1}, key="motion:1:sms")
+    assert outbox.enqueue("sms", {"n": 2}, key="motion:1:sms") == first  # still pending
+    _run_due(outbox)
+    assert outbox.enqueue("sms", {"n": 3}, key="motion:1:sms") == first  # delivered recently
+    _run_due(outbox)
+
+    assert sent == [{"n": 1}]
+    assert outbox.get_stats()["deduplicated"] == 2
+
+
+def test_pending_items_and_keys_survive_a_restart(log_path):
+    outbox = NotificationOutbox(log_path)
+    outbox.register_channel("sms", lambda payload: True)
+    outbox.enqueue("sms", {"n": 1}, key="delivered")
+    _run_due(outbox)
+    outbox.enqueue("sms", {"n": 2}, key="waiting")
+    outbox.stop()
+
+    replayed = NotificationOutbox(log_path)
+    sent = []
+    replayed.register_channel("sms", lambda payload: sent.append(payload) or True)
+    assert replayed.pending_count() == 1
+    assert replayed.enqueue("sms", {"n": 3}, key="delivered") is not None
+    assert replayed.get_stats()["deduplicated"] == 1
+    _run_due(replayed)
+    assert sent == [{"n": 2}]
+
+
+def test_open_circuit_falls_back_to_next_channel(log_path):
+    outbox = NotificationOutbox(log_path)
+    sent = []
+
+    def unavailable(payload):
+        raise ProviderUnavailable("twilio", 60)
+
+    outbox.register_channel("sms", unavailable)
+    outbox.register_channel("email", lambda payload: sent.append(payload) or True)
+    outbox.enqueue("sms", {"n": 1}, key="alert", fallback=[{"channel": "email", "payload": {"n": "mail"}}])
+    _run_due(outbox)
+
+    assert sent == [{"n": "mail"}]
+    assert outbox.get_stats()["fallbacks"] == 1
+
+
+def test_live_dedupe_keys_do_not_force_compaction_per_delivery(log_path, monkeypatch):
+    outbox = NotificationOutbox(log_path, compact_after=50)
+    outbox.register_channel("sms", lambda payload: True)
+    compactions = []
+    original = outbox._compact_locked
+    monkeypatch.setattr(outbox, "_compact_locked", lambda: compactions.append(1) or original())
+
+    for i in range(200):
+        outbox.enqueue("sms", {"n": i}, key=f"motion:{i}:sms")
+        _run_due(outbox)
+
+    # 200 deliveries append 400 records: one compaction per 50 appends, however many keys are live
+    assert len(compactions) == 8
+    outbox.stop()
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) <= 200 + 50
+    assert all(r["op"] == "done" for r in records[:200])
@@ -0,0 +1,59 @@
+import pytest
+
+from src.streaming.quality_tiers import TierEncodeCache, load_quality_tiers
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+
+def _jpeg(width, height, value=128):
+    frame = np.full((height, width, 3), value, np.uint8)
+    ok, buf = cv2.imencode(".jpg", frame)
+    assert ok
+    return buf.tobytes()
+
+
+@pytest.fixture
+def cache():
+    return TierEncodeCache(load_quality_tiers({"quality_options": {
+        "low": {"resolution": "160x120", "fps": 10},
+        "high": {"resolution": "1280x720", "fps": 15},
+    }}))
+
+
+def _size(jpeg):
+    frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    return frame.shape[1], frame.shape[0]
+
+
+def test_tiers_are_ordered_smallest_first():
+    tiers = load_quality_tiers({"quality_options": {
+        "high": {"resolution": "1280x720"}, "low": {"resolution": "320x240"}, "bad": "x",
+    }})
+    assert list(tiers) == ["low", "high"]
+    assert load_quality_tiers({}) == {"standard": {"width": 640, "height": 480, "fps": 15, "quality": 80}}
+
+
+def test_one_encode_per_source_frame_and_tier(cache):
+    source = _jpeg(640, 480)
+    first = cache.get("low", source)
+    assert _size(first) == (160, 120)
+    assert cache.get("low", source) is first
+    assert cache.encodes == 1 and cache.hits == 1
+
+    # A new frame (new bytes object) is encoded again, even with equal content
+    assert cache.get("low", bytes(bytearray(source))) is not first
+    assert cache.encodes == 2
+
+
+def test_tier_at_or_above_source_passes_through(cache):
+    source = _jpeg(640, 480)
+    assert cache.get("high", source) is source
+    assert cache.passthrough == 1 and cache.encodes == 0
+
+
+def test_unknown_tier_and_empty_frame_are_returned_as_is(cache):
+    source = _jpeg(320, 240)
+    assert cache.get("ultra", source) is source
+    assert cache.get("low", b"") == b""
+    assert cache.encodes == 0
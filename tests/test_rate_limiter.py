@@ -0,0 +1,74 @@
+import pytest
+
+from src.core import rate_limiter
+from src.core.rate_limiter import SlidingWindowLimiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def test_limit_is_enforced_within_a_window(clock):
+    limiter = SlidingWindowLimiter(3, 60)
+    assert [limiter.hit("ip") for _ in range(4)] == [True, True, True, False]
+    assert limiter.remaining("ip") == 0
+    assert limiter.remaining("other") == 3
+
+
+def test_previous_window_is_weighted_then_forgotten(clock):
+    limiter = SlidingWindowLimiter(4, 60)
+    clock.now = 1020.0  # window [960, 1020) ends, a new one starts
+    for _ in range(4):
+        assert limiter.hit("ip")
+    assert not limiter.hit("ip")
+
+    # Halfway into the next window the previous 4 still count as 2
+    clock.now = 1110.0
+    assert limiter.remaining("ip") == 2
+    assert limiter.hit("ip") and limiter.hit("ip")
+    assert not limiter.hit("ip")
+
+    # Two windows later nothing carries over
+    clock.now = 1260.0
+    assert limiter.remaining("ip") == 4
+
+
+def test_idle_keys_are_evicted(clock):
+    limiter = SlidingWindowLimiter(5, 10)
+    limiter.hit("old")
+    clock.now += 25  # past the default idle_ttl of two windows
+    limiter.hit("new")
+    assert len(limiter) == 1
+    assert limiter.get_stats()["evicted"] == 1
+    assert limiter.remaining("old") == 5
+
+
+def test_max_keys_evicts_least_recently_used(clock):
+    limiter = SlidingWindowLimiter(1, 60, max_keys=2)
+    limiter.hit("a")
+    limiter.hit("b")
+    assert not limiter.hit("a")  # touch "a" so "b" is the cold end
+    limiter.hit("c")
+
+    assert len(limiter) == 2
+    assert limiter.remaining("b") == 1  # forgotten
+    assert limiter.remaining("a") == 0
+
+
+def test_reset_clears_a_key(clock):
+    limiter = SlidingWindowLimiter(1, 60)
+    assert limiter.hit("ip")
+    assert not limiter.hit("ip")
+    limiter.reset("ip")
+    assert limiter.hit("ip")
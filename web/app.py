@@ -5,9 +5,6 @@ import os
 from datetime import datetime
 import time
 import sys
-import socket
-import urllib.request
-import urllib.error
 
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -27,6 +24,9 @@ from src.camera import (
 )
 from src.detection import motion_service, CameraWatchdog
 from src.utils.pi_detect import init_pi_detection, get_pi_info
+from src.networking.fleet_poller import get_fleet_poller
+from src.utils.perf_metrics import render_metrics, get_metrics_cfg, scrape_authorized, METRICS_AUTH_CHALLENGE
+from src.utils.wsgi_server import add_shutdown_hook, run_server
 
 # Initialize Pi detection
 pi_model, camera_config = init_pi_detection()
@@ -58,6 +58,9 @@ watchdog = SystemStatus()  # Use simple status tracker instead of full pipeline
 
 battery = BatteryMonitor(enabled=True)
 
+# Multi-camera status cache; polling starts on the first /api/devices request
+fleet_poller = get_fleet_poller()
+
 # Login protection state (in-memory)
 login_attempts = {}
 LOGIN_WINDOW_SECONDS = 15 * 60
@@ -1405,36 +1408,43 @@ def _normalize_device_host(device_id: str) -> str:
     return host.strip()
 
 
-def _build_device_url(host: str, port: int = 8080) -> str:
-    """Build dashboard URL for a remote device host/IP."""
+def _build_device_url(host: str, port: int = 8080, scheme: str = "https") -> str:
+    """Build dashboard URL for a remote device host/IP (cameras serve HTTPS by default)."""
     if not host:
         return "/"
-    return f"http://{host}:{port}"
-
+    return f"{scheme}://{host}:{port}"
+
+
+def _device_info_from_poll(device: dict, host: str) -> dict:
+    """Merge a configured device with the fleet poller's cached state (no network I/O)."""
+    probe = fleet_poller.get(host) or {}
+    storage_used = probe.get("storage_used_gb")
+    events_24h = probe.get("events_24h")
+    return {
+        "id": device.get("id", device.get("name", "")),
+        "name": device.get("name", "Unknown Device"),
+        "ip": host,
+        "location": device.get("location", ""),
+        "status": probe.get("status") or device.get("status", "unknown"),
+        "battery": probe.get("battery") if probe.get("battery") is not None else device.get("battery", None),
+        "storage": f"{storage_used:.2f} GB" if isinstance(storage_used, (int, float)) else device.get("storage", "0 GB"),
+        "events_24h": events_24h if events_24h is not None else device.get("events_24h", 0),
+        "last_seen": probe.get("last_seen") or device.get("last_seen"),
+        "latency_ms": probe.get("latency_ms"),
+        "firmware": probe.get("version") or device.get("firmware", "Unknown"),
+        "url": device.get("url") or _build_device_url(host, scheme=probe.get("scheme") or "https")
+    }
+
+
+def _configured_device_hosts(cfg: dict) -> dict:
+    """Map of normalized host -> device config entry."""
+    hosts = {}
+    for device in cfg.get("devices", []):
+        host = _normalize_device_host(device.get("ip") or device.get("id", device.get("name", "")))
+        if host:
+            hosts[host] = device
+    return hosts
 
-def _probe_device_status(host: str, timeout_sec: float = 1.2) -> dict:
-    """Probe device HTTP/API reachability and return online/offline status."""
-    now = time.time()
-    if not host:
-        return {"status": "offline", "last_seen": now, "reachable": False}
-
-    api_url = f"http://{host}:8080/api/status"
-
-    try:
-        with urllib.request.urlopen(api_url, timeout=timeout_sec) as resp:
-            if 200 <= getattr(resp, "status", 200) < 300:
-                return {"status": "online", "last_seen": now, "reachable": True}
-    except Exception:
-        pass
-
-    for port in (8080, 22):
-        try:
-            with socket.create_connection((host, port), timeout=timeout_sec):
-                return {"status": "online", "last_seen": now, "reachable": True}
-        except Exception:
-            continue
-
-    return {"status": "offline", "last_seen": now, "reachable": False}
 
 @app.route("/api/devices", methods=["GET"])
 def api_devices():
@@ -1444,29 +1454,14 @@ def api_devices():
     
     try:
         cfg = get_config()
-        devices_config = cfg.get("devices", [])
-        
-        # Format devices list with current status
-        devices = []
-        for device in devices_config:
-            raw_id = device.get("id", device.get("name", ""))
-            host = _normalize_device_host(device.get("ip") or raw_id)
-            probe = _probe_device_status(host)
-
-            device_info = {
-                "id": raw_id,
-                "name": device.get("name", "Unknown Device"),
-                "ip": host,
-                "location": device.get("location", ""),
-                "status": probe.get("status", device.get("status", "unknown")),
-                "battery": device.get("battery", None),
-                "storage": device.get("storage", "0 GB"),
-                "events_24h": device.get("events_24h", 0),
-                "last_seen": probe.get("last_seen", device.get("last_seen", time.time())),
-                "firmware": device.get("firmware", "Unknown"),
-                "url": device.get("url") or _build_device_url(host)
-            }
-            devices.append(device_info)
+        hosts = _configured_device_hosts(cfg)
+
+        # Status comes from the background poller; only a cold start waits (briefly) for the first round
+        fleet_poller.track(hosts)
+        if hosts and not fleet_poller.wait_ready(0):
+            fleet_poller.wait_ready(1.5)
+
+        devices = [_device_info_from_poll(device, host) for host, device in hosts.items()]
         
         # Add current device as first one
         current_device = {
@@ -1488,7 +1483,8 @@ def api_devices():
         
         return jsonify({
             "ok": True,
-            "devices": devices
+            "devices": devices,
+            "poller": fleet_poller.get_stats()
         })
     except Exception as e:
         logger.error(f"[DEVICES] Error: {e}")
@@ -1534,6 +1530,7 @@ def api_add_device():
         devices.append(new_device)
         cfg["devices"] = devices
         save_config(cfg)
+        fleet_poller.track(_configured_device_hosts(cfg))
         
         logger.info(f"[DEVICES] Added new device: {device_name} ({device_id})")
         
@@ -1560,6 +1557,7 @@ def api_remove_device(device_id):
         devices = [d for d in devices if d.get("id") != device_id]
         cfg["devices"] = devices
         save_config(cfg)
+        fleet_poller.track(_configured_device_hosts(cfg))
         
         logger.info(f"[DEVICES] Removed device: {device_id}")
         
@@ -1586,11 +1584,6 @@ def multicam():
         logger.error(f"[MULTICAM] Error: {e}")
         return render_template("multicam.html", devices=[])
 
-if __name__ == "__main__":
-    # Run Flask app
-    logger.info("[STARTUP] Starting ME Camera Dashboard...")
-    app.run(host="0.0.0.0", port=8080, debug=False)
-
 @app.route("/api/camera/stats")
 def camera_stats():
     """Get camera performance statistics"""
@@ -1612,28 +1605,41 @@ def camera_stats():
         logger.error(f"[CAMERA] Stats error: {e}")
         return jsonify({"ok": False, "error": str(e)}), 500
 
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition (capture latency, notification timings, RSS)"""
+    if not require_auth() and not scrape_authorized(
+            get_metrics_cfg(get_config()), request.headers.get("Authorization"),
+            request.remote_addr, request.headers.get("X-Forwarded-For")):
+        response = jsonify({"error": "Unauthorized"})
+        response.status_code = 401
+        response.headers["WWW-Authenticate"] = METRICS_AUTH_CHALLENGE
+        return response
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _stop_camera_on_shutdown():
+    if motion_service and motion_service.running:
+        motion_service.stop()
+    if camera_streamer is not None and hasattr(camera_streamer, 'stop'):
+        camera_streamer.stop()
+    logger.info("[CAMERA] Camera released for shutdown")
+
+
+add_shutdown_hook(app, _stop_camera_on_shutdown)
+
 if __name__ == "__main__":
-    import ssl
+    logger.info("[STARTUP] Starting ME Camera Dashboard...")
     
     # Check for HTTPS certificates
     cert_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'certs', 'cert.pem')
     key_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'certs', 'key.pem')
     
-    ssl_context = None
     if os.path.exists(cert_file) and os.path.exists(key_file):
-        try:
-            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-            ssl_context.load_cert_chain(cert_file, key_file)
-            logger.info("[HTTPS] SSL certificates loaded, running with HTTPS")
-        except Exception as e:
-            logger.warning(f"[HTTPS] Failed to load certificates: {e}, falling back to HTTP")
-            ssl_context = None
+        logger.info("[HTTPS] SSL certificates found, running with HTTPS")
     else:
         logger.info("[HTTP] No SSL certificates found, running in HTTP mode")
         logger.info("[HTTPS] To enable HTTPS, create certificates at: certs/cert.pem and certs/key.pem")
     
-    # Run Flask app
-    if ssl_context:
-        app.run(host="0.0.0.0", port=8080, ssl_context=ssl_context, debug=False, threaded=True)
-    else:
-        app.run(host="0.0.0.0", port=8080, debug=False, threaded=True)
\ No newline at end of file
+    # Bounded API/stream pools; server.mode "werkzeug" restores the dev server
+    run_server(app, get_config().get('server', {}), cert_file=cert_file, key_file=key_file)
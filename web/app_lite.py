@@ -20,7 +20,6 @@ import time
 import threading
 import json
 import shutil
-import asyncio
 import tempfile
 import base64
 import re
@@ -40,13 +39,39 @@ from src.core import (
     rotate_enrollment_key
 )
 from src.utils.pi_detect import detect_camera_rotation
-from src.core.secure_encryption import get_encryption
-try:
-    from src.cloud.encrypted_cloud_storage import get_cloud_storage
+from src.utils.perf_metrics import (
+    observe, timer, gauge_callback, render_metrics, get_metrics_cfg, scrape_authorized, METRICS_AUTH_CHALLENGE,
+)
+from src.utils.wsgi_server import add_shutdown_hook
+from src.utils import http_client
+from src.utils import startup_report
+from src.core.notification_outbox import get_notification_outbox
+from src.core.alert_digest import get_motion_alert_digest
+from src.streaming.live_audio import LiveMicCapture, MicBusy, ENCODERS
+
+# cryptography and the Drive client are imported on first use (not at boot)
+CLOUD_AVAILABLE = None  # unknown until the first upload tries to import it
+
+
+def get_encryption():
+    from src.core.secure_encryption import get_encryption as _get_encryption
+    return _get_encryption()
+
+
+def get_cloud_storage(**kwargs):
+    """Encrypted cloud storage singleton, or None when its dependencies are missing"""
+    global CLOUD_AVAILABLE
+    if CLOUD_AVAILABLE is False:
+        return None
+    try:
+        from src.cloud.encrypted_cloud_storage import get_cloud_storage as _get_cloud_storage
+    except Exception as e:
+        CLOUD_AVAILABLE = False
+        logger.warning(f"[CLOUD] Encrypted cloud storage not available: {e}")
+        return None
     CLOUD_AVAILABLE = True
-except Exception as e:
-    CLOUD_AVAILABLE = False
-    logger.warning(f"[CLOUD] Encrypted cloud storage not available: {e}")
+    return _get_cloud_storage(**kwargs)
+
 
 # V3 modules are disabled by default on Pi Zero because some optional native
 # dependencies can crash the interpreter during import on constrained devices.
@@ -54,6 +79,7 @@ WEBRTC_AVAILABLE = False
 AI_DETECTION_AVAILABLE = False
 REMOTE_ACCESS_AVAILABLE = False
 WebRTCStreamer = None
+WebRTCBroadcaster = None
 SmartMotionDetector = None
 DetectionTracker = None
 TailscaleHelper = None
@@ -61,7 +87,7 @@ CloudflareHelper = None
 
 if os.environ.get("MECAM_ENABLE_V3_MODULES", "0") == "1":
     try:
-        from src.streaming.webrtc_peer import WebRTCStreamer
+        from src.streaming.webrtc_peer import WebRTCStreamer, WebRTCBroadcaster
         WEBRTC_AVAILABLE = True
         logger.info("[V3] WebRTC module loaded successfully")
     except Exception as e:
@@ -88,6 +114,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APP_VERSION_LABEL = os.environ.get("MECAM_APP_VERSION", "3.0.0")
 
 AUDIO_DEVICE_CACHE_TTL_SEC = 45
+SNAPSHOT_MAX_WAIT_MS = 2000  # cap on /api/snapshot.jpg?wait= (long-polls occupy an API worker)
 _AUDIO_DEVICE_CACHE_LOCK = threading.Lock()
 _AUDIO_DEVICE_CACHE = {
     "capture": {"value": None, "ts": 0.0},
@@ -358,20 +385,20 @@ def _detect_arecord_device() -> str | None:
     return None
 
 
-def _build_arecord_command(audio_path: str, duration_sec: int) -> list[str]:
+def _build_arecord_stream_command() -> list[str]:
+    """Raw PCM on stdout until stopped (feeds the shared LiveMicCapture)"""
     audio_cmd = [
         "arecord",
         "-q",
         "-f", "S16_LE",
         "-r", "16000",
         "-c", "1",
-        "-d", str(duration_sec),
-        "-t", "wav",
+        "-t", "raw",
     ]
     device_name = _detect_arecord_device()
     if device_name:
         audio_cmd.extend(["-D", device_name])
-    audio_cmd.append(audio_path)
+    audio_cmd.append("-")
     return audio_cmd
 
 
@@ -535,6 +562,9 @@ def _build_battery_payload(status: dict) -> dict:
         'battery_present': bool(status.get('battery_present', has_percent)),
         'display_text': display_text,
         'health': health,
+        'runtime_source': status.get('runtime_source'),
+        'discharge_pct_per_hour': status.get('discharge_pct_per_hour'),
+        'temperature_c': status.get('temperature_c'),
     }
 
 
@@ -734,18 +764,22 @@ def _auto_motion_clip_duration(cfg: dict, motion_ratio: float = 0.0, contour_cou
 
 def _should_extend_motion_capture(previous_gray, current_frame, settings: dict):
     import cv2
+    from src.processing.analysis_pool import motion_activity
 
     current_gray = cv2.cvtColor(current_frame, cv2.COLOR_RGB2GRAY)
-    diff = cv2.absdiff(previous_gray, current_gray)
-    blur = cv2.GaussianBlur(diff, (11, 11), 0)
-    _, thresh = cv2.threshold(blur, 24, 255, cv2.THRESH_BINARY)
-    thresh = cv2.dilate(thresh, None, iterations=1)
-    motion_ratio = cv2.countNonZero(thresh) / float(current_gray.shape[0] * current_gray.shape[1])
-    mean_diff = float(diff.mean())
+    motion_ratio, mean_diff = motion_activity(previous_gray, current_gray)
     active = motion_ratio > (settings["threshold"] * 0.75) or mean_diff > (settings["mean_diff"] * 0.8)
     return active, current_gray, motion_ratio, mean_diff
 
 
+def _motion_trigger_step(motion_streak: int, metrics: dict, settings: dict):
+    """Advance the rpicam-path trigger streak for one analysed frame; returns (streak, frames required)."""
+    trigger_now = metrics["motion_ratio"] > settings["threshold"] and metrics["significant_contours"] > 0
+    motion_streak = (motion_streak + 1) if trigger_now else max(0, motion_streak - 1)
+    trigger_required = max(1, int(settings.get("trigger_streak_frames", 2) or 2))
+    return motion_streak, trigger_required
+
+
 def _get_gdrive_cfg(cfg: dict) -> dict:
     gdrive = cfg.get("google_drive", {}) or {}
     return {
@@ -755,6 +789,76 @@ def _get_gdrive_cfg(cfg: dict) -> dict:
     }
 
 
+def _parse_resolution(value, default: tuple) -> tuple:
+    try:
+        width, height = (int(part) for part in str(value).lower().split("x", 1))
+        if width > 0 and height > 0:
+            return width, height
+    except Exception:
+        pass
+    return default
+
+
+def _parse_bitrate(value, default: int) -> int:
+    """Parse '2500k' / '2M' / 2500000 style bitrates into bits per second."""
+    try:
+        if isinstance(value, (int, float)):
+            return int(value)
+        text = str(value).strip().lower()
+        multiplier = 1
+        if text.endswith("k"):
+            multiplier, text = 1000, text[:-1]
+        elif text.endswith("m"):
+            multiplier, text = 1_000_000, text[:-1]
+        return int(float(text) * multiplier)
+    except Exception:
+        return default
+
+
+def _get_analysis_pool_cfg(cfg: dict) -> dict:
+    pool = cfg.get("analysis_pool", {}) or {}
+    return {
+        "enabled": bool(pool.get("enabled", False)),
+        "workers": int(pool.get("workers", 0) or 0),
+        "max_frame_bytes": int(pool.get("max_frame_bytes", 4 * 1024 * 1024) or 4 * 1024 * 1024),
+        "task_timeout_seconds": float(pool.get("task_timeout_seconds", 5.0) or 5.0),
+        "start_method": pool.get("start_method", "spawn") or "spawn",
+        "extra_tasks": pool.get("extra_tasks", {}) or {},
+        "state_ttl_seconds": float(pool.get("state_ttl_seconds", 300) or 300),
+    }
+
+
+def _get_hls_cfg(cfg: dict) -> dict:
+    hls = cfg.get("hls", {}) or {}
+    return {
+        "enabled": bool(hls.get("enabled", True)),
+        "bitrate": _parse_bitrate(hls.get("bitrate"), 400_000),
+        "segment_seconds": float(hls.get("segment_seconds", 1.0) or 1.0),
+        "playlist_size": int(hls.get("playlist_size", 6) or 6),
+        "idle_timeout_seconds": float(hls.get("idle_timeout_seconds", 60) or 60),
+        "output_dir": hls.get("output_dir") or None,
+    }
+
+
+def _get_live_audio_cfg(cfg: dict) -> dict:
+    live = cfg.get("audio_live", {}) or {}
+    return {
+        "codec": str(live.get("codec", "auto") or "auto").lower(),
+        "bitrate_kbps": int(live.get("bitrate_kbps", 24) or 24),
+        "buffer_ms": int(live.get("buffer_ms", 1000) or 1000),
+        "prebuffer_ms": int(live.get("prebuffer_ms", 200) or 200),
+        "max_listeners": int(live.get("max_listeners", 3) or 3),
+    }
+
+
+def _metrics_authorized(cfg: dict) -> bool:
+    """Logged-in session, ``Authorization: Bearer <metrics.token>``, or a scraper on this host."""
+    if 'user' in session:
+        return True
+    return scrape_authorized(get_metrics_cfg(cfg), request.headers.get("Authorization"),
+                             request.remote_addr, request.headers.get("X-Forwarded-For"))
+
+
 def _get_client_ip() -> str:
     forwarded = request.headers.get("X-Forwarded-For")
     if forwarded:
@@ -837,49 +941,35 @@ def queue_offline_clip(video_path: str, meta: dict) -> None:
 
 
 def queue_notification_retry(phone: str, message: str, reason: str = "unknown") -> None:
-    items = _load_queue(NOTIFY_QUEUE_FILE)
-    items.append({
-        "phone": phone,
-        "message": message,
-        "attempts": 0,
-        "reason": reason,
-        "timestamp": datetime.utcnow().isoformat()
-    })
-    _save_queue(NOTIFY_QUEUE_FILE, items)
-    logger.info(f"[NOTIFY] Queued notification retry for {phone} (reason: {reason})")
+    """Hand an SMS to the notification outbox, which owns retries and backoff."""
+    get_notification_outbox().enqueue("sms", {"phone": phone, "message": message})
+    logger.info(f"[NOTIFY] Queued notification for {phone} (reason: {reason})")
 
 
 def flush_notification_queue() -> None:
-    if not is_wifi_connected():
-        return
+    """Move retries left in the legacy notification_queue.json into the outbox."""
     items = _load_queue(NOTIFY_QUEUE_FILE)
     if not items:
         return
-    cfg = get_config()
-    if not cfg.get('sms_enabled'):
-        return
-    from src.core import get_sms_notifier
-    notifier = get_sms_notifier()
-    remaining = []
     for item in items:
-        phone = item.get("phone")
-        message = item.get("message")
-        attempts = int(item.get("attempts", 0))
-        if not phone or not message:
-            continue
-        if attempts >= 3:
-            logger.warning(f"[NOTIFY] Dropping notification after 3 attempts: {phone}")
-            continue
-        try:
-            notifier.send_sms(phone, message)
-            logger.success(f"[NOTIFY] Retry sent to {phone}")
-        except Exception as e:
-            attempts += 1
-            item["attempts"] = attempts
-            item["last_error"] = str(e)
-            remaining.append(item)
-            logger.warning(f"[NOTIFY] Retry failed ({attempts}/3) for {phone}: {e}")
-    _save_queue(NOTIFY_QUEUE_FILE, remaining)
+        # Both the app's retry list and NotificationQueue used this file ("phone" vs "recipient")
+        phone = item.get("phone") or item.get("recipient")
+        if phone and item.get("message") and item.get("status", "pending") == "pending":
+            queue_notification_retry(phone, item["message"], reason=item.get("reason", "legacy_queue"))
+    _save_queue(NOTIFY_QUEUE_FILE, [])
+    logger.info(f"[NOTIFY] Moved {len(items)} legacy queued notification(s) to the outbox")
+
+
+def queue_motion_alerts(cfg: dict, event_id: str) -> None:
+    """
+    Hand one motion event to the alert digest; called from the frame loop.
+
+    The first event after a quiet period is enqueued on the notification
+    outbox right away; events inside the digest window are folded into one
+    digest sent when the window closes. Nothing here touches the network.
+    """
+    if get_motion_alert_digest().on_motion(cfg, event_id):
+        logger.info(f"[NOTIFY] Motion alert queued for event {event_id}")
 
 
 def mark_offline_clips_synced() -> None:
@@ -940,7 +1030,9 @@ def _encrypt_clip_if_enabled(file_path: str, cfg: dict) -> tuple:
         os.makedirs(encrypted_dir, exist_ok=True)
         enc = get_encryption()
         output_path = os.path.join(encrypted_dir, os.path.basename(file_path) + ".enc")
-        if enc.encrypt_file(file_path, output_path):
+        with timer("mecam_encrypt_seconds", stage="clip"):
+            encrypted = enc.encrypt_file(file_path, output_path)
+        if encrypted:
             try:
                 os.remove(file_path)
             except Exception:
@@ -952,7 +1044,7 @@ def _encrypt_clip_if_enabled(file_path: str, cfg: dict) -> tuple:
 
 
 def _queue_cloud_upload(file_path: str, meta: dict = None) -> str:
-    if not CLOUD_AVAILABLE:
+    if CLOUD_AVAILABLE is False:
         return None
     cfg = get_config()
     gdrive = _get_gdrive_cfg(cfg)
@@ -963,6 +1055,8 @@ def _queue_cloud_upload(file_path: str, meta: dict = None) -> str:
 
     try:
         cloud = get_cloud_storage(base_dir=BASE_DIR, google_credentials=gdrive.get("credentials_file"))
+        if cloud is None:
+            return None
         return cloud.queue_upload(file_path, remote_folder=gdrive.get("folder_id") or None, metadata=meta or {})
     except Exception as e:
         logger.warning(f"[CLOUD] Queue upload failed: {e}")
@@ -1014,14 +1108,12 @@ def maybe_flush_queues(throttle_seconds: int = 30) -> None:
     if now - _last_queue_flush < throttle_seconds:
         return
     _last_queue_flush = now
-    flush_notification_queue()
     flush_offline_clip_queue()
 
 def create_lite_app(pi_model, camera_config):
     """Create lightweight Flask app with all features"""
     
     app = Flask(__name__, template_folder='templates', static_folder='static')
-    webrtc_streamer = None
     cfg = get_config()
     if _normalize_device_identity(cfg):
         save_config(cfg)
@@ -1047,11 +1139,13 @@ def create_lite_app(pi_model, camera_config):
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
         response.headers['Access-Control-Max-Age'] = '3600'
-        response.headers['Access-Control-Expose-Headers'] = 'Content-Type'
+        response.headers['Access-Control-Expose-Headers'] = 'Content-Type, ETag'
         
         # Disable buffering for streaming over VPN/remote connections
         response.headers['X-Accel-Buffering'] = 'no'
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        if not response.headers.get('ETag'):
+            # ETag responses (snapshots) set no-cache themselves so clients can revalidate with If-None-Match
+            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
         
@@ -1099,12 +1193,32 @@ def create_lite_app(pi_model, camera_config):
         'lock': threading.Lock(),
         'stream_clients': 0,
     }
+    preroll_sizes = {}  # frame-loop key -> (updated_at, bytes held in its pre-roll buffer)
 
     # Lightweight battery monitor
+    # Sampler starts on first get_status (background sync thread), not during boot
     battery = BatteryMonitor(enabled=True)
+    gauge_callback('mecam_battery_discharge_pct_per_hour', lambda: battery.discharge_rate() or 0.0,
+                   'Smoothed battery discharge rate (0 until measured or on external power)')
     low_battery_alert_at = {"ts": 0.0}
     audio_capture_lock = threading.Lock()
     audio_playback_lock = threading.Lock()
+    # One arecord shared by live listeners and motion clips (holds audio_capture_lock while running)
+    live_audio_cfg = _get_live_audio_cfg(cfg)
+    live_mic = LiveMicCapture(
+        audio_capture_lock,
+        _build_arecord_stream_command,
+        buffer_ms=live_audio_cfg['buffer_ms'],
+        prebuffer_ms=live_audio_cfg['prebuffer_ms'],
+        max_listeners=live_audio_cfg['max_listeners'],
+    )
+    gauge_callback('mecam_audio_listeners', lambda: live_mic.listeners, 'Clients listening to the live microphone')
+
+    # Notification delivery workers (recovers alerts left pending by a restart)
+    http_client.configure(cfg.get('http_client'))
+    get_notification_outbox((cfg.get('notifications', {}) or {}).get('outbox'))
+    get_motion_alert_digest()
+    flush_notification_queue()
 
     # Background queue flush for offline clips/cloud sync
     def _background_sync():
@@ -1125,16 +1239,16 @@ def create_lite_app(pi_model, camera_config):
                                     pct = status.get('percent')
                                     pct_text = f"{pct}%" if isinstance(pct, int) else "unknown"
                                     msg = f"⚠️ {cfg.get('device_name', 'ME Camera')}: Low power detected (battery {pct_text}, undervolt={not status.get('external_power', True)})."
-                                    notifier.send_sms(phone, msg)
+                                    notifier.send_sms(phone, msg, key=f"low_battery:{int(now // 1800)}")
                                     low_battery_alert_at["ts"] = now
-                                    logger.warning(f"[POWER] Low battery alert sent to {phone}")
+                                    logger.warning(f"[POWER] Low battery alert queued for {phone}")
                                 except Exception as e:
                                     logger.warning(f"[POWER] Low battery alert failed: {e}")
             except Exception as e:
                 logger.debug(f"[SYNC] Background sync error: {e}")
             time.sleep(5)
 
-    threading.Thread(target=_background_sync, daemon=True).start()
+    threading.Thread(target=_background_sync, name="background-sync", daemon=True).start()
 
     def _cleanup_orphan_motion_files() -> None:
         """Remove stale tiny motion files left behind by sudden power loss."""
@@ -1300,7 +1414,40 @@ def create_lite_app(pi_model, camera_config):
                 hflip = camera_rotation_mode == 'flip_horizontal'
                 vflip = camera_rotation_mode == 'flip_vertical'
 
-                if is_rpicam_available():
+                # Recorded footage in the camera slot: MECAM_CAMERA_REPLAY=<dir|file.mjpeg|file.mp4|synthetic>
+                # or camera.backend = "replay" with a camera.replay block
+                replay_cfg = dict(stream_cfg.get('replay') or {})
+                replay_source = os.environ.get("MECAM_CAMERA_REPLAY", "").strip()
+                if replay_source:
+                    replay_cfg['source'] = replay_source
+                if replay_source or str(stream_cfg.get('backend', 'auto')).lower() == 'replay':
+                    from src.camera import ReplayStreamer, SyntheticStreamer
+                    logger.info(f"[CAMERA] Attempting camera init ({reason}) with replay of {replay_cfg.get('source')}")
+                    synthetic_kwargs = {}
+                    replay_cls = ReplayStreamer
+                    if replay_cfg.get('source') == 'synthetic':
+                        # Generated scene with periodic walk-bys (load benchmark, no sensor needed)
+                        replay_cls = SyntheticStreamer
+                        synthetic_kwargs = {
+                            'motion_every': float(replay_cfg.get('synthetic_motion_every_seconds', 0) or 0),
+                            'motion_seconds': float(replay_cfg.get('synthetic_motion_seconds', 3) or 3),
+                        }
+                    new_camera = replay_cls(
+                        source=replay_cfg.get('source', ''),
+                        fps=float(replay_cfg.get('fps', stream_fps) or 0),
+                        loop=bool(replay_cfg.get('loop', True)),
+                        quality=stream_quality,
+                        width=640,
+                        height=480,
+                        stall_every=int(replay_cfg.get('stall_every_frames', 0) or 0),
+                        stall_seconds=float(replay_cfg.get('stall_seconds', 0) or 0),
+                        failure_rate=float(replay_cfg.get('failure_rate', 0) or 0),
+                        fail_after=int(replay_cfg.get('fail_after_frames', 0) or 0),
+                        **synthetic_kwargs,
+                    )
+                    if new_camera.start():
+                        new_available = True
+                elif is_rpicam_available():
                     logger.info(f"[CAMERA] Attempting camera init ({reason}) with rpicam-jpeg")
                     new_camera = RpicamStreamer(
                         width=640,
@@ -1318,15 +1465,46 @@ def create_lite_app(pi_model, camera_config):
                             f"Quality {stream_quality}, rotation={camera_rotation_mode}"
                         )
                 else:
-                    logger.warning("[CAMERA] rpicam-jpeg unavailable, trying picamera2")
-                    from picamera2 import Picamera2
-                    new_camera = Picamera2()
-                    new_camera.configure(new_camera.create_preview_configuration(
-                        main={"size": (640, 480), "format": "RGB888"}
-                    ))
-                    new_camera.start()
-                    new_available = True
-                    logger.success("[CAMERA] Camera initialized (picamera2): 640x480")
+                    # picamera2: hardware JPEG for the live view (encoded once, shared by every viewer),
+                    # orientation via the sensor Transform; dual-stream adds full-res H.264 for clips
+                    dual_stream = bool(stream_cfg.get('dual_stream', True))
+                    logger.warning(
+                        f"[CAMERA] rpicam-jpeg unavailable, trying picamera2{' dual-stream' if dual_stream else ''}"
+                    )
+                    from src.camera import FastCameraStreamer
+                    if FastCameraStreamer is None:
+                        raise ImportError("picamera2 not available")
+                    recording_size = (
+                        _parse_resolution(stream_cfg.get('recording_resolution'), (1280, 720))
+                        if dual_stream else None
+                    )
+                    new_camera = FastCameraStreamer(
+                        width=640,
+                        height=480,
+                        fps=stream_fps,
+                        performance_mode=False,
+                        recording_size=recording_size,
+                        recording_bitrate=_parse_bitrate(stream_cfg.get('recording_bitrate'), 2_000_000),
+                        preroll_seconds=int(stream_cfg.get('preroll_seconds', 3) or 3),
+                        rotation=rotation_degrees,
+                        hflip=hflip,
+                        vflip=vflip,
+                        hardware_jpeg=bool(stream_cfg.get('hardware_jpeg', True)),
+                    )
+                    new_camera.jpeg_quality = stream_quality
+                    if new_camera.start():
+                        new_available = True
+                        if dual_stream:
+                            logger.success(
+                                f"[CAMERA] Camera initialized (picamera2 dual-stream): "
+                                f"{recording_size[0]}x{recording_size[1]} record, 640x480 detect, "
+                                f"rotation={camera_rotation_mode}"
+                            )
+                        else:
+                            logger.success(
+                                f"[CAMERA] Camera initialized (picamera2): 640x480 @ {stream_fps} FPS, "
+                                f"rotation={camera_rotation_mode}"
+                            )
             except ImportError as e:
                 logger.warning(f"[CAMERA] Module unavailable during {reason}: {e}")
             except Exception as e:
@@ -1351,7 +1529,46 @@ def create_lite_app(pi_model, camera_config):
             camera_available = False
             return False
 
-    _initialize_camera_backend(reason='startup', force=True)
+    # Warm the camera up in the background: rpicam/picamera2 take seconds to start on a
+    # Pi Zero and the server should answer (test pattern, /api/health) in the meantime
+    camera_warmup = threading.Event()
+
+    def _warm_up_camera():
+        ok = False
+        try:
+            ok = _initialize_camera_backend(reason='startup', force=True)
+        except Exception as e:
+            logger.error(f"[CAMERA] Startup init failed: {e}")
+        finally:
+            camera_warmup.set()
+            startup_report.finish('camera', ok=ok, detail=None if ok else 'no camera backend, serving test pattern')
+
+    startup_report.begin('camera')
+    threading.Thread(target=_warm_up_camera, name="camera-warmup", daemon=True).start()
+
+    def _release_camera_on_shutdown():
+        nonlocal camera, camera_available
+        with camera_state_lock:
+            cam_obj, camera, camera_available = camera, None, False
+        _close_camera_backend(cam_obj)
+        logger.info("[CAMERA] Camera released for shutdown")
+
+    add_shutdown_hook(app, _release_camera_on_shutdown)
+
+    # Optional worker processes for frame analysis (keeps the GIL free for Flask on multi-core Pis)
+    analysis_pool = None
+    analysis_pool_cfg = _get_analysis_pool_cfg(cfg)
+    if analysis_pool_cfg["enabled"]:
+        try:
+            from src.processing.analysis_pool import get_analysis_pool
+            analysis_pool = get_analysis_pool(analysis_pool_cfg)
+        except Exception as e:
+            logger.warning(f"[ANALYSIS] Worker pool unavailable, analysing in-process: {e}")
+            analysis_pool = None
+
+    # Per-tier JPEG cache shared by every /video_feed viewer
+    from src.streaming.quality_tiers import TierEncodeCache, TierViewer, load_quality_tiers
+    stream_tier_cache = TierEncodeCache(load_quality_tiers(cfg.get('camera', {})))
     
     # ============= HELPER FUNCTIONS =============
     
@@ -1495,6 +1712,22 @@ def create_lite_app(pi_model, camera_config):
             logger.error(f"[MOTION] Load events failed: {e}")
         return []
 
+    def count_recent_motion_events(hours=24):
+        """Number of motion events in the last ``hours`` (reported to the fleet poller)."""
+        from datetime import timezone
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+        count = 0
+        for event in get_motion_events():
+            try:
+                event_dt = datetime.fromisoformat(str(event['timestamp']).replace('Z', '+00:00'))
+                if event_dt.tzinfo is None:
+                    event_dt = event_dt.astimezone()  # naive timestamps are local time
+                if event_dt >= cutoff:
+                    count += 1
+            except Exception:
+                continue
+        return count
+
     def save_motion_clip(camera_obj, frame, duration_sec=5):
         """Save a short MP4 clip when motion is detected"""
         try:
@@ -1582,28 +1815,14 @@ def create_lite_app(pi_model, camera_config):
             audio_path = None
             audio_embedded = False
             audio_sidecar = None
-            audio_lock_acquired = False
 
-            # Try to capture audio in parallel when enabled and arecord is present.
+            # Tap the shared microphone capture (also works while someone is listening live).
             if cfg.get('audio_record_on_motion', True) and shutil.which("arecord"):
-                try:
-                    audio_lock_acquired = audio_capture_lock.acquire(blocking=False)
-                    if not audio_lock_acquired:
-                        logger.info("[AUDIO] Motion audio skipped because microphone is busy")
-                    else:
-                        audio_path = os.path.join(recordings_path, f"motion_{timestamp}.wav")
-                        audio_cmd = _build_arecord_command(audio_path, max_duration)
-                        audio_proc = subprocess.Popen(audio_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                except Exception as e:
-                    logger.warning(f"[AUDIO] Failed to start audio capture: {e}")
-                    audio_proc = None
+                audio_path = os.path.join(recordings_path, f"motion_{timestamp}.wav")
+                audio_proc = live_mic.record_wav(audio_path, max_duration)
+                if audio_proc is None:
+                    logger.info("[AUDIO] Motion audio skipped because microphone is unavailable")
                     audio_path = None
-                    if audio_lock_acquired:
-                        try:
-                            audio_capture_lock.release()
-                        except Exception:
-                            pass
-                        audio_lock_acquired = False
 
             # Write buffered frames first (captures motion that already happened)
             for frame in buffered_frames:
@@ -1643,13 +1862,6 @@ def create_lite_app(pi_model, camera_config):
                     audio_proc.kill()
                 audio_proc = None
 
-            if audio_lock_acquired:
-                try:
-                    audio_capture_lock.release()
-                except Exception:
-                    pass
-                audio_lock_acquired = False
-
             has_audio_capture = bool(audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 1024)
 
             # Mux audio if available and ffmpeg present
@@ -1669,7 +1881,8 @@ def create_lite_app(pi_model, camera_config):
                     ]
                     # Pi Zero can take noticeably longer when remuxing AV clips.
                     mux_timeout = max(30, int(max_duration) * 4)
-                    subprocess.run(mux_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, timeout=mux_timeout)
+                    with timer("mecam_mux_seconds", kind="audio"):
+                        subprocess.run(mux_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, timeout=mux_timeout)
                     if os.path.exists(muxed_path):
                         os.replace(muxed_path, filepath)
                         audio_embedded = True
@@ -2147,17 +2360,29 @@ def create_lite_app(pi_model, camera_config):
         # Stream available if first-run complete (setup done) but allow if logged in too
         # This is an MJPEG stream meant to be embedded in authenticated page
         try:
+            if not camera_warmup.is_set():
+                camera_warmup.wait(timeout=10.0)
             if camera is None or not camera_available:
                 _initialize_camera_backend(reason='video_feed_request')
             if camera is None or not camera_available:
                 return Response(generate_test_pattern(), mimetype='multipart/x-mixed-replace; boundary=frame')
             
+            # ?tier=low|standard|high|ultra caps the quality; ?adaptive=0 pins it (no auto-downgrade)
+            stream_cfg = get_config().get('camera', {}) or {}
+            default_tier = stream_cfg.get('stream_quality', 'standard')
+            viewer = TierViewer(
+                stream_tier_cache,
+                requested=request.args.get('tier'),
+                default_tier=default_tier if isinstance(default_tier, str) else 'standard',
+                adaptive=request.args.get('adaptive', '1').lower() not in ('0', 'false', 'no'),
+            )
+
             # Track active viewers so background motion keepalive can pause while clients are streaming.
             def _viewer_stream():
                 with motion_runtime['lock']:
                     motion_runtime['stream_clients'] += 1
                 try:
-                    for chunk in generate_frames(stream_output=True, internal_keepalive=False):
+                    for chunk in generate_frames(stream_output=True, internal_keepalive=False, viewer=viewer):
                         yield chunk
                 finally:
                     with motion_runtime['lock']:
@@ -2175,6 +2400,140 @@ def create_lite_app(pi_model, camera_config):
             logger.error(f"[CAMERA] Stream error: {e}")
             return Response(generate_test_pattern(), mimetype='multipart/x-mixed-replace; boundary=frame')
     
+    # Sequence numbers for backends that don't number their frames (tracked by bytes identity)
+    snapshot_state = {'lock': threading.Lock(), 'jpeg': None, 'seq': 0}
+
+    def _latest_snapshot():
+        """Most recent JPEG held by the camera backend as (seq, jpeg) - no capture, no encode."""
+        active = camera
+        if active is None or not camera_available:
+            return 0, None
+        if hasattr(active, 'get_jpeg_frame_with_seq'):
+            return active.get_jpeg_frame_with_seq()
+        if hasattr(active, 'get_jpeg_frame'):
+            jpeg = active.get_jpeg_frame()
+            with snapshot_state['lock']:
+                if jpeg and jpeg is not snapshot_state['jpeg']:
+                    snapshot_state['jpeg'] = jpeg
+                    snapshot_state['seq'] += 1
+                return snapshot_state['seq'], snapshot_state['jpeg']
+        return 0, None
+
+    def _wait_for_snapshot(after_seq, timeout):
+        """Block until the backend has a frame newer than ``after_seq`` or ``timeout`` passes."""
+        active = camera
+        if hasattr(active, 'wait_for_jpeg'):
+            return active.wait_for_jpeg(after_seq, timeout)
+        deadline = time.monotonic() + timeout
+        seq, jpeg = _latest_snapshot()
+        while seq == after_seq and time.monotonic() < deadline:
+            time.sleep(0.02)
+            seq, jpeg = _latest_snapshot()
+        return seq, jpeg
+
+    @app.route("/api/snapshot.jpg")
+    def api_snapshot():
+        """Latest frame straight from memory; ETag = frame sequence, ?wait=ms long-polls for the next one"""
+        if 'user' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        if camera is None or not camera_available:
+            return jsonify({'error': 'Camera unavailable'}), 503
+
+        seq, jpeg = _latest_snapshot()
+        # Backend identity in the tag so a camera restart (seq back to 0) can't produce a stale 304
+        etag = f"{id(camera):x}-{seq}"
+        try:
+            wait_ms = max(0, min(SNAPSHOT_MAX_WAIT_MS, int(request.args.get('wait', 0) or 0)))
+        except (TypeError, ValueError):
+            wait_ms = 0
+        client_has_current = request.if_none_match.contains(etag)
+        if wait_ms and (client_has_current or not request.if_none_match or not jpeg):
+            seq, jpeg = _wait_for_snapshot(seq, wait_ms / 1000.0)
+            etag = f"{id(camera):x}-{seq}"
+            client_has_current = request.if_none_match.contains(etag)
+
+        if not jpeg:
+            return jsonify({'error': 'No frame available yet'}), 503
+        if client_has_current:
+            response = Response(status=304)
+        else:
+            response = Response(jpeg, mimetype='image/jpeg')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache, private'
+        return response
+    
+    # HLS for remote viewers: hardware H.264 of the live view, remuxed (not re-encoded) into fMP4 segments
+    hls_state = {'lock': threading.Lock(), 'segmenter': None}
+
+    def _hls_release_encoder():
+        active = camera
+        segmenter = hls_state['segmenter']
+        if hasattr(active, 'stop_live_h264') and segmenter is not None:
+            active.stop_live_h264(segmenter.write)
+
+    def _stop_hls_on_shutdown():
+        segmenter = hls_state['segmenter']
+        if segmenter is not None:
+            _hls_release_encoder()
+            segmenter.stop()
+
+    add_shutdown_hook(app, _stop_hls_on_shutdown)
+
+    def _ensure_hls():
+        """Start the segmenter + encoder on demand; None when this backend can't produce H.264."""
+        active = camera
+        if active is None or not camera_available or not hasattr(active, 'start_live_h264'):
+            return None
+        hls_cfg = _get_hls_cfg(get_config())
+        if not hls_cfg['enabled']:
+            return None
+        with hls_state['lock']:
+            segmenter = hls_state['segmenter']
+            if segmenter is None:
+                from src.streaming.hls import HlsSegmenter
+                segmenter = HlsSegmenter(
+                    output_dir=hls_cfg['output_dir'],
+                    fps=int(getattr(active, 'fps', 15) or 15),
+                    segment_seconds=hls_cfg['segment_seconds'],
+                    playlist_size=hls_cfg['playlist_size'],
+                    idle_timeout=hls_cfg['idle_timeout_seconds'],
+                    on_idle=_hls_release_encoder,
+                )
+                hls_state['segmenter'] = segmenter
+            if not segmenter.start():
+                return None
+            # Idempotent; re-attaches the encoder after a camera restart
+            if not active.start_live_h264(segmenter.write, bitrate=hls_cfg['bitrate']):
+                segmenter.stop()
+                return None
+            return segmenter
+
+    @app.route("/hls/stream.m3u8")
+    def hls_playlist():
+        """Rolling HLS playlist (starts the segmenter on first request)"""
+        if 'user' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        segmenter = _ensure_hls()
+        if segmenter is None:
+            return jsonify({'error': 'HLS not available on this camera backend'}), 503
+        if not segmenter.wait_for_playlist(timeout=segmenter.segment_seconds * 3 + 3):
+            return jsonify({'error': 'HLS starting, retry shortly'}), 503
+        response = send_file(segmenter.playlist_path, mimetype='application/vnd.apple.mpegurl', max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @app.route("/hls/<name>")
+    def hls_segment(name):
+        """fMP4 init/media segments from the RAM ring directory"""
+        if 'user' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        segmenter = hls_state['segmenter']
+        path = segmenter.segment_path(name) if segmenter is not None else None
+        if path is None:
+            return jsonify({'error': 'Segment not found'}), 404
+        segmenter.touch()
+        return send_file(path, mimetype='video/mp4', max_age=0)
+    
     # ============= API ROUTES =============
     
     @app.route("/api/battery", methods=["GET"])
@@ -2195,9 +2554,28 @@ def create_lite_app(pi_model, camera_config):
             'battery_present': payload.get('battery_present'),
             'display_text': payload.get('display_text'),
             'health': payload.get('health'),
+            'runtime_source': payload.get('runtime_source'),
+            'discharge_pct_per_hour': payload.get('discharge_pct_per_hour'),
+            'temperature_c': payload.get('temperature_c'),
             'timestamp': datetime.utcnow().isoformat()
         })
 
+    @app.route("/api/battery/history", methods=["GET"])
+    def api_battery_history():
+        """Sampled power telemetry (percent, current, throttle bits, temperature) from the ring buffer"""
+        if 'user' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        try:
+            minutes = float(request.args.get('minutes', '60') or 60)
+        except Exception:
+            minutes = 60.0
+        minutes = max(1.0, min(24 * 60.0, minutes))
+        return jsonify({
+            'samples': battery.get_history(minutes * 60),
+            'discharge_pct_per_hour': battery.discharge_rate(),
+            'runtime_hours': battery.predict_runtime_hours(),
+        })
+
     @app.route("/api/status", methods=["GET"])
     def api_status():
         """Unified runtime status endpoint for health checks and fleet monitoring."""
@@ -2229,6 +2607,7 @@ def create_lite_app(pi_model, camera_config):
                 'camera_available': bool(camera is not None and camera_available),
                 'camera_rotation': camera_rotation_mode,
                 'wifi_connected': is_wifi_connected(),
+                'events_24h': count_recent_motion_events(24),
                 'battery': {
                     'percent': battery_status.get('percent', 0),
                     'is_low': battery_status.get('is_low', False),
@@ -2242,8 +2621,12 @@ def create_lite_app(pi_model, camera_config):
                 },
                 'queues': {
                     'offline_clips': len(_load_queue(OFFLINE_QUEUE_FILE)),
-                    'notifications': len(_load_queue(NOTIFY_QUEUE_FILE))
+                    'notifications': get_notification_outbox().pending_count()
                 },
+                'providers': http_client.get_stats(),
+                'analysis_pool': analysis_pool.get_stats() if analysis_pool is not None else {'running': False},
+                'stream_tiers': stream_tier_cache.get_stats(),
+                'hls': hls_state['segmenter'].get_stats() if hls_state['segmenter'] is not None else {'running': False},
                 'uptime': {
                     'app_seconds': app_uptime_seconds,
                     'system_seconds': system_uptime_seconds
@@ -2257,6 +2640,75 @@ def create_lite_app(pi_model, camera_config):
                 'timestamp': time.time()
             }), 500
 
+    def _preroll_bytes():
+        now = time.time()
+        for key, (updated_at, _) in list(preroll_sizes.items()):
+            if now - updated_at > 30:
+                preroll_sizes.pop(key, None)  # frame loop ended
+        return sum(size for _, size in list(preroll_sizes.values()))
+
+    def _viewer_counts():
+        counts = {(('transport', 'mjpeg'),): motion_runtime['stream_clients']}
+        broadcaster = webrtc_state['broadcaster']
+        counts[(('transport', 'webrtc'),)] = broadcaster.get_stats().get('peers_connected', 0) if broadcaster else 0
+        return counts
+
+    def _send_queue_depth():
+        broadcaster = webrtc_state['broadcaster']
+        return {(('transport', 'webrtc'),): broadcaster.get_stats().get('queue_depth', 0) if broadcaster else 0}
+
+    gauge_callback('mecam_stream_viewers', _viewer_counts, 'Connected live-view clients')
+    gauge_callback('mecam_stream_send_queue_depth', _send_queue_depth, 'Frames waiting in the shared live send queue')
+    gauge_callback('mecam_preroll_buffer_bytes', _preroll_bytes, 'Bytes held in motion pre-roll buffers')
+    gauge_callback('mecam_offline_queue_length', lambda: len(_load_queue(OFFLINE_QUEUE_FILE)),
+                   'Clips waiting for connectivity')
+    gauge_callback('mecam_notification_queue_length', lambda: get_notification_outbox().pending_count(),
+                   'Notifications waiting in the outbox')
+    gauge_callback('mecam_provider_circuit_open',
+                   lambda: {(('provider', name),): int(stats['state'] == 'open')
+                            for name, stats in http_client.get_stats().items()},
+                   'Providers currently failing fast (1 = circuit open)')
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        """Prometheus text exposition of the hot-path histograms and runtime gauges."""
+        if not _metrics_authorized(get_config()):
+            response = jsonify({'error': 'Not authenticated'})
+            response.status_code = 401
+            response.headers['WWW-Authenticate'] = METRICS_AUTH_CHALLENGE
+            return response
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.route("/api/admin/profile", methods=["GET"])
+    def api_admin_profile():
+        """Sample all thread stacks for ?seconds= and download collapsed stacks or an SVG flamegraph."""
+        if 'user' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        from src.utils.stack_profiler import profile
+        seconds = max(1.0, min(60.0, request.args.get('seconds', 10.0, type=float) or 10.0))
+        interval_ms = max(2.0, min(100.0, request.args.get('interval_ms', 10.0, type=float) or 10.0))
+        fmt = 'svg' if request.args.get('format', 'collapsed').lower() == 'svg' else 'collapsed'
+        include_idle = request.args.get('idle', '0').lower() in ('1', 'true', 'yes')
+        try:
+            body, info = profile(seconds, interval=interval_ms / 1000.0, fmt=fmt, include_idle=include_idle,
+                                 title=f"{get_config().get('device_name', 'ME_CAM')} - {seconds:g}s")
+        except RuntimeError as e:
+            return jsonify({'ok': False, 'error': str(e)}), 409
+        logger.info(f"[PROFILE] {session.get('user')} captured {info['seconds']}s "
+                    f"({info['ticks']} ticks, {info['stacks']} stacks)")
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if fmt == 'svg':
+            response = Response(body, mimetype='image/svg+xml')
+            filename = f"profile_{stamp}.svg"
+        else:
+            response = Response(body, content_type='text/plain; charset=utf-8')
+            filename = f"profile_{stamp}.collapsed"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['X-Profile-Ticks'] = str(info['ticks'])
+        return response
+
     @app.route("/api/health", methods=["GET"])
     def api_health():
         """Lightweight health probe endpoint for load balancers and watchdogs."""
@@ -2272,6 +2724,7 @@ def create_lite_app(pi_model, camera_config):
                 'version': _get_app_version(cfg),
                 'camera_available': bool(camera is not None and camera_available),
                 'wifi_connected': is_wifi_connected(),
+                'startup': startup_report.snapshot(),
                 'timestamp': time.time()
             })
         except Exception as e:
@@ -2525,61 +2978,57 @@ def create_lite_app(pi_model, camera_config):
         if not shutil.which('arecord'):
             return jsonify({'ok': False, 'error': 'Microphone capture tool missing (install alsa-utils)'}), 503
 
-        tmp_path = None
-        lock_acquired = False
         try:
-            lock_acquired = audio_capture_lock.acquire(blocking=False)
-            if not lock_acquired:
-                return jsonify({'ok': False, 'error': 'Device microphone is busy'}), 409
-
-            try:
-                duration = int(request.args.get('seconds', '8') or 8)
-            except Exception:
-                duration = 8
-            duration = max(2, min(20, duration))
+            duration = int(request.args.get('seconds', '8') or 8)
+        except Exception:
+            duration = 8
+        duration = max(2, min(20, duration))
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
-                tmp_path = tmp.name
+        try:
+            # Short clip from the shared capture, kept in memory (no temp file on the SD card)
+            wav_bytes = live_mic.capture_wav_bytes(duration)
+            if len(wav_bytes) < 64 + 44:
+                return jsonify({'ok': False, 'error': 'No microphone audio captured'}), 500
+            return Response(wav_bytes, mimetype='audio/wav', headers={
+                'Content-Disposition': f'inline; filename=listen_{int(time.time())}.wav',
+                'Cache-Control': 'no-cache, no-store',
+            })
+        except MicBusy:
+            return jsonify({'ok': False, 'error': 'Device microphone is busy'}), 409
+        except Exception as e:
+            logger.error(f"[AUDIO] Listen endpoint failed: {e}")
+            return jsonify({'ok': False, 'error': str(e)}), 500
 
-            arecord_cmd = _build_arecord_command(tmp_path, duration)
-            result = subprocess.run(arecord_cmd, timeout=duration + 4, capture_output=True, check=False)
-            if result.returncode != 0:
-                err = (result.stderr or b'').decode(errors='ignore')[:160]
-                logger.warning(f"[AUDIO] Listen capture failed ({result.returncode}): {err}")
-                return jsonify({'ok': False, 'error': 'Unable to capture microphone audio'}), 500
+    @app.route("/api/audio/live", methods=["GET"])
+    def api_audio_live():
+        """Live microphone as one chunked response that stays open until the client disconnects."""
+        if 'user' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
 
-            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) < 64:
-                return jsonify({'ok': False, 'error': 'No microphone audio captured'}), 500
+        if not shutil.which('arecord'):
+            return jsonify({'ok': False, 'error': 'Microphone capture tool missing (install alsa-utils)'}), 503
 
-            @after_this_request
-            def cleanup(response):
-                try:
-                    if tmp_path and os.path.exists(tmp_path):
-                        os.remove(tmp_path)
-                except Exception:
-                    pass
-                return response
+        live_cfg = _get_live_audio_cfg(get_config())
+        codec = (request.args.get('codec') or live_cfg['codec']).strip().lower()
+        if codec == 'auto':
+            codec = 'opus'
+        if codec not in ENCODERS or not shutil.which('ffmpeg'):
+            codec = 'wav'
 
-            return send_file(
-                tmp_path,
-                mimetype='audio/wav',
-                as_attachment=False,
-                download_name=f'listen_{int(time.time())}.wav'
-            )
+        try:
+            body = live_mic.stream(codec, live_cfg['bitrate_kbps'])
+        except MicBusy as e:
+            return jsonify({'ok': False, 'error': f'Device microphone is busy ({e})'}), 409
         except Exception as e:
-            logger.error(f"[AUDIO] Listen endpoint failed: {e}")
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except Exception:
-                    pass
-            return jsonify({'ok': False, 'error': str(e)}), 500
-        finally:
-            if lock_acquired:
-                try:
-                    audio_capture_lock.release()
-                except Exception:
-                    pass
+            logger.error(f"[AUDIO] Live listen failed to start: {e}")
+            return jsonify({'ok': False, 'error': 'Unable to capture microphone audio'}), 500
+
+        logger.info(f"[AUDIO] Live listener connected ({codec}, {live_mic.listeners} listening)")
+        mimetype = ENCODERS[codec][0] if codec in ENCODERS else 'audio/wav'
+        return Response(body, mimetype=mimetype, direct_passthrough=True, headers={
+            'Cache-Control': 'no-cache, no-store',
+            'X-Accel-Buffering': 'no',
+        })
     
     @app.route("/api/network/wifi/update", methods=["POST"])
     def api_wifi_update():
@@ -3369,14 +3818,29 @@ def create_lite_app(pi_model, camera_config):
     
     # ============= FRAME GENERATORS =============
     
-    def generate_frames(stream_output=True, internal_keepalive=False):
-        """Generate camera frames with motion detection and video recording"""
+    def generate_frames(stream_output=True, internal_keepalive=False, viewer=None):
+        """Generate camera frames with motion detection and video recording
+
+        ``viewer`` (TierViewer) picks the per-client quality tier and paces output;
+        without it every frame is sent as captured. Per-generator analysis state
+        is released when the generator ends or the client disconnects.
+        """
+        analysis_key = f"frames-{threading.get_ident()}"
+        try:
+            yield from _generate_frames(stream_output, internal_keepalive, viewer, analysis_key)
+        finally:
+            preroll_sizes.pop(analysis_key, None)
+            if analysis_pool is not None:
+                analysis_pool.release(analysis_key)
+
+    def _generate_frames(stream_output, internal_keepalive, viewer, analysis_key):
         import cv2
         import numpy as np
         from PIL import Image
         import io
         from collections import deque
         from threading import Thread
+        from src.processing.analysis_pool import decode_gray, motion_activity, motion_metrics, motion_edge_metrics
         
         last_frame = None
         motion_cooldown_until = 0.0
@@ -3392,7 +3856,33 @@ def create_lite_app(pi_model, camera_config):
         no_frame_count = 0
         motion_streak = 0
         stream_error_count = 0
+        last_analysis_seq = 0
         
+        def _emit(jpeg):
+            out = viewer.frame(jpeg) if viewer is not None else jpeg
+            if out is None:
+                return
+            sent_at = time.monotonic()
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + out + b'\r\n')
+            # Time until the server asks for the next chunk ~= socket write time
+            send_seconds = time.monotonic() - sent_at
+            observe('mecam_stream_send_seconds', send_seconds)
+            if viewer is not None:
+                viewer.record_send(send_seconds)
+
+        def _note_preroll():
+            # Summing the buffer is O(n); every 30th frame is plenty for a gauge
+            if frame_count % 30 == 0:
+                preroll_sizes[analysis_key] = (time.time(), sum(
+                    len(item) if isinstance(item, (bytes, bytearray)) else getattr(item, 'nbytes', 0)
+                    for item in frame_buffer))
+
+        def _decode_preroll_frame(item):
+            if isinstance(item, (bytes, bytearray)):
+                return cv2.imdecode(np.frombuffer(item, np.uint8), cv2.IMREAD_COLOR)
+            return item
+
         def save_video_async(frames_list, event_id, duration_sec=5):
             """Save video in background thread to avoid blocking stream"""
             try:
@@ -3402,28 +3892,46 @@ def create_lite_app(pi_model, camera_config):
                 
                 recordings_path = os.path.join(BASE_DIR, "recordings")
                 os.makedirs(recordings_path, exist_ok=True)
-                
-                # Get first frame dimensions
-                h, w = frames_list[0].shape[:2]
-                
+
                 # Create video file
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 video_filename = f"motion_{timestamp}.mp4"
                 video_path = os.path.join(recordings_path, video_filename)
-                
-                # Use H.264 codec for browser compatibility
-                fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264 codec
                 fps = 20.0
-                out = cv2.VideoWriter(video_path, fourcc, fps, (w, h))
-                
-                if not out.isOpened():
-                    logger.warning("[MOTION] H.264 not available, using mp4v")
-                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out = None
+
+                # Dual-stream picamera2: the hardware encoder already holds the pre-roll at full resolution.
+                hw_raw_path = None
+                if hasattr(camera, 'supports_recording') and camera.supports_recording() and shutil.which("ffmpeg"):
+                    raw_path = video_path[:-4] + ".h264"
+                    if camera.start_recording(raw_path):
+                        hw_raw_path = raw_path
+                        fps = float(getattr(camera, 'fps', fps) or fps)
+
+                if hw_raw_path is None:
+                    # Pre-roll holds encoded JPEGs; decode here, off the frame loop.
+                    with timer('mecam_jpeg_decode_seconds', stage='preroll'):
+                        frames_list = [f for f in (_decode_preroll_frame(item) for item in frames_list)
+                                       if f is not None]
+                    if not frames_list:
+                        logger.warning("[MOTION] Pre-roll frames could not be decoded")
+                        return
+                    
+                    # Get first frame dimensions
+                    h, w = frames_list[0].shape[:2]
+                    
+                    # Use H.264 codec for browser compatibility
+                    fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264 codec
                     out = cv2.VideoWriter(video_path, fourcc, fps, (w, h))
-                
-                if not out.isOpened():
-                    logger.error("[MOTION] Could not open video writer")
-                    return
+                    
+                    if not out.isOpened():
+                        logger.warning("[MOTION] H.264 not available, using mp4v")
+                        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                        out = cv2.VideoWriter(video_path, fourcc, fps, (w, h))
+                    
+                    if not out.isOpened():
+                        logger.error("[MOTION] Could not open video writer")
+                        return
 
                 cfg = get_config()
                 motion_settings = _get_motion_profile_settings(cfg)
@@ -3441,69 +3949,75 @@ def create_lite_app(pi_model, camera_config):
                 audio_path = None
                 audio_embedded = False
                 audio_sidecar = None
-                audio_lock_acquired = False
 
                 if cfg.get('audio_record_on_motion', True) and shutil.which("arecord"):
-                    try:
-                        audio_lock_acquired = audio_capture_lock.acquire(blocking=False)
-                        if not audio_lock_acquired:
-                            logger.info("[AUDIO] Motion audio skipped in rpicam path because microphone is busy")
-                        else:
-                            audio_path = os.path.join(recordings_path, f"motion_{timestamp}.wav")
-                            audio_cmd = _build_arecord_command(audio_path, max_duration)
-                            audio_proc = subprocess.Popen(audio_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    except Exception as e:
-                        logger.warning(f"[AUDIO] Failed to start rpicam audio capture: {e}")
-                        audio_proc = None
+                    audio_path = os.path.join(recordings_path, f"motion_{timestamp}.wav")
+                    audio_proc = live_mic.record_wav(audio_path, max_duration)
+                    if audio_proc is None:
+                        logger.info("[AUDIO] Motion audio skipped in rpicam path because microphone is unavailable")
                         audio_path = None
-                        if audio_lock_acquired:
-                            try:
-                                audio_capture_lock.release()
-                            except Exception:
-                                pass
-                            audio_lock_acquired = False
-                
-                # Write pre-motion frames first
-                for frame in frames_list:
-                    out.write(frame)
-
-                previous_gray = cv2.cvtColor(frames_list[-1], cv2.COLOR_BGR2GRAY)
-                min_total_frames = max(len(frames_list), int(min_duration * fps))
-                max_total_frames = max(min_total_frames, int(max_duration * fps))
-                appended_frames = len(frames_list)
-                last_motion_seen = time.time()
-
-                while appended_frames < max_total_frames:
-                    next_frame = None
-                    if hasattr(camera, 'get_jpeg_frame'):
-                        live_jpeg = camera.get_jpeg_frame()
-                        if live_jpeg:
-                            live_np = np.frombuffer(live_jpeg, np.uint8)
-                            next_frame = cv2.imdecode(live_np, cv2.IMREAD_COLOR)
-                    elif hasattr(camera, 'capture_array'):
-                        live_arr = camera.capture_array()
-                        if live_arr is not None:
-                            next_frame = cv2.cvtColor(live_arr, cv2.COLOR_RGB2BGR)
-
-                    if next_frame is not None:
-                        out.write(next_frame)
-                        appended_frames += 1
-
-                        current_gray = cv2.cvtColor(next_frame, cv2.COLOR_BGR2GRAY)
-                        diff = cv2.absdiff(previous_gray, current_gray)
-                        blur = cv2.GaussianBlur(diff, (11, 11), 0)
-                        _, thresh = cv2.threshold(blur, 24, 255, cv2.THRESH_BINARY)
-                        thresh = cv2.dilate(thresh, None, iterations=1)
-                        motion_ratio_now = cv2.countNonZero(thresh) / float(current_gray.shape[0] * current_gray.shape[1])
-                        mean_diff_now = float(diff.mean())
-                        if motion_ratio_now > (motion_settings["threshold"] * 0.75) or mean_diff_now > (motion_settings["mean_diff"] * 0.8):
-                            last_motion_seen = time.time()
-                        previous_gray = current_gray
-
-                    if appended_frames >= min_total_frames and (time.time() - last_motion_seen) >= quiet_stop_seconds:
-                        break
 
-                    time.sleep(1.0 / fps)
+                if hw_raw_path:
+                    # Encoder writes the clip; only watch the lores Y plane to decide when to stop.
+                    record_started = time.time()
+                    last_motion_seen = record_started
+                    previous_gray = camera.get_luma_frame()
+                    while True:
+                        elapsed = time.time() - record_started
+                        if elapsed >= max_duration:
+                            break
+                        current_gray = camera.get_luma_frame()
+                        if current_gray is not None and previous_gray is not None \
+                                and current_gray.shape == previous_gray.shape:
+                            motion_ratio_now, mean_diff_now = motion_activity(previous_gray, current_gray)
+                            if motion_ratio_now > (motion_settings["threshold"] * 0.75) or mean_diff_now > (motion_settings["mean_diff"] * 0.8):
+                                last_motion_seen = time.time()
+                        previous_gray = current_gray
+                        if elapsed >= min_duration and (time.time() - last_motion_seen) >= quiet_stop_seconds:
+                            break
+                        time.sleep(1.0 / fps)
+                    camera.stop_recording()
+                    appended_frames = int((time.time() - record_started + getattr(camera, 'preroll_seconds', 0)) * fps)
+                else:
+                    # Write pre-motion frames first
+                    with timer('mecam_clip_write_seconds', stage='preroll'):
+                        for frame in frames_list:
+                            out.write(frame)
+
+                    previous_gray = cv2.cvtColor(frames_list[-1], cv2.COLOR_BGR2GRAY)
+                    min_total_frames = max(len(frames_list), int(min_duration * fps))
+                    max_total_frames = max(min_total_frames, int(max_duration * fps))
+                    appended_frames = len(frames_list)
+                    last_motion_seen = time.time()
+
+                    while appended_frames < max_total_frames:
+                        next_frame = None
+                        if hasattr(camera, 'get_jpeg_frame'):
+                            live_jpeg = camera.get_jpeg_frame()
+                            if live_jpeg:
+                                live_np = np.frombuffer(live_jpeg, np.uint8)
+                                with timer('mecam_jpeg_decode_seconds', stage='recording'):
+                                    next_frame = cv2.imdecode(live_np, cv2.IMREAD_COLOR)
+                        elif hasattr(camera, 'capture_array'):
+                            live_arr = camera.capture_array()
+                            if live_arr is not None:
+                                next_frame = cv2.cvtColor(live_arr, cv2.COLOR_RGB2BGR)
+
+                        if next_frame is not None:
+                            out.write(next_frame)
+                            appended_frames += 1
+
+                            current_gray = cv2.cvtColor(next_frame, cv2.COLOR_BGR2GRAY)
+                            motion_ratio_now, mean_diff_now = motion_activity(previous_gray, current_gray)
+                            if motion_ratio_now > (motion_settings["threshold"] * 0.75) or mean_diff_now > (motion_settings["mean_diff"] * 0.8):
+                                last_motion_seen = time.time()
+                            previous_gray = current_gray
+
+                        quiet_for = time.time() - last_motion_seen
+                        if appended_frames >= min_total_frames and quiet_for >= quiet_stop_seconds:
+                            break
+
+                        time.sleep(1.0 / fps)
 
                 if audio_proc:
                     try:
@@ -3511,18 +4025,38 @@ def create_lite_app(pi_model, camera_config):
                     except Exception:
                         audio_proc.kill()
                     audio_proc = None
+                
+                if out is not None:
+                    with timer('mecam_clip_write_seconds', stage='finalize'):
+                        out.release()
 
-                if audio_lock_acquired:
+                has_audio_capture = bool(audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 1024)
+                if hw_raw_path:
+                    # Wrap the hardware H.264 stream (plus any audio) into MP4 without re-encoding.
+                    wrap_cmd = ["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps), "-i", hw_raw_path]
+                    if has_audio_capture:
+                        wrap_cmd += ["-i", audio_path, "-c:a", "aac", "-shortest"]
+                    wrap_cmd += ["-c:v", "copy", "-movflags", "+faststart", video_path]
                     try:
-                        audio_capture_lock.release()
+                        with timer('mecam_mux_seconds', kind='wrap'):
+                            subprocess.run(wrap_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False,
+                                           timeout=max(30, int(max_duration) * 4))
+                    except Exception as e:
+                        logger.warning(f"[MOTION] H.264 wrap error: {e}")
+                    if not os.path.exists(video_path) or os.path.getsize(video_path) == 0:
+                        logger.error(f"[MOTION] Could not wrap hardware recording {os.path.basename(hw_raw_path)}")
+                        return
+                    try:
+                        os.remove(hw_raw_path)
                     except Exception:
                         pass
-                    audio_lock_acquired = False
-                
-                out.release()
-
-                has_audio_capture = bool(audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 1024)
-                if has_audio_capture and shutil.which("ffmpeg"):
+                    if has_audio_capture:
+                        audio_embedded = True
+                        try:
+                            os.remove(audio_path)
+                        except Exception:
+                            pass
+                elif has_audio_capture and shutil.which("ffmpeg"):
                     try:
                         muxed_path = video_path.replace(".mp4", "_av.mp4")
                         mux_cmd = [
@@ -3537,7 +4071,8 @@ def create_lite_app(pi_model, camera_config):
                             muxed_path
                         ]
                         mux_timeout = max(30, int(max_duration) * 4)
-                        subprocess.run(mux_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, timeout=mux_timeout)
+                        with timer('mecam_mux_seconds', kind='audio'):
+                            subprocess.run(mux_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, timeout=mux_timeout)
                         if os.path.exists(muxed_path):
                             os.replace(muxed_path, video_path)
                             audio_embedded = True
@@ -3613,8 +4148,6 @@ def create_lite_app(pi_model, camera_config):
         
         while True:
             try:
-                maybe_flush_queues()
-
                 # In keepalive mode, pause motion loop while a real client is streaming.
                 if internal_keepalive:
                     with motion_runtime['lock']:
@@ -3654,100 +4187,93 @@ def create_lite_app(pi_model, camera_config):
                     
                     frame_count += 1
                     
-                    # Decode JPEG for motion detection and buffering
+                    # Buffer the encoded JPEG for pre-motion recording; clips decode it in the writer thread.
                     try:
-                        nparr = np.frombuffer(jpeg_bytes, np.uint8)
-                        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                        
-                        if frame is not None:
-                            # Add to frame buffer for pre-motion recording
-                            frame_buffer.append(frame.copy())
-                            
-                            # Motion detection (every frame for fast response)
-                            if True:
-                                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                                
-                                if last_frame is not None:
-                                    diff = cv2.absdiff(last_frame, gray)
-                                    blur = cv2.GaussianBlur(diff, (11, 11), 0)
-                                    _, thresh = cv2.threshold(blur, 28, 255, cv2.THRESH_BINARY)
-                                    thresh = cv2.dilate(thresh, None, iterations=2)
-                                    thresh = cv2.erode(thresh, None, iterations=1)
-
-                                    motion_pixels = cv2.countNonZero(thresh)
-                                    total_pixels = gray.shape[0] * gray.shape[1]
-                                    motion_ratio = motion_pixels / total_pixels
-                                    
-                                    cfg = get_config()
-                                    motion_settings = _get_motion_profile_settings(cfg)
-                                    motion_threshold = motion_settings['threshold']
-                                    min_area = motion_settings['min_area']
-                                    trigger_mode = motion_settings['trigger_mode']
-                                    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                                    significant_contours = sum(1 for c in contours if cv2.contourArea(c) >= min_area)
-                                    trigger_now = motion_ratio > motion_threshold and significant_contours > 0
-                                    motion_streak = (motion_streak + 1) if trigger_now else max(0, motion_streak - 1)
-                                    trigger_required = max(1, int(motion_settings.get('trigger_streak_frames', 2) or 2))
-                                    
-                                    cfg = get_config()
-                                    nanny_cam = cfg.get('nanny_cam_enabled', False)
-                                    motion_enabled = cfg.get('motion_record_enabled', True)
-
-                                    # Motion detected and not in cooldown
-                                    cooldown_active = time.time() < motion_cooldown_until
-                                    if motion_streak >= trigger_required and not cooldown_active and not recording:
-                                        if nanny_cam or not motion_enabled:
-                                            motion_streak = 0
-                                        else:
-                                            logger.info(f"[MOTION] Motion detected: {motion_ratio*100:.1f}% pixels, streak={motion_streak}/{trigger_required}")
-
-                                            # Log motion event and get event_id
-                                            event_data = log_motion_event('motion', motion_ratio, {
-                                                'threshold': motion_threshold,
-                                                'contours': significant_contours,
-                                                'motion_pixels': motion_pixels,
-                                                'trigger_mode': trigger_mode,
-                                                'sensitivity_mode': motion_settings['sensitivity_mode']
-                                            })
-                                            event_id = event_data.get('id') if event_data else f"evt_{int(time.time()*1000)}"
-
-                                            # Keep a small pre-motion buffer on Pi Zero to reduce memory pressure
-                                            pre_frames = list(frame_buffer)[-24:] if pi_model.get('ram_mb', 1024) <= 512 else list(frame_buffer)
-                                            duration_sec = _auto_motion_clip_duration(cfg, motion_ratio=motion_ratio, contour_count=significant_contours)
-                                            video_thread = Thread(
-                                                target=save_video_async,
-                                                args=(pre_frames, event_id, duration_sec),
-                                                daemon=True
-                                            )
-                                            video_thread.start()
-
-                                            recording = True
-                                            recording_start = time.time()
-                                            cooldown_seconds = float(cfg.get('motion_cooldown_seconds', 1.0) or 1.0)
-                                            cooldown_seconds = min(10.0, max(0.2, cooldown_seconds))
-                                            motion_cooldown_until = time.time() + cooldown_seconds
-                                            motion_streak = 0
-
-                                            logger.info(f"[MOTION] Recording started with {len(pre_frames)} pre-motion frames")
-
-                                            # Keep SMS behavior consistent with picamera motion path.
-                                            if cfg.get('sms_enabled') and cfg.get('send_motion_to_emergency'):
-                                                phone = cfg.get('sms_phone_to') or cfg.get('emergency_phone')
-                                                if phone:
-                                                    try:
-                                                        from src.core import get_sms_notifier
-                                                        sms_notifier = get_sms_notifier()
-                                                        device_name = cfg.get('device_name', 'ME Camera')
-                                                        location = cfg.get('device_location', 'Unknown')
-                                                        timestamp_txt = datetime.now().strftime("%I:%M:%S %p")
-                                                        msg = f"🚨 {device_name}: Motion detected at {location} - {timestamp_txt}"
-                                                        sms_notifier.send_sms(phone, msg)
-                                                        logger.success(f"[SMS] Motion alert sent to {phone}")
-                                                    except Exception as sms_error:
-                                                        logger.error(f"[SMS] Notification failed: {sms_error}")
-                                                        queue_notification_retry(phone, msg, reason="send_failed")
-                                
+                        frame_buffer.append(jpeg_bytes)
+                        _note_preroll()
+
+                        cfg = get_config()
+                        motion_settings = _get_motion_profile_settings(cfg)
+                        min_area = motion_settings['min_area']
+                        metrics = None
+                        # Dual-stream picamera2 hands out the lores Y plane directly; otherwise decode the JPEG.
+                        luma = camera.get_luma_frame() if hasattr(camera, 'get_luma_frame') else None
+                        if analysis_pool is not None:
+                            # Decode + diff run in a worker process; act on the newest finished result.
+                            analysis_pool.submit('motion', luma if luma is not None else jpeg_bytes,
+                                                 key=analysis_key, params={'min_area': min_area})
+                            result = analysis_pool.latest(analysis_key)
+                            if result is not None and result.seq != last_analysis_seq:
+                                last_analysis_seq = result.seq
+                                if result.ok:
+                                    metrics = result.data
+                        else:
+                            if luma is not None:
+                                gray = luma
+                            else:
+                                with timer('mecam_jpeg_decode_seconds', stage='motion'):
+                                    gray = decode_gray(jpeg_bytes)
+                            if gray is not None:
+                                if last_frame is not None and last_frame.shape == gray.shape:
+                                    with timer('mecam_motion_analysis_seconds', task='inline'):
+                                        metrics = motion_metrics(last_frame, gray, min_area)
                                 last_frame = gray
+
+                        if metrics and 'motion_ratio' in metrics:
+                            motion_ratio = metrics['motion_ratio']
+                            motion_pixels = metrics['motion_pixels']
+                            significant_contours = metrics['significant_contours']
+                            motion_threshold = motion_settings['threshold']
+                            trigger_mode = motion_settings['trigger_mode']
+                            motion_streak, trigger_required = _motion_trigger_step(
+                                motion_streak, metrics, motion_settings)
+
+                            nanny_cam = cfg.get('nanny_cam_enabled', False)
+                            motion_enabled = cfg.get('motion_record_enabled', True)
+
+                            # Motion detected and not in cooldown
+                            cooldown_active = time.time() < motion_cooldown_until
+                            if motion_streak >= trigger_required and not cooldown_active and not recording:
+                                if nanny_cam or not motion_enabled:
+                                    motion_streak = 0
+                                else:
+                                    logger.info(f"[MOTION] Motion detected: {motion_ratio*100:.1f}% pixels, streak={motion_streak}/{trigger_required}")
+
+                                    # Log motion event and get event_id
+                                    event_data = log_motion_event('motion', motion_ratio, {
+                                        'threshold': motion_threshold,
+                                        'contours': significant_contours,
+                                        'motion_pixels': motion_pixels,
+                                        'trigger_mode': trigger_mode,
+                                        'sensitivity_mode': motion_settings['sensitivity_mode']
+                                    })
+                                    event_id = event_data.get('id') if event_data else f"evt_{int(time.time()*1000)}"
+
+                                    # Keep a small pre-motion buffer on Pi Zero to reduce memory pressure
+                                    pre_frames = list(frame_buffer)[-24:] if pi_model.get('ram_mb', 1024) <= 512 else list(frame_buffer)
+                                    duration_sec = _auto_motion_clip_duration(cfg, motion_ratio=motion_ratio, contour_count=significant_contours)
+                                    video_thread = Thread(
+                                        target=save_video_async,
+                                        args=(pre_frames, event_id, duration_sec),
+                                        name="motion-clip",
+                                        daemon=True
+                                    )
+                                    video_thread.start()
+
+                                    recording = True
+                                    recording_start = time.time()
+                                    cooldown_seconds = float(cfg.get('motion_cooldown_seconds', 1.0) or 1.0)
+                                    cooldown_seconds = min(10.0, max(0.2, cooldown_seconds))
+                                    motion_cooldown_until = time.time() + cooldown_seconds
+                                    motion_streak = 0
+
+                                    logger.info(f"[MOTION] Recording started with {len(pre_frames)} pre-motion frames")
+
+                                    # Keep alert behavior consistent with picamera motion path.
+                                    try:
+                                        queue_motion_alerts(cfg, event_id)
+                                    except Exception as notify_error:
+                                        logger.error(f"[NOTIFY] Could not queue motion alerts: {notify_error}")
                     except Exception as e:
                         logger.debug(f"[MOTION] Frame processing error: {e}")
                     
@@ -3758,12 +4284,12 @@ def create_lite_app(pi_model, camera_config):
                             logger.info("[MOTION] Recording window complete")
                     
                     if stream_output:
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+                        yield from _emit(jpeg_bytes)
                     time.sleep(0.03)  # ~33 FPS to reduce CPU and memory pressure on Pi Zero
                     continue
                 
-                # picamera2 - get array and convert
+                # Array-only backends (bare Picamera2 objects). The app's own picamera2 backend is
+                # FastCameraStreamer, which takes the shared get_jpeg_frame() path above.
                 frame = camera.capture_array()
                 if camera_rotation_mode == 'rotate_180':
                     frame = cv2.rotate(frame, cv2.ROTATE_180)
@@ -3776,14 +4302,10 @@ def create_lite_app(pi_model, camera_config):
                 elif camera_rotation_mode == 'flip_vertical':
                     frame = cv2.flip(frame, 0)
                 frame_count += 1  # BUG FIX #3: Increment frame counter
+                _note_preroll()
                 
-                # Motion detection - check every 2nd frame for performance
-                # BUG FIX: Changed logic - now processes motion detection on EVERY frame for responsiveness
-                if frame_count % 2 == 0:  # Skip buffering on even frames
-                    # Process frame for motion detection (every 2nd frame)
-                    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-                else:
-                    # Just buffer the frame and stream it
+                # Motion detection runs on every 2nd frame; odd frames are only buffered and streamed.
+                if frame_count % 2 != 0:
                     frame_buffer.append(frame.copy())
                     if len(frame_buffer) > buffer_size:
                         frame_buffer.pop(0)
@@ -3799,65 +4321,52 @@ def create_lite_app(pi_model, camera_config):
                     del buf
                     
                     if stream_output:
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+                        yield from _emit(jpeg_bytes)
                     time.sleep(0.033)
                     continue
                 
-                gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-                
                 # Always add current frame to buffer
                 frame_buffer.append(frame.copy())
                 if len(frame_buffer) > buffer_size:
                     frame_buffer.pop(0)  # Remove oldest
+
+                cfg = get_config()
+                motion_settings = _get_motion_profile_settings(cfg)
+                motion_window_open = time.time() >= motion_cooldown_until and not recording
+                metrics = None
+                if analysis_pool is not None:
+                    # Grayscale, diff, Canny and contours run in a worker; keep its previous frame current.
+                    analysis_pool.submit('motion_edges', frame, key=analysis_key,
+                                         params={'min_area': motion_settings['min_area']}, color='rgb')
+                    result = analysis_pool.latest(analysis_key)
+                    if result is not None and result.seq != last_analysis_seq:
+                        last_analysis_seq = result.seq
+                        if result.ok:
+                            metrics = result.data
+                else:
+                    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+                    if motion_window_open and last_frame is not None:
+                        # Advanced motion detection - filter out shadows and lighting
+                        metrics = motion_edge_metrics(last_frame, gray, motion_settings['min_area'])
+                    last_frame = gray
                 
                 # Motion detection - check every frame for responsiveness
                 if time.time() >= motion_cooldown_until:
-                    if last_frame is not None and not recording:
-                        # Advanced motion detection - filter out shadows and lighting
-                        diff = cv2.absdiff(last_frame, gray)
-                        
-                        # Apply Gaussian blur to reduce noise and small changes
-                        blurred_diff = cv2.GaussianBlur(diff, (21, 21), 0)
-                        
-                        # Threshold to get significant changes only
-                        _, thresh = cv2.threshold(blurred_diff, 25, 255, cv2.THRESH_BINARY)
-                        
-                        # Calculate metrics
-                        mean_diff = np.mean(diff)
-                        max_diff = np.max(diff)
-                        motion_pixels = np.sum(thresh > 0)  # Count pixels with significant change
-                        total_pixels = thresh.shape[0] * thresh.shape[1]
-                        motion_percent = (motion_pixels / total_pixels) * 100
-                        
-                        # Detect edges to distinguish objects from shadows
-                        edges = cv2.Canny(gray, 50, 150)
-                        edge_motion = np.sum(edges > 0)
-                        
-                        # Contour-based filtering to ignore tiny movements (leaves, shadows)
-                        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                        cfg = get_config()
-                        motion_settings = _get_motion_profile_settings(cfg)
+                    if metrics and 'mean_diff' in metrics and not recording:
+                        mean_diff = metrics['mean_diff']
+                        max_diff = metrics['max_diff']
+                        motion_percent = metrics['motion_percent']
+                        edge_motion = metrics['edge_motion']
+                        contour_count = metrics['contour_count']
+                        allowed_labels = list(metrics['labels'])
                         trigger_mode = motion_settings['trigger_mode']
-                        min_area = motion_settings['min_area']
-                        allowed_labels = []
-                        for c in contours:
-                            area = cv2.contourArea(c)
-                            if area < min_area:
-                                continue
-                            x, y, w, h = cv2.boundingRect(c)
-                            aspect = w / float(h)
-                            if 0.3 <= aspect <= 0.8:
-                                allowed_labels.append("person")
-                            elif 0.8 < aspect <= 3.5:
-                                allowed_labels.append("vehicle")
 
                         if trigger_mode == 'people_only':
                             label_match = 'person' in allowed_labels
                         elif trigger_mode == 'people_vehicles':
                             label_match = len(allowed_labels) > 0
                         else:
-                            label_match = len(contours) > 0
+                            label_match = contour_count > 0
 
                         motion = (
                             max_diff > motion_settings['max_diff'] and
@@ -3877,7 +4386,7 @@ def create_lite_app(pi_model, camera_config):
                                     # Save clip using buffered frames + continue recording
                                     clip_duration = _auto_motion_clip_duration(
                                         cfg,
-                                        contour_count=len(contours),
+                                        contour_count=contour_count,
                                         mean_diff=mean_diff,
                                         motion_percent=motion_percent,
                                     )
@@ -3931,23 +4440,11 @@ def create_lite_app(pi_model, camera_config):
                                             "timestamp": event.get("timestamp")
                                         })
                                     
-                                    # Send SMS notification if enabled
-                                    if cfg.get('sms_enabled') and cfg.get('send_motion_to_emergency'):
-                                        try:
-                                            from src.core import get_sms_notifier
-                                            sms_notifier = get_sms_notifier()
-                                            phone = cfg.get('sms_phone_to') or cfg.get('emergency_phone')
-                                            if phone:
-                                                device_name = cfg.get('device_name', 'ME Camera')
-                                                location = cfg.get('device_location', 'Unknown')
-                                                timestamp = datetime.now().strftime("%I:%M:%S %p")
-                                                msg = f"🚨 {device_name}: Motion detected at {location} - {timestamp}"
-                                                sms_notifier.send_sms(phone, msg)
-                                                logger.success(f"[SMS] Motion alert sent to {phone}")
-                                        except Exception as sms_error:
-                                            logger.error(f"[SMS] Notification failed: {sms_error}")
-                                            if phone:
-                                                queue_notification_retry(phone, msg, reason="send_failed")
+                                    # Queue motion alerts (delivered by the notification outbox)
+                                    try:
+                                        queue_motion_alerts(cfg, event.get('id') or f"evt_{int(time.time()*1000)}")
+                                    except Exception as notify_error:
+                                        logger.error(f"[NOTIFY] Could not queue motion alerts: {notify_error}")
                                 except Exception as e:
                                     logger.error(f"[MOTION] Recording error: {e}")
                                 finally:
@@ -3958,8 +4455,6 @@ def create_lite_app(pi_model, camera_config):
                             cooldown_seconds = min(10.0, max(0.2, cooldown_seconds))
                             motion_cooldown_until = time.time() + cooldown_seconds
                 
-                last_frame = gray
-                
                 # Convert to JPEG
                 img = Image.fromarray(frame)
                 buf = io.BytesIO()
@@ -3972,8 +4467,7 @@ def create_lite_app(pi_model, camera_config):
                 del buf
                 
                 if stream_output:
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+                    yield from _emit(jpeg_bytes)
                 
                 time.sleep(0.033)  # ~30 FPS for better responsiveness
             except Exception as e:
@@ -3998,9 +4492,9 @@ def create_lite_app(pi_model, camera_config):
 
     def _motion_keepalive_worker():
         """Keep motion detection active even when no user is viewing /video_feed."""
-        # Small startup delay allows camera init to complete first.
         logger.info("[MOTION] Keepalive worker starting (motion stays active without open live view)")
-        time.sleep(2.0)
+        # Let the background warm-up open the camera instead of racing it
+        camera_warmup.wait()
         while True:
             try:
                 if camera is None or not camera_available:
@@ -4014,7 +4508,7 @@ def create_lite_app(pi_model, camera_config):
                 logger.warning(f"[MOTION] Keepalive worker error: {e}")
                 time.sleep(1.0)
 
-    threading.Thread(target=_motion_keepalive_worker, daemon=True).start()
+    threading.Thread(target=_motion_keepalive_worker, name="motion-keepalive", daemon=True).start()
     logger.info("[MOTION] Keepalive worker launched")
     
     def generate_test_pattern():
@@ -4038,6 +4532,26 @@ def create_lite_app(pi_model, camera_config):
     
     # ============= V3.0 WEBRTC ROUTES =============
     
+    webrtc_state = {'lock': threading.Lock(), 'broadcaster': None}
+
+    def _get_webrtc_broadcaster():
+        """Create the shared broadcaster on first offer (aiortc stays unloaded until someone uses it)."""
+        if camera is None or not camera_available:
+            return None
+        with webrtc_state['lock']:
+            if webrtc_state['broadcaster'] is None:
+                current_cfg = get_config()
+                webrtc_cfg = current_cfg.get('webrtc', {}) or {}
+                webrtc_state['broadcaster'] = WebRTCBroadcaster(
+                    lambda: camera if camera_available else None,
+                    # Same live encoder as HLS, so the same bitrate
+                    bitrate=_get_hls_cfg(current_cfg)['bitrate'],
+                    stun_servers=webrtc_cfg.get('stun_servers') or None,
+                    turn_servers=webrtc_cfg.get('turn_servers') or None,
+                    max_peers=int(webrtc_cfg.get('max_peers', 4) or 4),
+                )
+            return webrtc_state['broadcaster']
+
     @app.route("/api/webrtc/offer", methods=["POST"])
     def api_webrtc_offer():
         """Handle WebRTC offer from client"""
@@ -4054,15 +4568,18 @@ def create_lite_app(pi_model, camera_config):
             
             logger.info("[WebRTC] Received SDP offer from client")
             
-            # Create answer (async operation)
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            answer = loop.run_until_complete(webrtc_streamer.handle_offer(data))
-            loop.close()
+            broadcaster = _get_webrtc_broadcaster()
+            if broadcaster is None:
+                return jsonify({'error': 'Camera unavailable'}), 503
+            # Runs on the broadcaster's long-lived loop; every peer shares one camera encode
+            answer = broadcaster.handle_offer(data)
             
             logger.success("[WebRTC] SDP answer created")
             return jsonify(answer)
             
+        except RuntimeError as e:
+            logger.warning(f"[WebRTC] Offer rejected: {e}")
+            return jsonify({'error': str(e)}), 503
         except Exception as e:
             logger.error(f"[WebRTC] Offer handling failed: {e}")
             return jsonify({'error': str(e)}), 500
@@ -4092,10 +4609,15 @@ def create_lite_app(pi_model, camera_config):
     @app.route("/api/webrtc/status", methods=["GET"])
     def api_webrtc_status():
         """Get WebRTC connection status"""
+        broadcaster = webrtc_state['broadcaster']
+        if broadcaster is not None:
+            stats = broadcaster.get_stats()
+        else:
+            stats = {'peers': 0, 'peers_connected': 0, 'source': None}
         return jsonify({
             'available': WEBRTC_AVAILABLE,
-            'connected': webrtc_streamer.pc.connectionState == 'connected' if webrtc_streamer else False,
-            'ice_state': webrtc_streamer.pc.iceConnectionState if webrtc_streamer else 'new'
+            'connected': stats['peers_connected'] > 0,
+            **stats
         })
     
     # ============= V3.0 REMOTE ACCESS ROUTES =============